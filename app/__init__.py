@@ -2,6 +2,12 @@ from flask import Flask, request, jsonify, redirect, url_for
 from flask_login import LoginManager
 from .config import Config
 from .db import DB
+from .cache import Cache
+from . import compress, conditional
+from .serialize import FastJSONProvider
+from .metrics import Metrics
+from .pagination import InvalidCursor
+from .sqlstats import SQLStats
 
 login = LoginManager()
 login.login_view = 'users.login'
@@ -9,9 +15,16 @@ login.login_view = 'users.login'
 def create_app():
     app = Flask(__name__)
     app.config.from_object(Config)
+    if app.config['JSON_PROVIDER'] == 'fast':
+        app.json = FastJSONProvider(app)
 
     app.db = DB(app)
+    app.cache = Cache(app)
+    app.sql_stats = SQLStats(app)
+    app.metrics = Metrics(app)
     login.init_app(app)
+    conditional.init_app(app)
+    compress.init_app(app)
 
     from .index import bp as index_bp
     app.register_blueprint(index_bp)
@@ -42,6 +55,12 @@ def create_app():
             return jsonify({'success': False, 'error': 'Not logged in'}), 401
         return redirect(url_for('users.login'))
 
+    @app.errorhandler(InvalidCursor)
+    def invalid_cursor(e):
+        if request.path.startswith('/api/'):
+            return jsonify({'success': False, 'error': 'invalid cursor'}), 400
+        return e
+
     # --- End new code ---
 
     return app
@@ -0,0 +1,72 @@
+import threading
+import time
+from collections import OrderedDict
+
+
+class Cache:
+    """
+    Small in-process cache for reference data that every page needs but
+    that rarely changes (categories, the price slider's upper bound, ...).
+
+    Entries expire after a TTL and the least recently used entry is
+    evicted once max_entries is reached.  Code that changes the underlying
+    rows calls invalidate() so readers don't wait out the TTL.  Cached
+    values are shared between requests and must not be mutated.
+
+    Each worker process has its own copy, so another process may serve a
+    value for up to one TTL after an invalidation here.
+    """
+
+    def __init__(self, app):
+        self.max_entries = app.config['CACHE_MAX_ENTRIES']
+        self.default_ttl = app.config['CACHE_DEFAULT_TTL']
+        self._entries = OrderedDict()  # key -> (expires_at, value)
+        self._lock = threading.Lock()
+        self.stats = {'hits': 0, 'misses': 0, 'evictions': 0, 'invalidations': 0}
+
+    def get_or_set(self, key, loader, ttl=None):
+        """
+        The cached value for key, or loader()'s result, which is then
+        cached for ttl seconds (CACHE_DEFAULT_TTL by default).
+        """
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] > now:
+                self._entries.move_to_end(key)
+                self.stats['hits'] += 1
+                return entry[1]
+            self.stats['misses'] += 1
+
+        # Load outside the lock so a slow query doesn't block every other
+        # key; two concurrent misses on one key both load, which is fine.
+        value = loader()
+        self.set(key, value, ttl)
+        return value
+
+    def set(self, key, value, ttl=None):
+        expires_at = time.monotonic() + (self.default_ttl if ttl is None else ttl)
+        with self._lock:
+            self._entries[key] = (expires_at, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.stats['evictions'] += 1
+
+    def invalidate(self, *keys):
+        with self._lock:
+            for key in keys:
+                if self._entries.pop(key, None) is not None:
+                    self.stats['invalidations'] += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def get_stats(self):
+        """Counters plus the current size and hit ratio, as a plain dict."""
+        with self._lock:
+            stats = dict(self.stats, size=len(self._entries), max_entries=self.max_entries)
+        lookups = stats['hits'] + stats['misses']
+        stats['hit_ratio'] = stats['hits'] / lookups if lookups else None
+        return stats
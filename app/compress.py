@@ -0,0 +1,45 @@
+import gzip
+
+from flask import request
+
+try:
+    import brotli
+except ImportError:  # optional; gzip only without it
+    brotli = None
+
+
+# what is worth compressing; static files bypass this (direct_passthrough)
+COMPRESS_MIMETYPES = ('application/json', 'text/html', 'text/plain', 'text/csv')
+
+
+def init_app(app):
+    """
+    Compress text responses of at least COMPRESS_MIN_SIZE bytes with
+    brotli or gzip, whichever the client prefers.  Streamed responses
+    (the CSV exports) go out as they are.
+    """
+    min_size = app.config['COMPRESS_MIN_SIZE']
+    gzip_level = app.config['COMPRESS_GZIP_LEVEL']
+    brotli_quality = app.config['COMPRESS_BROTLI_QUALITY']
+    encodings = ['br', 'gzip'] if brotli is not None else ['gzip']
+
+    @app.after_request
+    def compress(response):
+        if (response.status_code != 200 or response.direct_passthrough
+                or response.is_streamed or 'Content-Encoding' in response.headers
+                or response.mimetype not in COMPRESS_MIMETYPES):
+            return response
+        response.vary.add('Accept-Encoding')
+
+        encoding = request.accept_encodings.best_match(encodings)
+        data = response.get_data()
+        if encoding is None or len(data) < min_size:
+            return response
+
+        if encoding == 'br':
+            data = brotli.compress(data, quality=brotli_quality)
+        else:
+            data = gzip.compress(data, compresslevel=gzip_level)
+        response.set_data(data)
+        response.headers['Content-Encoding'] = encoding
+        return response
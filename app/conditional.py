@@ -0,0 +1,65 @@
+import hashlib
+from functools import wraps
+
+from flask import current_app, request, session, make_response
+from flask_login import current_user
+from werkzeug.http import is_resource_modified
+
+
+def conditional(stamp):
+    """
+    Decorate a GET view so a client that already holds the current page
+    gets 304 Not Modified before the view's queries run.
+
+    stamp(**view_args) returns (token, last_modified) -- one of the cheap
+    Version fingerprints -- or None to just run the view (e.g. so a
+    missing row still 404s).  The ETag also covers the viewer, since pages
+    differ per user, and ETAG_SALT, which deploys change to invalidate
+    rendered templates.  ETags are weak: the body may be re-encoded.
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            # a pending flash is only shown if the page is rendered again
+            if request.method not in ('GET', 'HEAD') or '_flashes' in session:
+                return view(*args, **kwargs)
+
+            stamped = stamp(**kwargs)
+            if stamped is None:
+                return view(*args, **kwargs)
+            token, last_modified = stamped
+
+            viewer = current_user.get_id() if current_user.is_authenticated else ''
+            etag = hashlib.sha1(
+                f"{current_app.config['ETAG_SALT']}|{request.endpoint}|{viewer}|{token}".encode()
+            ).hexdigest()[:20]
+
+            if not is_resource_modified(request.environ, etag=etag, last_modified=last_modified):
+                response = current_app.response_class(status=304)
+            else:
+                response = make_response(view(*args, **kwargs))
+                if response.status_code != 200:
+                    return response
+            response.set_etag(etag, weak=True)
+            if last_modified is not None:
+                response.last_modified = last_modified
+            return response
+        return wrapper
+    return decorator
+
+
+def init_app(app):
+    """Set each blueprint's CACHE_CONTROL policy on its GET responses."""
+
+    @app.after_request
+    def cache_control(response):
+        policy = app.config['CACHE_CONTROL'].get(request.blueprint)
+        if (policy is None or request.method not in ('GET', 'HEAD')
+                or response.status_code not in (200, 304)
+                or 'Cache-Control' in response.headers):
+            return response
+        # shared caches must not keep a logged-in user's page
+        if 'public' in policy and current_user.is_authenticated:
+            policy = policy.replace('public', 'private')
+        response.headers['Cache-Control'] = policy
+        return response
@@ -14,3 +14,71 @@ class Config(object):
                 os.environ.get('DB_NAME'))
     print(SQLALCHEMY_DATABASE_URI) 
     SQLALCHEMY_TRACK_MODIFICATIONS = False
+    # Replay of SERIALIZABLE units of work that lose a race (see
+    # DB.run_transaction); delays are in seconds.
+    DB_RETRY_MAX_ATTEMPTS = int(os.environ.get('DB_RETRY_MAX_ATTEMPTS', 10))
+    DB_RETRY_BASE_DELAY = float(os.environ.get('DB_RETRY_BASE_DELAY', 0.02))
+    DB_RETRY_MAX_DELAY = float(os.environ.get('DB_RETRY_MAX_DELAY', 1.0))
+    # In-process cache for catalog reference data (see app/cache.py);
+    # TTL is in seconds.
+    CACHE_MAX_ENTRIES = int(os.environ.get('CACHE_MAX_ENTRIES', 256))
+    CACHE_DEFAULT_TTL = float(os.environ.get('CACHE_DEFAULT_TTL', 60))
+    # 1 serves /metrics and the /api/.../stats views outside debug mode;
+    # they show cache, pool, SQL and checkout internals, so keep them off
+    # public deployments (or behind a network rule for the scraper).
+    STATS_ENDPOINTS = os.environ.get('STATS_ENDPOINTS', '0') == '1'
+    # Seconds a loaded Users row may be reused across requests (see
+    # User.get); 0 keeps users cached for the current request only.
+    USER_CACHE_TTL = float(os.environ.get('USER_CACHE_TTL', 0))
+    # Cache-Control for GET responses, by blueprint name (see
+    # app/conditional.py); "public" becomes "private" for logged-in users.
+    # Pages with an ETag revalidate it on every use ("no-cache").
+    CACHE_CONTROL = {
+        'index': 'public, no-cache',
+        'products_api': 'public, no-cache',
+        'social': 'public, no-cache',
+        'sellers': 'private, no-cache',
+        'cart': 'private, no-cache',
+        'users': 'private, no-cache',
+        'wishlist': 'private, no-cache',
+    }
+    # Mixed into every ETag; change it on deploy so pages rendered by the
+    # old templates aren't revalidated.
+    ETAG_SALT = os.environ.get('ETAG_SALT', '')
+    # "fast" serializes jsonify() through app/serialize.py's
+    # FastJSONProvider (orjson when installed); "default" keeps Flask's.
+    JSON_PROVIDER = os.environ.get('JSON_PROVIDER', 'fast')
+    # Text responses at least this many bytes are gzip/brotli-compressed
+    # for clients that accept it (see app/compress.py).
+    COMPRESS_MIN_SIZE = int(os.environ.get('COMPRESS_MIN_SIZE', 1024))
+    COMPRESS_GZIP_LEVEL = int(os.environ.get('COMPRESS_GZIP_LEVEL', 6))
+    COMPRESS_BROTLI_QUALITY = int(os.environ.get('COMPRESS_BROTLI_QUALITY', 5))
+    # Per-request SQL accounting (see app/sqlstats.py): a log line per
+    # request, X-SQL-* headers in debug mode or with SQL_STATS_HEADERS=1,
+    # and a warning when one statement runs more than
+    # SQL_REPEAT_THRESHOLD times in a request.
+    SQL_STATS_LOG = os.environ.get('SQL_STATS_LOG', '1') == '1'
+    SQL_STATS_HEADERS = os.environ.get('SQL_STATS_HEADERS', '0') == '1'
+    SQL_REPEAT_THRESHOLD = int(os.environ.get('SQL_REPEAT_THRESHOLD', 5))
+    # Connection pool (see DB.__init__); timeout and recycle are seconds.
+    # DB_POOL_LIFO hands out the most recently used connection first, so
+    # idle extras age out.  Connections idle longer than
+    # DB_POOL_PING_IDLE seconds, or that saw an error, are pinged before
+    # reuse (0 pings every checkout, -1 never).
+    DB_POOL_SIZE = int(os.environ.get('DB_POOL_SIZE', 5))
+    DB_POOL_MAX_OVERFLOW = int(os.environ.get('DB_POOL_MAX_OVERFLOW', 10))
+    DB_POOL_TIMEOUT = float(os.environ.get('DB_POOL_TIMEOUT', 30))
+    DB_POOL_RECYCLE = int(os.environ.get('DB_POOL_RECYCLE', 3600))
+    DB_POOL_LIFO = os.environ.get('DB_POOL_LIFO', '0') == '1'
+    DB_POOL_PING_IDLE = float(os.environ.get('DB_POOL_PING_IDLE', 30))
+    # Set to 1 behind PgBouncer in transaction mode: no local pool and
+    # no session-level state such as server-side prepared statements.
+    DB_EXTERNAL_POOLER = os.environ.get('DB_EXTERNAL_POOLER', '0') == '1'
+    # Most text() constructs DB keeps for reuse, keyed by SQL (0: none).
+    DB_STATEMENT_CACHE_SIZE = int(os.environ.get('DB_STATEMENT_CACHE_SIZE', 500))
+    # 1 runs the hot lookups that use execute_prepared()/read_prepared()
+    # as server-side prepared statements; ignored with DB_EXTERNAL_POOLER.
+    DB_PREPARED_STATEMENTS = os.environ.get('DB_PREPARED_STATEMENTS', '0') == '1'
+    # Rows per server-side cursor fetch, and per response chunk, for the
+    # streamed CSV / JSON lines exports.
+    EXPORT_BATCH_SIZE = int(os.environ.get('EXPORT_BATCH_SIZE', 1000))
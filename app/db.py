@@ -1,19 +1,394 @@
-from sqlalchemy import create_engine, text
+import hashlib
+import random
+import re
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+
+from sqlalchemy import create_engine, event, text
+from sqlalchemy.exc import DBAPIError, DisconnectionError
+from sqlalchemy.pool import NullPool
+
+
+# SQLSTATEs Postgres raises when a transaction lost a race with a
+# concurrent one (serialization failure, deadlock); the whole transaction
+# is safe to replay.
+RETRYABLE_SQLSTATES = ('40001', '40P01')
+
+
+def is_retryable(exc):
+    """True if exc is a transaction conflict that replaying could fix."""
+    return (isinstance(exc, DBAPIError)
+            and getattr(exc.orig, 'pgcode', None) in RETRYABLE_SQLSTATES)
+
+
+# :name bind parameters, as text() finds them (not :: casts)
+BIND_PARAM = re.compile(r'(?<![:\w\\]):(\w+)(?!:)')
+
+
+class StatementCache:
+    """
+    Bounded LRU of text() constructs keyed by their SQL, so a statement
+    run on every request is parsed for bind parameters once instead of
+    per call.  max_entries 0 disables it.
+    """
+
+    def __init__(self, max_entries):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.stats = {'hits': 0, 'misses': 0, 'evictions': 0}
+
+    def text(self, sqlstr):
+        with self._lock:
+            clause = self._entries.get(sqlstr)
+            if clause is not None:
+                self._entries.move_to_end(sqlstr)
+                self.stats['hits'] += 1
+                return clause
+            self.stats['misses'] += 1
+        clause = text(sqlstr)
+        if self.max_entries > 0:
+            with self._lock:
+                self._entries[sqlstr] = clause
+                while len(self._entries) > self.max_entries:
+                    self._entries.popitem(last=False)
+                    self.stats['evictions'] += 1
+        return clause
+
+    def get_stats(self):
+        with self._lock:
+            stats = dict(self.stats, size=len(self._entries), max_entries=self.max_entries)
+        lookups = stats['hits'] + stats['misses']
+        stats['hit_ratio'] = stats['hits'] / lookups if lookups else None
+        return stats
+
+
+class Transaction:
+    """
+    One pinned connection inside an open transaction.  execute() has the
+    same signature and return values as DB.execute().
+    """
+
+    def __init__(self, conn, db):
+        self.conn = conn
+        self.db = db
+
+    def execute(self, sqlstr, **kwargs):
+        result = self.conn.execute(self.db.statements.text(sqlstr), kwargs)
+        if result.returns_rows:
+            return result.fetchall()
+        else:
+            return result.rowcount
+
+    def execute_prepared(self, sqlstr, **kwargs):
+        """
+        execute() through a server-side prepared statement when
+        DB_PREPARED_STATEMENTS is on: the first use on each connection
+        PREPAREs it, later ones only EXECUTE, so Postgres skips parsing
+        and (once it settles on a generic plan) planning.  For hot,
+        fixed-text queries whose parameter types Postgres can infer.
+        """
+        if not self.db.prepared_statements:
+            return self.execute(sqlstr, **kwargs)
+        name, prepare_sql, params = self.db.prepared_form(sqlstr)
+        # Connection.info lives as long as the DBAPI connection, as does a
+        # PREPARE (which a ROLLBACK doesn't undo)
+        prepared = self.conn.info.setdefault('prepared', set())
+        if name not in prepared:
+            self.conn.exec_driver_sql(prepare_sql)
+            prepared.add(name)
+            self.db.count_prepared('prepares')
+        self.db.count_prepared('executions')
+        return self.execute(f"EXECUTE {name}({', '.join(':' + p for p in params)})"
+                            if params else f'EXECUTE {name}', **kwargs)
+
+    def stream(self, sqlstr, batch_size=1000, **kwargs):
+        """
+        Yield the rows of a query through a server-side cursor, fetching
+        batch_size rows per round trip, so large results are never held in
+        memory at once.
+        """
+        result = self.conn.execute(
+            self.db.statements.text(sqlstr), kwargs,
+            execution_options={'stream_results': True},
+        )
+        # the yield_per execution option doesn't reach a text() result,
+        # and without it partitions() returns everything as one batch
+        for batch in result.yield_per(batch_size).partitions():
+            yield from batch
+
+    def copy_from(self, sqlstr, source):
+        """
+        Run a COPY ... FROM STDIN statement, reading the data from the
+        file-like source.  Returns the number of rows copied.
+        """
+        dbapi = self.conn.dialect.dbapi
+        cursor = self.conn.connection.cursor()
+        try:
+            cursor.copy_expert(sqlstr, source)
+            return cursor.rowcount
+        except dbapi.Error as e:
+            # raise what execute() would have, so callers handle one type
+            raise DBAPIError.instance(sqlstr, None, e, dbapi.Error) from e
+        finally:
+            cursor.close()
 
 
 class DB:
     def __init__(self, app):
+        config = app.config
+        self.external_pooler = config['DB_EXTERNAL_POOLER']
+        if self.external_pooler:
+            # PgBouncer-style transaction pooling: it owns the connections,
+            # so hold none between transactions and keep no session state.
+            pool_options = {'poolclass': NullPool}
+            self.pool_settings = {}
+        else:
+            self.pool_settings = pool_options = {
+                'pool_size': config['DB_POOL_SIZE'],
+                'max_overflow': config['DB_POOL_MAX_OVERFLOW'],
+                'pool_timeout': config['DB_POOL_TIMEOUT'],
+                'pool_recycle': config['DB_POOL_RECYCLE'],
+                'pool_use_lifo': config['DB_POOL_LIFO'],
+            }
         self.engine = create_engine(
-            app.config['SQLALCHEMY_DATABASE_URI'],
-            execution_options={"isolation_level": "SERIALIZABLE"},
-            pool_pre_ping=True,  # Verify connections before using
-            pool_recycle=3600    # Recycle connections every hour
+            config['SQLALCHEMY_DATABASE_URI'],
+            # Plain reads and single-statement writes don't need more than
+            # READ COMMITTED; money and inventory mutations ask for
+            # SERIALIZABLE through run_transaction().
+            execution_options={"isolation_level": "READ COMMITTED"},
+            **pool_options
         )
 
+        # Instead of pool_pre_ping's round trip on every checkout, ping
+        # only connections that sat idle longer than this or saw an error.
+        self.ping_idle = config['DB_POOL_PING_IDLE']
+        self._pool_counts = {'connects': 0, 'pings': 0, 'stale': 0, 'invalidated': 0,
+                             'waits': 0, 'wait_seconds': 0.0, 'max_wait_seconds': 0.0}
+        self._pool_counts_lock = threading.Lock()
+        event.listen(self.engine.pool, 'connect', self._on_connect)
+        event.listen(self.engine.pool, 'checkout', self._on_checkout)
+        event.listen(self.engine.pool, 'checkin', self._on_checkin)
+        event.listen(self.engine.pool, 'invalidate', self._on_invalidate)
+        event.listen(self.engine, 'handle_error', self._on_error)
+
+        self.statements = StatementCache(config['DB_STATEMENT_CACHE_SIZE'])
+        # prepared statements are per-connection state a pooler can't keep
+        self.prepared_statements = config['DB_PREPARED_STATEMENTS'] and not self.external_pooler
+        self._prepared_forms = {}
+        self._prepared_counts = {'prepares': 0, 'executions': 0}
+
+        self.retry_max_attempts = app.config['DB_RETRY_MAX_ATTEMPTS']
+        self.retry_base_delay = app.config['DB_RETRY_BASE_DELAY']
+        self.retry_max_delay = app.config['DB_RETRY_MAX_DELAY']
+        self.retry_stats = {'retries': 0, 'gave_up': 0}
+        self._retry_stats_lock = threading.Lock()
+        # called with the seconds each transaction waited for a connection
+        self.checkout_observers = []
+
     def execute(self, sqlstr, **kwargs):
-        with self.engine.begin() as conn:
-            result = conn.execute(text(sqlstr), kwargs)
-            if result.returns_rows:
-                return result.fetchall()
-            else:
-                return result.rowcount
+        with self.transaction() as tx:
+            return tx.execute(sqlstr, **kwargs)
+
+    def read(self, sqlstr, **kwargs):
+        """
+        Like execute(), but in a READ ONLY, READ COMMITTED transaction.
+        Use for browsing and reporting queries that must never take
+        predicate locks or fail with serialization errors.
+        """
+        with self.transaction(readonly=True) as tx:
+            return tx.execute(sqlstr, **kwargs)
+
+    def stream(self, sqlstr, batch_size=1000, **kwargs):
+        """
+        Like read(), but a generator over the rows, fetched batch_size at a
+        time from a server-side cursor so the whole result is never held
+        in memory.  The connection stays checked out until the generator
+        is exhausted or closed, so consume it promptly.
+        """
+        with self.transaction(readonly=True) as tx:
+            yield from tx.stream(sqlstr, batch_size=batch_size, **kwargs)
+
+    def read_prepared(self, sqlstr, **kwargs):
+        """read() through Transaction.execute_prepared()."""
+        with self.transaction(readonly=True) as tx:
+            return tx.execute_prepared(sqlstr, **kwargs)
+
+    def read_json(self, sqlstr, **kwargs):
+        """
+        Like read(), but Postgres encodes the result: returns the JSON text
+        of an array with one object per row, keyed by the select list's
+        column names, in the query's ORDER BY order.  NUMERIC comes out as
+        exact JSON numbers and timestamps as ISO 8601, with no per-row work
+        in Python; send it with serialize.json_response().
+        """
+        # not json_agg(), which puts a newline between elements.  An
+        # aggregate over a subquery isn't bound to its order, so number the
+        # rows as they come out of it and aggregate in that order.
+        rows = self.read(f"""
+SELECT COALESCE('[' || string_agg(r.doc, ',' ORDER BY r.n) || ']', '[]')
+FROM (SELECT row_to_json(q)::text AS doc, row_number() OVER () AS n
+      FROM ({sqlstr}) AS q) AS r
+""", **kwargs)
+        return rows[0][0]
+
+    @contextmanager
+    def transaction(self, isolation_level=None, readonly=False):
+        """
+        Run several statements as one unit of work:
+
+            with app.db.transaction() as tx:
+                tx.execute(...)
+                tx.execute(...)
+
+        Commits when the block exits normally, rolls back if it raises.
+        isolation_level overrides the engine default for this transaction
+        only.
+        """
+        options = {}
+        if isolation_level is not None:
+            options['isolation_level'] = isolation_level
+        if readonly:
+            options['postgresql_readonly'] = True
+
+        start = time.perf_counter()
+        with self.engine.connect() as conn:
+            waited = time.perf_counter() - start
+            with self._pool_counts_lock:
+                counts = self._pool_counts
+                counts['waits'] += 1
+                counts['wait_seconds'] += waited
+                counts['max_wait_seconds'] = max(counts['max_wait_seconds'], waited)
+            for observe in self.checkout_observers:
+                observe(waited)
+            if options:
+                conn.execution_options(**options)
+            with conn.begin():
+                yield Transaction(conn, self)
+
+    def run_transaction(self, work, isolation_level='SERIALIZABLE', max_attempts=None):
+        """
+        Call work(tx) inside a transaction and return its result.  If
+        Postgres aborts the transaction with a serialization failure or a
+        deadlock, the whole unit of work is replayed after a jittered
+        exponential backoff, so work must not have side effects outside
+        the database.  After max_attempts (DB_RETRY_MAX_ATTEMPTS by
+        default) the last error is re-raised.
+        """
+        if max_attempts is None:
+            max_attempts = self.retry_max_attempts
+        attempt = 1
+        while True:
+            try:
+                with self.transaction(isolation_level=isolation_level) as tx:
+                    return work(tx)
+            except DBAPIError as e:
+                if not is_retryable(e):
+                    raise
+                if attempt >= max_attempts:
+                    self._count_retry('gave_up')
+                    raise
+                self._count_retry('retries')
+                # "full jitter": sleep anywhere up to the exponential cap so
+                # that colliding transactions spread out instead of
+                # colliding again in lockstep
+                cap = min(self.retry_max_delay,
+                          self.retry_base_delay * 2 ** (attempt - 1))
+                time.sleep(random.uniform(0, cap))
+                attempt += 1
+
+    def _count_retry(self, outcome):
+        with self._retry_stats_lock:
+            self.retry_stats[outcome] += 1
+
+    def pool_stats(self):
+        """Pool configuration, occupancy, liveness and wait counters."""
+        with self._pool_counts_lock:
+            stats = dict(self._pool_counts)
+        stats['avg_wait_seconds'] = stats['wait_seconds'] / stats['waits'] if stats['waits'] else None
+        stats['external_pooler'] = self.external_pooler
+        stats['ping_idle'] = self.ping_idle
+        stats.update(self.pool_settings)
+        pool = self.engine.pool
+        # QueuePool only; NullPool holds nothing
+        for name in ('checkedout', 'checkedin', 'overflow'):
+            if hasattr(pool, name):
+                stats[name] = getattr(pool, name)()
+        return stats
+
+    def prepared_form(self, sqlstr):
+        """(name, PREPARE statement, parameter names in $n order) for sqlstr."""
+        form = self._prepared_forms.get(sqlstr)
+        if form is None:
+            params = []
+
+            def positional(match):
+                if match.group(1) not in params:
+                    params.append(match.group(1))
+                return f'${params.index(match.group(1)) + 1}'
+
+            name = 'stmt_' + hashlib.sha1(sqlstr.encode()).hexdigest()[:16]
+            # exec_driver_sql goes straight to psycopg2, which reads % as a placeholder
+            body = BIND_PARAM.sub(positional, sqlstr).replace('%', '%%')
+            form = self._prepared_forms[sqlstr] = (name, f'PREPARE {name} AS {body}', tuple(params))
+        return form
+
+    def count_prepared(self, name):
+        with self._pool_counts_lock:
+            self._prepared_counts[name] += 1
+
+    def statement_stats(self):
+        """The text() cache's counters and prepared statement reuse."""
+        with self._pool_counts_lock:
+            prepared = dict(self._prepared_counts)
+        prepared['enabled'] = self.prepared_statements
+        prepared['statements'] = len(self._prepared_forms)
+        prepared['hit_ratio'] = (1 - prepared['prepares'] / prepared['executions']
+                                 if prepared['executions'] else None)
+        return {'text_cache': self.statements.get_stats(), 'prepared': prepared}
+
+    def _count_pool(self, name):
+        with self._pool_counts_lock:
+            self._pool_counts[name] += 1
+
+    def _on_connect(self, dbapi_conn, record):
+        self._count_pool('connects')
+        # a new server session has none of the old one's PREPAREs
+        record.info.pop('prepared', None)
+
+    def _on_checkin(self, dbapi_conn, record):
+        record.info['idle_since'] = time.monotonic()
+
+    def _on_invalidate(self, dbapi_conn, record, exc):
+        self._count_pool('invalidated')
+
+    def _on_checkout(self, dbapi_conn, record, proxy):
+        idle_since = record.info.pop('idle_since', None)
+        suspect = record.info.pop('suspect', False)
+        if self.ping_idle < 0 or (idle_since is None and not suspect):
+            return
+        if not suspect and time.monotonic() - idle_since <= self.ping_idle:
+            return
+        self._count_pool('pings')
+        try:
+            self.engine.dialect.do_ping(dbapi_conn)
+            # the ping opened a transaction; the checkout must start clean
+            dbapi_conn.rollback()
+        except Exception as e:
+            self._count_pool('stale')
+            # the pool discards this connection and checks out another
+            raise DisconnectionError(f'connection failed its liveness ping: {e}') from e
+
+    def _on_error(self, context):
+        # An error Postgres reported (it has a SQLSTATE) proves the
+        # connection works; anything else gets it pinged on next checkout.
+        if getattr(context.original_exception, 'pgcode', None) is not None:
+            return
+        conn = context.connection
+        if conn is not None and not conn.invalidated:
+            try:
+                conn.info['suspect'] = True
+            except Exception:
+                pass
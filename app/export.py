@@ -0,0 +1,58 @@
+import csv
+import io
+
+from flask import current_app, stream_with_context
+
+
+FORMATS = ('csv', 'jsonl')
+MIMETYPES = {'csv': 'text/csv', 'jsonl': 'application/x-ndjson'}
+
+
+def chunks(fmt, columns, sqlstr, **kwargs):
+    """
+    The result of sqlstr as CSV (with a header of columns) or JSON lines,
+    in text chunks of EXPORT_BATCH_SIZE rows.  Rows come off DB.stream(),
+    so memory use doesn't grow with the result.  For JSON lines Postgres
+    encodes each row, keyed by the select list's column names, and the
+    rows are numbered as sqlstr returns them and sorted on that number, so
+    lines keep its ORDER BY order.
+    """
+    db = current_app.db
+    batch_size = current_app.config['EXPORT_BATCH_SIZE']
+    if fmt == 'jsonl':
+        rows = db.stream(f'''
+SELECT r.doc
+FROM (SELECT row_to_json(q)::text AS doc, row_number() OVER () AS n
+      FROM ({sqlstr}) AS q) AS r
+ORDER BY r.n
+''', batch_size=batch_size, **kwargs)
+        lines = []
+        for (line,) in rows:
+            lines.append(line)
+            if len(lines) == batch_size:
+                yield '\n'.join(lines) + '\n'
+                lines.clear()
+        if lines:
+            yield '\n'.join(lines) + '\n'
+        return
+
+    buf = io.StringIO()
+    writer = csv.writer(buf)
+    writer.writerow(columns)
+    rows = db.stream(sqlstr, batch_size=batch_size, **kwargs)
+    for n, row in enumerate(rows, 1):
+        writer.writerow(row)
+        if n % batch_size == 0:
+            yield buf.getvalue()
+            buf.seek(0)
+            buf.truncate()
+    yield buf.getvalue()
+
+
+def download(fmt, basename, body):
+    """A streamed attachment response for chunks() output."""
+    return current_app.response_class(
+        stream_with_context(body),
+        mimetype=MIMETYPES[fmt],
+        headers={'Content-Disposition': f'attachment; filename={basename}.{fmt}'},
+    )
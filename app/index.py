@@ -1,26 +1,16 @@
-from flask import render_template, current_app
+from functools import wraps
+
+from flask import render_template, current_app, jsonify, abort
 from flask_login import current_user
 from flask import Blueprint
+from .models.product import Product
 
 bp = Blueprint('index', __name__)
 
 @bp.route('/')
 def index():
-    db = current_app.db
-    # Get each product's name and display price (lowest seller price if available, else product price)
-    products = db.execute("""
-        SELECT 
-            p.id, 
-            p.name,
-            COALESCE(
-                (SELECT MIN(i.seller_price) FROM Inventory i WHERE i.product_id = p.id AND i.quantity > 0),
-                p.price
-            ) AS display_price
-        FROM Products p
-        WHERE p.available = 'true'
-        LIMIT 5
-    """)
-    avail_products = [dict(zip(['id', 'name', 'display_price'], row)) for row in products]
+    # name and display price (lowest in-stock seller price, else list price)
+    avail_products = Product.get_available_preview()
 
     if current_user.is_authenticated:
         try:
@@ -44,4 +34,39 @@ def index():
         purchase_history = None
     return render_template('index.html',
                           avail_products=avail_products,
-                          purchase_history=purchase_history)
\ No newline at end of file
+                          purchase_history=purchase_history)
+
+
+def internal(view):
+    """Serve view only in debug mode or with STATS_ENDPOINTS; 404 otherwise."""
+    @wraps(view)
+    def wrapped(*args, **kwargs):
+        if not (current_app.debug or current_app.config['STATS_ENDPOINTS']):
+            abort(404)
+        return view(*args, **kwargs)
+    return wrapped
+
+
+@bp.route('/api/cache/stats')
+@internal
+def cache_stats():
+    return jsonify(success=True, cache=current_app.cache.get_stats())
+
+
+@bp.route('/api/db/pool/stats')
+@internal
+def pool_stats():
+    return jsonify(success=True, pool=current_app.db.pool_stats())
+
+
+@bp.route('/api/db/statements/stats')
+@internal
+def statement_stats():
+    return jsonify(success=True, statements=current_app.db.statement_stats())
+
+
+@bp.route('/api/sql/stats')
+@internal
+def sql_stats():
+    """Statements, DB time and rows per endpoint since the process started."""
+    return jsonify(success=True, endpoints=current_app.sql_stats.get_stats())
@@ -0,0 +1,200 @@
+import bisect
+import threading
+import time
+
+from flask import g, request
+
+from .index import internal
+
+
+# seconds; roughly doubling from 5 ms to 10 s
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+POOL_WAIT_BUCKETS = (0.0005, 0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 5.0)
+
+CHECKOUT_OUTCOMES = ('success', 'empty_cart', 'insufficient_stock',
+                     'insufficient_balance', 'busy', 'error')
+
+
+def _labels(names, values):
+    if not names:
+        return ''
+    pairs = ','.join('{}="{}"'.format(name, str(value).replace('\\', r'\\').replace('"', r'\"'))
+                     for name, value in zip(names, values))
+    return '{' + pairs + '}'
+
+
+class Counter:
+    def __init__(self, name, help, labels=()):
+        self.name, self.help, self.labels = name, help, labels
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, *label_values, amount=1):
+        with self._lock:
+            self._values[label_values] = self._values.get(label_values, 0) + amount
+
+    def render(self):
+        lines = [f'# HELP {self.name} {self.help}', f'# TYPE {self.name} counter']
+        with self._lock:
+            values = sorted(self._values.items())
+        lines += [f'{self.name}{_labels(self.labels, key)} {value}' for key, value in values]
+        return lines
+
+
+class Gauge(Counter):
+    def set(self, *label_values, value):
+        with self._lock:
+            self._values[label_values] = value
+
+    def render(self):
+        lines = super().render()
+        lines[1] = f'# TYPE {self.name} gauge'
+        return lines
+
+
+class Histogram:
+    def __init__(self, name, help, buckets, labels=()):
+        self.name, self.help, self.labels = name, help, labels
+        self.buckets = buckets
+        self._series = {}  # label values -> [per-bucket counts..., +Inf count, sum]
+        self._lock = threading.Lock()
+
+    def observe(self, value, *label_values):
+        i = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(label_values)
+            if series is None:
+                series = self._series[label_values] = [0] * (len(self.buckets) + 2)
+            series[i] += 1
+            series[-1] += value
+
+    def render(self):
+        lines = [f'# HELP {self.name} {self.help}', f'# TYPE {self.name} histogram']
+        with self._lock:
+            series = sorted((key, list(values)) for key, values in self._series.items())
+        names = self.labels + ('le',)
+        for key, values in series:
+            # stored per bucket, exposed cumulatively
+            cumulative = 0
+            for bound, count in zip(self.buckets + ('+Inf',), values):
+                cumulative += count
+                lines.append(f'{self.name}_bucket{_labels(names, key + (bound,))} {cumulative}')
+            lines.append(f'{self.name}_sum{_labels(self.labels, key)} {values[-1]}')
+            lines.append(f'{self.name}_count{_labels(self.labels, key)} {cumulative}')
+        return lines
+
+
+class Metrics:
+    """
+    Request, database and cache metrics for this process, served in the
+    Prometheus text format at /metrics.  Per request this costs two clock
+    reads and a bucket increment under a lock; pool, cache and retry
+    numbers are read only when /metrics is scraped.  Like app.cache, each
+    worker process keeps its own numbers, so scrape every worker.  Like the
+    /api/.../stats views, /metrics is a 404 outside debug mode unless
+    STATS_ENDPOINTS is set.
+    """
+
+    def __init__(self, app):
+        self.app = app
+        self.requests = Counter(
+            'http_requests_total', 'Requests by endpoint, method and status.',
+            ('endpoint', 'method', 'status'))
+        self.latency = Histogram(
+            'http_request_duration_seconds', 'Request latency by endpoint.',
+            LATENCY_BUCKETS, ('endpoint', 'method'))
+        self.in_flight = Gauge('http_requests_in_flight', 'Requests being handled now.')
+        self._in_flight = 0
+        self._in_flight_lock = threading.Lock()
+        self.pool_wait = Histogram(
+            'db_pool_checkout_wait_seconds',
+            'Time to get a connection from the pool, including any reconnect.',
+            POOL_WAIT_BUCKETS)
+        self.checkouts = Counter('checkout_total', 'Checkout attempts by outcome.', ('outcome',))
+        for outcome in CHECKOUT_OUTCOMES:
+            self.checkouts.inc(outcome, amount=0)
+        self.checkout_retries = Counter(
+            'checkout_retries_total', 'Checkout transactions replayed after a conflict.')
+        self.checkout_retries.inc(amount=0)
+
+        app.db.checkout_observers.append(self.pool_wait.observe)
+        app.before_request(self._before_request)
+        app.after_request(self._after_request)
+        app.teardown_request(self._teardown_request)
+        app.add_url_rule('/metrics', 'metrics', internal(self._view))
+
+    def _before_request(self):
+        g.metrics_start = time.perf_counter()
+        g.metrics_status = 500
+        with self._in_flight_lock:
+            self._in_flight += 1
+
+    def _after_request(self, response):
+        g.metrics_status = response.status_code
+        return response
+
+    def _teardown_request(self, exc):
+        start = g.pop('metrics_start', None)
+        if start is None:
+            return
+        with self._in_flight_lock:
+            self._in_flight -= 1
+        endpoint = request.endpoint or 'unmatched'
+        self.latency.observe(time.perf_counter() - start, endpoint, request.method)
+        self.requests.inc(endpoint, request.method, g.pop('metrics_status', 500))
+
+    def checkout_outcome(self, outcome, retries=0):
+        """Count one Checkout.place_order call and the replays it took."""
+        self.checkouts.inc(outcome)
+        if retries:
+            self.checkout_retries.inc(amount=retries)
+
+    def render(self):
+        self.in_flight.set(value=self._in_flight)
+        lines = []
+        for metric in (self.requests, self.latency, self.in_flight, self.pool_wait,
+                       self.checkouts, self.checkout_retries):
+            lines += metric.render()
+        lines += self._pool_lines()
+        lines += self._stats_lines()
+        return '\n'.join(lines) + '\n'
+
+    def _pool_lines(self):
+        pool = self.app.db.pool_stats()
+        lines = []
+        for name, key, kind, help in (
+                ('db_pool_size', 'pool_size', 'gauge', 'Connections the pool keeps open.'),
+                ('db_pool_max_overflow', 'max_overflow', 'gauge', 'Extra connections allowed.'),
+                ('db_pool_checked_out', 'checkedout', 'gauge', 'Connections in use.'),
+                ('db_pool_checked_in', 'checkedin', 'gauge', 'Idle connections in the pool.'),
+                ('db_pool_overflow', 'overflow', 'gauge',
+                 'Connections beyond the pool size (negative until the pool fills).'),
+                ('db_pool_connects_total', 'connects', 'counter', 'New database connections.'),
+                ('db_pool_pings_total', 'pings', 'counter', 'Liveness pings on checkout.'),
+                ('db_pool_stale_total', 'stale', 'counter', 'Connections that failed a ping.'),
+                ('db_pool_invalidated_total', 'invalidated', 'counter', 'Connections discarded.')):
+            # NullPool (DB_EXTERNAL_POOLER) has no size or occupancy
+            if key in pool:
+                lines += [f'# HELP {name} {help}', f'# TYPE {name} {kind}', f'{name} {pool[key]}']
+        return lines
+
+    def _stats_lines(self):
+        cache = self.app.cache.get_stats()
+        retries = self.app.db.retry_stats
+        lines = []
+        for name, kind, help, value in (
+                ('cache_hits_total', 'counter', 'app.cache lookups served from memory.', cache['hits']),
+                ('cache_misses_total', 'counter', 'app.cache lookups that loaded.', cache['misses']),
+                ('cache_evictions_total', 'counter', 'app.cache LRU evictions.', cache['evictions']),
+                ('cache_entries', 'gauge', 'Entries in app.cache.', cache['size']),
+                ('cache_hit_ratio', 'gauge', 'app.cache hits / lookups.',
+                 cache['hit_ratio'] if cache['hit_ratio'] is not None else 'NaN'),
+                ('db_transaction_retries_total', 'counter',
+                 'run_transaction replays after a conflict.', retries['retries']),
+                ('db_transaction_gave_up_total', 'counter',
+                 'run_transaction calls that ran out of attempts.', retries['gave_up'])):
+            lines += [f'# HELP {name} {help}', f'# TYPE {name} {kind}', f'{name} {value}']
+        return lines
+
+    def _view(self):
+        return self.app.response_class(self.render(), content_type='text/plain; version=0.0.4; charset=utf-8')
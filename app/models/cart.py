@@ -0,0 +1,140 @@
+# app/models/cart.py
+from flask import current_app as app
+
+
+class CartError(Exception):
+    """
+    Raised inside a cart batch when one of its operations can't be
+    applied.  Raising rolls back the operations before it.
+    """
+
+    def __init__(self, index, error, message):
+        super().__init__(message)
+        self.index = index
+        self.error = error
+        self.message = message
+
+    def to_dict(self):
+        return dict(error=self.error, message=self.message, op_index=self.index)
+
+
+class Cart:
+    # most operations one /api/cart/batch call may carry
+    MAX_BATCH_OPS = 100
+    OPS = ('add', 'update', 'remove', 'save', 'unsave')
+
+    @staticmethod
+    def get(uid, tx=None):
+        """
+        The user's (active, saved) cart lines, from one query over
+        CartItems split on the saved flag.
+        """
+        execute = tx.execute_prepared if tx is not None else app.db.read_prepared
+        rows = execute('''
+SELECT c.saved, c.pid, c.seller_id, p.name,
+       COALESCE(i.seller_price, p.price) AS price,
+       c.quantity, p.image_url
+FROM CartItems c
+JOIN Products p ON c.pid = p.id
+LEFT JOIN Inventory i
+       ON c.seller_id = i.seller_id
+      AND c.pid = i.product_id
+WHERE c.uid = :uid
+ORDER BY c.saved, c.id
+''', uid=uid)
+        active, saved = [], []
+        for r in rows:
+            (saved if r[0] else active).append(dict(
+                pid=r[1], seller_id=r[2], name=r[3], price=r[4],
+                quantity=r[5], image_url=r[6]))
+        return active, saved
+
+    @staticmethod
+    def parse_ops(ops):
+        """
+        Validate a batch: a list of {"op", "pid", "seller_id", "quantity"}
+        dicts.  Returns them normalised (ints, quantity >= 1) or raises
+        CartError naming the first bad one.
+        """
+        if not isinstance(ops, list):
+            raise CartError(None, 'invalid_batch', 'ops must be a list')
+        if len(ops) > Cart.MAX_BATCH_OPS:
+            raise CartError(None, 'invalid_batch', f'at most {Cart.MAX_BATCH_OPS} ops per batch')
+
+        parsed = []
+        for index, op in enumerate(ops):
+            if not isinstance(op, dict) or op.get('op') not in Cart.OPS:
+                raise CartError(index, 'invalid_op', f"op must be one of {', '.join(Cart.OPS)}")
+            try:
+                pid = int(op.get('pid') if op.get('pid') is not None else op.get('product_id'))
+                seller_id = op.get('seller_id')
+                # add may leave the seller to us; everything else names a line
+                if seller_id in (None, '') and op['op'] == 'add':
+                    seller_id = None
+                else:
+                    seller_id = int(seller_id)
+            except (TypeError, ValueError):
+                raise CartError(index, 'invalid_op', 'pid and seller_id must be integers')
+            try:
+                quantity = max(1, int(op.get('quantity') or 1))
+            except (TypeError, ValueError):
+                quantity = 1
+            parsed.append(dict(op=op['op'], pid=pid, seller_id=seller_id, quantity=quantity))
+        return parsed
+
+    @staticmethod
+    def apply(tx, uid, ops):
+        """
+        Apply parsed ops in order inside tx.  Returns a result per op:
+        the line it touched and whether a row changed.
+        """
+        results = []
+        for index, op in enumerate(ops):
+            pid, seller_id, quantity = op['pid'], op['seller_id'], op['quantity']
+            if op['op'] == 'add':
+                if seller_id is None:
+                    row = tx.execute('''
+SELECT seller_id FROM Inventory
+WHERE product_id = :pid AND quantity > 0
+ORDER BY seller_id LIMIT 1
+''', pid=pid)
+                    if not row:
+                        raise CartError(index, 'no_seller', f'No seller with stock for product {pid}')
+                    seller_id = row[0][0]
+                changed = tx.execute('''
+INSERT INTO CartItems (uid, pid, seller_id, quantity)
+VALUES (:uid, :pid, :seller_id, :quantity)
+ON CONFLICT (uid, pid, seller_id) DO UPDATE
+   SET quantity = CartItems.quantity + :quantity
+''', uid=uid, pid=pid, seller_id=seller_id, quantity=quantity)
+            elif op['op'] == 'update':
+                changed = tx.execute('''
+UPDATE CartItems SET quantity = :quantity
+WHERE uid = :uid AND pid = :pid AND seller_id = :seller_id
+''', uid=uid, pid=pid, seller_id=seller_id, quantity=quantity)
+            elif op['op'] == 'remove':
+                changed = tx.execute('''
+DELETE FROM CartItems WHERE uid = :uid AND pid = :pid AND seller_id = :seller_id
+''', uid=uid, pid=pid, seller_id=seller_id)
+            else:
+                changed = tx.execute('''
+UPDATE CartItems SET saved = :saved
+WHERE uid = :uid AND pid = :pid AND seller_id = :seller_id
+''', uid=uid, pid=pid, seller_id=seller_id, saved=op['op'] == 'save')
+            results.append(dict(op=op['op'], pid=pid, seller_id=seller_id, changed=changed > 0))
+        return results
+
+    @staticmethod
+    def batch(uid, ops):
+        """
+        Apply a parsed batch in one transaction and read back both carts
+        in it.  Returns (results, active, saved); raises CartError (and
+        nothing is applied) if any op fails.
+        """
+        def work(tx):
+            results = Cart.apply(tx, uid, ops)
+            active, saved = Cart.get(uid, tx=tx)
+            return results, active, saved
+
+        # default isolation; run_transaction still replays on deadlock
+        return app.db.run_transaction(work, isolation_level=None)
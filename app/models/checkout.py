@@ -0,0 +1,238 @@
+# app/models/checkout.py
+from decimal import Decimal, ROUND_HALF_UP
+
+from flask import current_app as app
+
+from ..db import is_retryable
+from .user import User
+
+
+CENT = Decimal('0.01')
+
+
+class CheckoutError(Exception):
+    """
+    Raised inside the checkout transaction when the order can't be placed.
+    Raising rolls back every reservation made so far.
+    """
+
+    def __init__(self, error, message, **details):
+        super().__init__(message)
+        self.error = error
+        self.message = message
+        self.details = details
+
+    def to_dict(self):
+        return dict(error=self.error, message=self.message, **self.details)
+
+
+class Checkout:
+    """
+    Set-based checkout: the number of statements is fixed no matter how
+    many lines are in the cart.
+    """
+
+    @staticmethod
+    def place_order(uid, coupon=None):
+        attempts = 0
+
+        def work(tx):
+            nonlocal attempts
+            attempts += 1
+            return Checkout._place_order(tx, uid, coupon)
+
+        # SERIALIZABLE so two checkouts can't both spend the same stock or
+        # balance; run_transaction replays the whole order on conflict.
+        try:
+            result, seller_ids = app.db.run_transaction(work)
+        except CheckoutError as e:
+            app.metrics.checkout_outcome(e.error, attempts - 1)
+            raise
+        except Exception as e:
+            app.metrics.checkout_outcome('busy' if is_retryable(e) else 'error', max(attempts - 1, 0))
+            raise
+        app.metrics.checkout_outcome('success', attempts - 1)
+        # the buyer was debited and every seller credited
+        User.invalidate(uid, *seller_ids)
+        app.logger.debug(
+            f"checkout_success uid={uid} order_id={result['order_id']} total={result['total']}"
+        )
+        return result
+
+    @staticmethod
+    def _place_order(tx, uid, coupon):
+        # 1. Pick a seller for every cart line (the stored seller if they
+        #    still have enough stock, otherwise the lowest seller_id that
+        #    does) and decrement Inventory for all lines at once.  Lines
+        #    for the same product can fall back to the same seller, so a
+        #    fallback is checked against the running total of those lines'
+        #    demand, never against one line alone.
+        lines = tx.execute('''
+WITH cart AS (
+    SELECT c.pid, c.seller_id, c.quantity
+    FROM CartItems c
+    WHERE c.uid = :uid
+),
+stock AS (
+    SELECT i.product_id AS pid, i.seller_id, i.quantity,
+           COALESCE(i.seller_price, p.price) AS price
+    FROM Inventory i
+    JOIN Products p ON p.id = i.product_id
+    WHERE i.product_id IN (SELECT pid FROM cart)
+),
+-- (uid, pid, seller_id) is the cart's key, so no two kept lines share a
+-- stock row
+kept AS (
+    SELECT cart.pid, cart.seller_id AS preferred_seller_id, cart.quantity,
+           s.seller_id, s.price
+    FROM cart
+    JOIN stock s
+      ON s.pid = cart.pid
+     AND s.seller_id = cart.seller_id
+     AND s.quantity >= cart.quantity
+),
+moved AS (
+    SELECT cart.pid, cart.seller_id AS preferred_seller_id, cart.quantity,
+           SUM(cart.quantity) OVER (PARTITION BY cart.pid ORDER BY cart.seller_id) AS running
+    FROM cart
+    WHERE NOT EXISTS (
+        SELECT 1 FROM kept
+        WHERE kept.pid = cart.pid AND kept.preferred_seller_id = cart.seller_id)
+),
+-- a moved line takes the lowest seller_id whose stock left over from kept
+-- lines covers every moved line of that product up to this one, so the
+-- lines a seller ends up with never add up to more than it has
+choice AS (
+    SELECT pid, preferred_seller_id, quantity, seller_id, price
+    FROM kept
+    UNION ALL
+    (SELECT DISTINCT ON (m.pid, m.preferred_seller_id)
+            m.pid, m.preferred_seller_id, m.quantity, s.seller_id, s.price
+     FROM moved m
+     JOIN stock s ON s.pid = m.pid
+     LEFT JOIN kept k ON k.pid = s.pid AND k.seller_id = s.seller_id
+     WHERE s.quantity - COALESCE(k.quantity, 0) >= m.running
+     ORDER BY m.pid, m.preferred_seller_id, s.seller_id)
+),
+demand AS (
+    SELECT seller_id, pid, SUM(quantity) AS quantity
+    FROM choice
+    GROUP BY seller_id, pid
+),
+reserved AS (
+    UPDATE Inventory i
+    SET quantity = i.quantity - demand.quantity
+    FROM demand
+    WHERE i.seller_id = demand.seller_id
+      AND i.product_id = demand.pid
+      AND i.quantity >= demand.quantity
+    RETURNING i.seller_id, i.product_id
+)
+SELECT cart.pid,
+       cart.seller_id AS preferred_seller_id,
+       cart.quantity,
+       choice.seller_id,
+       choice.price,
+       reserved.seller_id IS NOT NULL AS is_reserved
+FROM cart
+LEFT JOIN choice
+       ON choice.pid = cart.pid
+      AND choice.preferred_seller_id = cart.seller_id
+LEFT JOIN reserved
+       ON reserved.seller_id = choice.seller_id
+      AND reserved.product_id = choice.pid
+ORDER BY cart.pid, cart.seller_id
+''', uid=uid)
+
+        if not lines:
+            raise CheckoutError('empty_cart', 'Cart is empty')
+
+        for pid, preferred_seller_id, _qty, _seller_id, _price, is_reserved in lines:
+            if not is_reserved:
+                app.logger.debug(
+                    f"checkout_insufficient_stock pid={pid} preferred={preferred_seller_id} uid={uid}"
+                )
+                raise CheckoutError(
+                    'insufficient_stock',
+                    f"Insufficient stock for product {pid}."
+                )
+
+        subtotal = sum((Decimal(line.price) * line.quantity for line in lines), Decimal(0))
+        subtotal = subtotal.quantize(CENT, rounding=ROUND_HALF_UP)
+
+        # Simple coupon: SAVE10 = 10% off entire cart
+        discount = Decimal(0)
+        if coupon == "SAVE10":
+            discount = (subtotal * Decimal('0.10')).quantize(CENT, rounding=ROUND_HALF_UP)
+        total = max(subtotal - discount, Decimal(0))
+
+        # 2. Debit the buyer; the WHERE clause doubles as the balance check.
+        debited = tx.execute('''
+UPDATE Users
+SET balance = COALESCE(balance, 0) - :total
+WHERE id = :uid AND COALESCE(balance, 0) >= :total
+RETURNING balance
+''', uid=uid, total=total)
+
+        if not debited:
+            row = tx.execute(
+                "SELECT COALESCE(balance, 0) FROM Users WHERE id = :uid", uid=uid
+            )
+            balance = Decimal(row[0][0]) if row else Decimal(0)
+            app.logger.debug(
+                f"checkout_insufficient_balance uid={uid} balance={balance} total={total}"
+            )
+            raise CheckoutError(
+                'insufficient_balance',
+                (f"Not able to checkout: insufficient account balance "
+                 f"(${balance:.2f}) for cart total (${total:.2f})."),
+                balance=float(balance),
+                total=float(total),
+            )
+
+        # 3. Create the order and all of its line items in one statement.
+        order_id = tx.execute('''
+WITH new_order AS (
+    INSERT INTO Orders (user_id, total_amount)
+    VALUES (:uid, :total)
+    RETURNING id
+),
+new_items AS (
+    INSERT INTO OrderItems (order_id, product_id, seller_id, quantity, price)
+    SELECT new_order.id, line.product_id, line.seller_id, line.quantity, line.price
+    FROM new_order,
+         unnest(CAST(:product_ids AS INT[]),
+            CAST(:seller_ids AS INT[]),
+            CAST(:quantities AS INT[]),
+            CAST(:prices AS NUMERIC[]))
+           AS line(product_id, seller_id, quantity, price)
+)
+SELECT id FROM new_order
+''', uid=uid, total=total,
+            product_ids=[line.pid for line in lines],
+            seller_ids=[line.seller_id for line in lines],
+            quantities=[line.quantity for line in lines],
+            prices=[line.price for line in lines])[0][0]
+
+        # 4. Credit every seller with one aggregated update.
+        tx.execute('''
+UPDATE Users u
+SET balance = COALESCE(u.balance, 0) + credit.amount
+FROM (
+    SELECT seller_id, SUM(quantity * price) AS amount
+    FROM OrderItems
+    WHERE order_id = :order_id
+    GROUP BY seller_id
+) credit
+WHERE u.id = credit.seller_id
+''', order_id=order_id)
+
+        # 5. Empty cart
+        tx.execute("DELETE FROM CartItems WHERE uid = :uid", uid=uid)
+
+        return {
+            'order_id': order_id,
+            'total': float(total),
+            'discount': float(discount),
+            'new_balance': float(debited[0][0]),
+        }, {line.seller_id for line in lines}
@@ -1,7 +1,19 @@
 # app/models/inventory.py
+import io
+import json
+import shutil
+import tempfile
+
 from flask import current_app as app
 
+from .. import export
+
 class Inventory:
+    # columns of a bulk import / export file, in order
+    IMPORT_COLUMNS = ('product_id', 'quantity', 'seller_price')
+    # bytes of an import file kept in memory before spooling to disk
+    IMPORT_SPOOL_MEMORY = 8 * 1024 * 1024
+
     @staticmethod
     def get_for_product(pid):
         rows = app.db.execute('''
@@ -12,4 +24,168 @@ WHERE I.product_id = :pid
 ORDER BY I.seller_price ASC
 ''', pid=pid)
         return [dict(seller_id=r[0], quantity=r[1], seller_price=r[2], firstname=r[3], lastname=r[4]) for r in rows] if rows else []
-    
\ No newline at end of file
+
+    @staticmethod
+    def bulk_import(seller_id, source, fmt='csv'):
+        """
+        Add or update many of a seller's listings at once.  source is a
+        binary file-like object holding either CSV with a
+        product_id,quantity,seller_price header (fmt='csv') or one JSON
+        object with those keys per line (fmt='jsonl').
+
+        The rows are COPYed into a temp table as text and applied with a
+        single INSERT ... ON CONFLICT DO UPDATE, which also produces the
+        per-row report: a list of {row, product_id, result, error} in file
+        order, where result is 'inserted', 'updated' or 'error'.  Bad rows
+        are reported and skipped; a malformed CSV aborts the whole import
+        with the database error.  The file is spooled first so that a
+        conflicted transaction can be replayed.
+        """
+        # run_transaction may replay the import, and the request body can
+        # only be read once, so keep a rewindable copy
+        spooled = tempfile.SpooledTemporaryFile(max_size=Inventory.IMPORT_SPOOL_MEMORY)
+        shutil.copyfileobj(source, spooled)
+
+        def work(tx):
+            spooled.seek(0)
+            tx.execute('''
+CREATE TEMP TABLE inventory_import (
+    row_number INT GENERATED ALWAYS AS IDENTITY,
+    product_id TEXT,
+    quantity TEXT,
+    seller_price TEXT,
+    error TEXT
+) ON COMMIT DROP
+''')
+            # COPY keeps the input order, so row_number is the data row
+            if fmt == 'jsonl':
+                tx.copy_from('COPY inventory_import (product_id, quantity, seller_price, error) '
+                             'FROM STDIN WITH (FORMAT csv)', _JsonLinesAsCsv(spooled))
+            else:
+                tx.copy_from('COPY inventory_import (product_id, quantity, seller_price) '
+                             'FROM STDIN WITH (FORMAT csv, HEADER true)', spooled)
+
+            rows = tx.execute(r'''
+WITH parsed AS (
+    SELECT row_number, product_id AS raw_product_id, error AS parse_error,
+           CASE WHEN product_id ~ '^\s*\d{1,9}\s*$' THEN product_id::int END AS product_id,
+           CASE WHEN quantity ~ '^\s*-?\d{1,9}\s*$' THEN quantity::int END AS quantity,
+           CASE WHEN seller_price ~ '^\s*-?(\d{1,10}(\.\d*)?|\.\d+)\s*$'
+                THEN round(seller_price::numeric, 2) END AS seller_price,
+           quantity IS NULL AS no_quantity,
+           seller_price IS NULL AS no_price
+    FROM inventory_import
+),
+validated AS (
+    SELECT parsed.*,
+           CASE
+               WHEN parsed.parse_error IS NOT NULL THEN parsed.parse_error
+               WHEN parsed.product_id IS NULL THEN 'invalid product_id'
+               WHEN parsed.no_quantity THEN 'quantity required'
+               WHEN parsed.quantity IS NULL THEN 'invalid quantity'
+               WHEN parsed.quantity < 0 THEN 'quantity cannot be negative'
+               WHEN NOT parsed.no_price AND parsed.seller_price IS NULL THEN 'invalid seller_price'
+               WHEN parsed.seller_price < 0 THEN 'price cannot be negative'
+               WHEN p.id IS NULL THEN 'product does not exist'
+               WHEN NOT p.available AND i.product_id IS NULL THEN 'product is not available for sale'
+           END AS error
+    FROM parsed
+    LEFT JOIN Products p ON p.id = parsed.product_id
+    LEFT JOIN Inventory i ON i.seller_id = :seller_id AND i.product_id = parsed.product_id
+),
+-- duplicates are ranked among valid rows only, so a later row that fails
+-- its checks doesn't knock out an earlier one that would have been kept
+checked AS (
+    SELECT row_number, raw_product_id, product_id, quantity, seller_price,
+           CASE
+               WHEN error IS NOT NULL THEN error
+               WHEN row_number() OVER (PARTITION BY product_id, error IS NULL
+                                       ORDER BY row_number DESC) > 1
+                   THEN 'duplicate product_id (a later row wins)'
+           END AS error
+    FROM validated
+),
+merged AS (
+    INSERT INTO Inventory (seller_id, product_id, quantity, seller_price)
+    SELECT :seller_id, product_id, quantity, seller_price
+    FROM checked
+    WHERE error IS NULL
+    ON CONFLICT (seller_id, product_id) DO UPDATE
+    SET quantity = EXCLUDED.quantity,
+        seller_price = EXCLUDED.seller_price
+    RETURNING product_id, xmax = 0 AS inserted
+)
+SELECT c.row_number, COALESCE(c.product_id::text, c.raw_product_id),
+       CASE WHEN c.error IS NOT NULL THEN 'error'
+            WHEN m.inserted THEN 'inserted'
+            ELSE 'updated' END,
+       c.error
+FROM checked c
+LEFT JOIN merged m ON m.product_id = c.product_id AND c.error IS NULL
+ORDER BY c.row_number
+''', seller_id=seller_id)
+            return [dict(row=r[0], product_id=r[1], result=r[2], error=r[3]) for r in rows]
+
+        try:
+            # SERIALIZABLE like the other inventory writes, so a checkout or
+            # edit racing the import is replayed instead of failing it
+            return app.db.run_transaction(work)
+        finally:
+            spooled.close()
+
+    @staticmethod
+    def export(seller_id, fmt='csv'):
+        """
+        The seller's inventory as CSV or JSON lines text chunks, in the
+        format bulk_import reads, for streaming into a response.
+        """
+        return export.chunks(fmt, Inventory.IMPORT_COLUMNS, '''
+SELECT product_id, quantity, seller_price
+FROM Inventory
+WHERE seller_id = :seller_id
+ORDER BY product_id
+''', seller_id=seller_id)
+
+
+class _JsonLinesAsCsv(io.RawIOBase):
+    """
+    Read-only stream that turns JSON lines into the CSV rows COPY expects
+    (product_id, quantity, seller_price, error).  A line that isn't a JSON
+    object becomes a row carrying only the error, so it keeps its place in
+    the report.
+    """
+
+    def __init__(self, source):
+        self.lines = iter(source)
+        self.pending = b''
+
+    def readable(self):
+        return True
+
+    def readinto(self, b):
+        while not self.pending:
+            line = next(self.lines, None)
+            if line is None:
+                return 0
+            if line.strip():
+                self.pending = self._to_csv(line)
+        n = min(len(b), len(self.pending))
+        b[:n] = self.pending[:n]
+        self.pending = self.pending[n:]
+        return n
+
+    @staticmethod
+    def _to_csv(line):
+        try:
+            obj = json.loads(line)
+            if not isinstance(obj, dict):
+                raise ValueError
+            values = [obj.get(col) for col in Inventory.IMPORT_COLUMNS]
+            error = None
+        except ValueError:
+            values = [None, None, None]
+            error = 'invalid JSON object'
+        # None -> an unquoted empty field, which COPY reads as NULL
+        fields = ['' if v is None else '"' + str(v).replace('"', '""') + '"'
+                  for v in values + [error]]
+        return (','.join(fields) + '\n').encode()
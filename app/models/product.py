@@ -1,8 +1,15 @@
+import json
+import re
+
 from flask import current_app as app
 
+from ..pagination import encode_cursor, decode_cursor, cursor_key
+from .review import Review
+
 
 class Product:
-    def __init__(self, id, name, price, available, category, description, image_url, creator_id=None, total_sold=0):
+    def __init__(self, id, name, price, available, category, description, image_url, creator_id=None, total_sold=0,
+                 avg_rating=None):
         self.id = id
         self.name = name
         self.price = price
@@ -11,26 +18,37 @@ class Product:
         self.description = description
         self.image_url = image_url
         self.creator_id = creator_id
-        self.avg_rating = None
+        self.avg_rating = float(avg_rating) if avg_rating is not None else None
         self.total_sold = int(total_sold) if total_sold is not None else 0
 
+    # get_page sort -> (sort key, tiebreaker, SQL type of the key).  Each
+    # pair is backed by a (key, id) index (db/migrations/003_keyset_indexes.sql).
+    SORT_KEYS = {
+        'price': ('PS.min_price', 'PS.product_id', 'NUMERIC'),
+        'name': ('lower(P.name)', 'P.id', 'TEXT'),
+        'id': ('P.id', 'P.id', 'INT'),
+        'rating': ('COALESCE(PS.avg_rating, 0)', 'PS.product_id', 'NUMERIC'),
+        'sales': ('PS.total_sold', 'PS.product_id', 'INT'),
+    }
+
     @staticmethod
-    def _base_select():
-        return '''
+    def _base_select(extra_columns=''):
+        # price, total_sold and avg_rating come from ProductStats, which
+        # triggers keep current (db/migrations/002_product_stats.sql)
+        return f'''
 SELECT
   P.id,
   P.name,
-  COALESCE(
-    (SELECT MIN(i.seller_price) FROM Inventory i WHERE i.product_id = P.id AND i.quantity > 0),
-    P.price
-  )::numeric AS price,
+  PS.min_price AS price,
   P.available,
   COALESCE(C.name, '') AS category,
   P.description,
   P.image_url,
   P.creator_id,
-  COALESCE((SELECT SUM(oi.quantity) FROM OrderItems oi WHERE oi.product_id = P.id), 0) AS total_sold
+  PS.total_sold,
+  PS.avg_rating{extra_columns}
 FROM Products P
+JOIN ProductStats PS ON PS.product_id = P.id
 LEFT JOIN Categories C ON P.category_id = C.id
 '''
 
@@ -41,16 +59,78 @@ LEFT JOIN Categories C ON P.category_id = C.id
             r.extend([None, 0])
         elif len(r) == 8:
             r.append(0)
+        if len(r) == 9:
+            r.append(None)
         return r
 
     @staticmethod
     def get(id):
-        rows = app.db.execute(Product._base_select() + 'WHERE P.id = :id', id=id)
+        rows = app.db.read_prepared(Product._base_select() + 'WHERE P.id = :id', id=id)
         if rows:
             row = Product._ensure_row_shape(rows[0])
             return Product(*row)
         return None
 
+    @staticmethod
+    def get_detail(pid, viewer_id=None):
+        """
+        Everything the product page shows, in two statements on one
+        connection: the product with its creator, sellers (aggregated to JSON,
+        so the seller count doesn't add round-trips) and whether viewer_id
+        has reviewed it; then the first page of reviews (newest first) as
+        plain rows, with the cursor for the next page.  None if the product
+        doesn't exist.
+        """
+        with app.db.transaction(readonly=True) as tx:
+            rows = tx.execute(Product._base_select(''',
+  PS.review_count,
+  creator.creator,
+  sellers.sellers,
+  EXISTS (
+    SELECT 1 FROM Reviews
+    WHERE product_id = P.id AND user_id = :viewer_id
+  ) AS viewer_has_review''') + '''
+LEFT JOIN LATERAL (
+  SELECT json_build_object('id', u.id, 'firstname', u.firstname, 'lastname', u.lastname) AS creator
+  FROM Users u
+  WHERE u.id = P.creator_id
+) creator ON TRUE
+CROSS JOIN LATERAL (
+  SELECT COALESCE(json_agg(json_build_object(
+           'seller_id', i.seller_id,
+           'quantity', i.quantity,
+           'seller_price', COALESCE(i.seller_price, P.price),
+           'firstname', u.firstname,
+           'lastname', u.lastname
+         ) ORDER BY i.seller_id), '[]') AS sellers
+  FROM Inventory i
+  JOIN Users u ON u.id = i.seller_id
+  WHERE i.product_id = P.id
+) sellers
+WHERE P.id = :pid
+''', pid=pid, viewer_id=viewer_id)
+            if not rows:
+                return None
+
+            reviews, reviews_next_cursor = Review.get_for_product(pid, tx=tx)
+
+        row = rows[0]
+        product = Product(*row[:10])
+        product.review_count = row.review_count
+
+        sellers = row.sellers
+        for seller in sellers:
+            seller['seller_price'] = float(seller['seller_price']) if seller['seller_price'] is not None else None
+
+        return {
+            'product': product,
+            'creator': row.creator,
+            'sellers': sellers,
+            'reviews': reviews,
+            'reviews_next_cursor': reviews_next_cursor,
+            'user_has_review': row.viewer_has_review,
+        }
+
     @staticmethod
     def get_all(available=True):
         rows = app.db.execute(Product._base_select() + 'WHERE P.available = :available', available=available)
@@ -79,9 +159,36 @@ LEFT JOIN Categories C ON P.category_id = C.id
                 result.append(Product(*row))
         return result
 
+    # app.cache keys for catalog-wide values that listing pages read on
+    # every request; see invalidate_catalog_cache()
+    CATEGORIES_CACHE_KEY = 'product:categories'
+    MAX_PRICE_CACHE_KEY = 'product:max_price'
+    AVAILABLE_PREVIEW_CACHE_KEY = 'product:available_preview'
+
+    @staticmethod
+    def invalidate_catalog_cache():
+        """Call after changing Products or Inventory prices/availability."""
+        app.cache.invalidate(Product.CATEGORIES_CACHE_KEY,
+                             Product.MAX_PRICE_CACHE_KEY,
+                             Product.AVAILABLE_PREVIEW_CACHE_KEY)
+
+    @staticmethod
+    def reconcile_stats():
+        """
+        Recompute ProductStats from Inventory, OrderItems and Reviews,
+        fixing rows the triggers let drift.  Returns the number of rows
+        corrected.
+        """
+        with app.db.transaction() as tx:
+            return tx.execute('SELECT reconcile_product_stats()')[0][0]
+
     @staticmethod
     def get_max_price():
-        rows = app.db.execute('''
+        return app.cache.get_or_set(Product.MAX_PRICE_CACHE_KEY, Product._load_max_price)
+
+    @staticmethod
+    def _load_max_price():
+        rows = app.db.read('''
 SELECT GREATEST(
   COALESCE((SELECT MAX(price) FROM Products), 0),
   COALESCE((SELECT MAX(seller_price) FROM Inventory), 0)
@@ -95,36 +202,70 @@ SELECT GREATEST(
         return 0.0
 
     @staticmethod
-    def get_page(page=1, per_page=50, sort='price', direction='desc',
-                 q=None, category=None, available=True, ratings=None, min_price=None, max_price=None):
-        try:
-            page = max(1, int(page))
-        except Exception:
-            page = 1
-        try:
-            per_page = min(max(1, int(per_page)), 1000)
-        except Exception:
-            per_page = 50
+    def get_available_preview():
+        """Five available products with their display price, for the index page."""
+        return app.cache.get_or_set(Product.AVAILABLE_PREVIEW_CACHE_KEY,
+                                    Product._load_available_preview)
 
-        sort_map = {
-            'price': 'price',
-            'name': 'lower(P.name)',
-            'id': 'P.id',
-            'rating': None,
-            'sales': None
-        }
-        sort_col = sort_map.get(sort, 'price')
-        dir_sql = 'ASC' if str(direction).lower() == 'asc' else 'DESC'
-        offset = (page - 1) * per_page
+    @staticmethod
+    def _load_available_preview():
+        rows = app.db.read('''
+SELECT P.id, P.name, PS.min_price AS display_price
+FROM Products P
+JOIN ProductStats PS ON PS.product_id = P.id
+WHERE P.available = TRUE
+LIMIT 5
+''')
+        return [dict(zip(['id', 'name', 'display_price'], row)) for row in rows]
 
+    @staticmethod
+    def search_query(q):
+        """
+        to_tsquery() input for free text typed into a search box: every
+        word must match, as a prefix so that partial words work while the
+        user is still typing ("wireless hea" -> "wireless:* & hea:*").
+        Punctuation is dropped, so the result is always valid tsquery
+        syntax.
+        """
+        words = re.findall(r'[^\W_]+', q.lower())[:10]
+        return ' & '.join(f'{w}:*' for w in words)
+
+    @staticmethod
+    def search(q, k=10):
+        """
+        Top k available products for q, best match first, as (Product,
+        rank) pairs.  Every row the GIN index matches is ranked, so the
+        top k are exact.
+        """
+        tsq = Product.search_query(q or '')
+        if not tsq:
+            return []
+        rows = app.db.read('''
+WITH top AS (
+    SELECT P.id, ts_rank(P.search_vector, to_tsquery('english', :tsq)) AS rank
+    FROM Products P
+    WHERE P.available = TRUE
+      AND P.search_vector @@ to_tsquery('english', :tsq)
+    ORDER BY rank DESC, P.id
+    LIMIT :k
+)
+''' + Product._base_select(', top.rank') + '''
+JOIN top ON top.id = P.id
+ORDER BY top.rank DESC, P.id
+''', tsq=tsq, k=k)
+        return [(Product(*Product._ensure_row_shape(row[:-1])), float(row[-1])) for row in rows]
+
+    @staticmethod
+    def _page_filters(q=None, category=None, available=True, ratings=None, min_price=None, max_price=None):
+        """WHERE clause and bind params shared by get_page's page and count queries."""
         where_clauses = ['P.available = :available']
         params = {'available': available}
 
         if q:
-            q_str = q.strip()
-            if q_str:
-                where_clauses.append('(P.name ILIKE :q OR P.description ILIKE :q)')
-                params['q'] = f'%{q_str}%'
+            tsq = Product.search_query(q)
+            if tsq:
+                where_clauses.append("P.search_vector @@ to_tsquery('english', :tsq)")
+                params['tsq'] = tsq
 
         if category:
             where_clauses.append('(COALESCE(C.name, \'\') = :category)')
@@ -154,18 +295,18 @@ SELECT GREATEST(
             for lo, hi in numeric_ranges:
                 if lo == hi:
                     pname = f'avg_eq_{idx}'
-                    sub_parts.append(f"( (SELECT AVG(r.rating) FROM Reviews r WHERE r.product_id = P.id) = :{pname} )")
+                    sub_parts.append(f"(PS.avg_rating = :{pname})")
                     params[pname] = lo
                 else:
                     pname_lo = f'avg_lo_{idx}'
                     pname_hi = f'avg_hi_{idx}'
-                    sub_parts.append(f"( (SELECT AVG(r.rating) FROM Reviews r WHERE r.product_id = P.id) >= :{pname_lo} AND (SELECT AVG(r.rating) FROM Reviews r WHERE r.product_id = P.id) < :{pname_hi} )")
+                    sub_parts.append(f"(PS.avg_rating >= :{pname_lo} AND PS.avg_rating < :{pname_hi})")
                     params[pname_lo] = lo
                     params[pname_hi] = hi
                 idx += 1
 
             if include_no_reviews:
-                sub_parts.append('NOT EXISTS (SELECT 1 FROM Reviews r2 WHERE r2.product_id = P.id)')
+                sub_parts.append('PS.review_count = 0')
 
             if sub_parts:
                 avg_rating_clauses.append('(' + ' OR '.join(sub_parts) + ')')
@@ -173,69 +314,158 @@ SELECT GREATEST(
         if avg_rating_clauses:
             where_clauses.append('(' + ' AND '.join(avg_rating_clauses) + ')')
 
-        price_expr = "COALESCE((SELECT MIN(i.seller_price) FROM Inventory i WHERE i.product_id = P.id AND i.quantity > 0), P.price)"
         if min_price is not None:
             try:
-                min_v = float(min_price)
-                where_clauses.append(f"({price_expr}) >= :min_price")
-                params['min_price'] = min_v
+                params['min_price'] = float(min_price)
+                where_clauses.append("PS.min_price >= :min_price")
             except Exception:
                 pass
         if max_price is not None:
             try:
-                max_v = float(max_price)
-                where_clauses.append(f"({price_expr}) <= :max_price")
-                params['max_price'] = max_v
+                params['max_price'] = float(max_price)
+                where_clauses.append("PS.min_price <= :max_price")
             except Exception:
                 pass
 
-        where_sql = ' AND '.join(where_clauses) if where_clauses else '1=1'
+        return ' AND '.join(where_clauses), params
 
-        count_sql = f'''
-SELECT COUNT(*)
+    @staticmethod
+    def encode_cursor(sort, direction, key, id):
+        """Opaque page token: the (sort key, id) of the row to seek past."""
+        return encode_cursor({'s': sort, 'd': direction, 'k': str(key), 'i': id})
+
+    @staticmethod
+    def decode_cursor(token, sort, direction):
+        """
+        (key, id) from a token made by encode_cursor, or None without one
+        or if it was issued for a different sort order.  Raises
+        InvalidCursor if the token is malformed.
+        """
+        data = decode_cursor(token)
+        if data is None or data.get('s') != sort or data.get('d') != direction:
+            return None
+        key_type = Product.SORT_KEYS[sort][2]
+        return cursor_key(data.get('k'), key_type), int(cursor_key(data.get('i'), 'INT'))
+
+    @staticmethod
+    def _count(where_sql, params, count):
+        from_sql = f'''
 FROM Products P
+JOIN ProductStats PS ON PS.product_id = P.id
 LEFT JOIN Categories C ON P.category_id = C.id
 WHERE {where_sql}
 '''
-        total_row = app.db.execute(count_sql, **params)
-        total = total_row[0][0] if total_row else 0
-
-        if sort == 'rating':
-            order_sql = f'''
-ORDER BY (
-  SELECT COALESCE(AVG(r.rating), 0)
-  FROM Reviews r
-  WHERE r.product_id = P.id
-) {dir_sql}
-'''
-        elif sort == 'sales':
-            order_sql = f'ORDER BY COALESCE((SELECT SUM(oi.quantity) FROM OrderItems oi WHERE oi.product_id = P.id),0) {dir_sql}'
+        if count == 'estimate':
+            # the planner's row estimate: free, but only as good as the
+            # table statistics
+            rows = app.db.read('EXPLAIN (FORMAT JSON) SELECT 1' + from_sql, **params)
+            plan = rows[0][0]
+            if isinstance(plan, str):
+                plan = json.loads(plan)
+            return int(plan[0]['Plan']['Plan Rows'])
+        rows = app.db.read('SELECT COUNT(*)' + from_sql, **params)
+        return rows[0][0] if rows else 0
+
+    @staticmethod
+    def get_page(page=1, per_page=50, sort='price', direction='desc',
+                 q=None, category=None, available=True, ratings=None, min_price=None, max_price=None,
+                 after=None, before=None, last=False, count='exact'):
+        """
+        One page of the product browser.  Returns
+        (items, total, prev_cursor, next_cursor).
+
+        Pages are addressed either by number (page, an OFFSET, fine for the
+        first few pages) or by keyset: after/before take a cursor from a
+        previous call and seek straight to the next/previous page through
+        the (sort key, id) index, so page 500 costs the same as page 1.
+        last=True returns the final page the same way.
+
+        count is 'exact' (COUNT(*)), 'estimate' (planner row estimate) or
+        None to skip counting; total is None in that case.
+        """
+        try:
+            page = max(1, int(page))
+        except Exception:
+            page = 1
+        try:
+            per_page = min(max(1, int(per_page)), 1000)
+        except Exception:
+            per_page = 50
+
+        if sort not in Product.SORT_KEYS:
+            sort = 'price'
+        direction = 'asc' if str(direction).lower() == 'asc' else 'desc'
+        key_sql, id_sql, key_type = Product.SORT_KEYS[sort]
+
+        where_sql, params = Product._page_filters(
+            q=q, category=category, available=available, ratings=ratings,
+            min_price=min_price, max_price=max_price)
+
+        total = Product._count(where_sql, params, count) if count else None
+
+        after_key = Product.decode_cursor(after, sort, direction)
+        before_key = Product.decode_cursor(before, sort, direction) if after_key is None else None
+        backward = before_key is not None or (last and after_key is None)
+
+        # Walking backwards flips both the seek comparison and ORDER BY;
+        # the rows are put back in display order below.
+        ascending = (direction == 'asc') != backward
+        order_dir = 'ASC' if ascending else 'DESC'
+        seek_op = '>' if ascending else '<'
+
+        seek = after_key or before_key
+        if seek is not None:
+            where_sql += f' AND ({key_sql}, {id_sql}) {seek_op} (CAST(:cursor_key AS {key_type}), :cursor_id)'
+            params['cursor_key'], params['cursor_id'] = seek
+            offset = 0
+        elif backward:
+            offset = 0
         else:
-            order_sql = f'ORDER BY {sort_col} {dir_sql}'
+            offset = (page - 1) * per_page
 
+        # one extra row tells us whether there is another page beyond this one
         page_sql = f'''
-{Product._base_select()}
+{Product._base_select(f', {key_sql} AS sort_key')}
 WHERE {where_sql}
-{order_sql}
+ORDER BY {key_sql} {order_dir}, {id_sql} {order_dir}
 LIMIT :limit OFFSET :offset
 '''
-        params.update({'limit': per_page, 'offset': offset})
+        params.update({'limit': per_page + 1, 'offset': offset})
 
-        rows = app.db.execute(page_sql, **params)
+        rows = app.db.read(page_sql, **params)
+        has_more = len(rows) > per_page
+        rows = rows[:per_page]
+        if backward:
+            rows = rows[::-1]
 
         items = []
+        for row in rows:
+            row = Product._ensure_row_shape(row[:-1])
+            items.append(Product(*row))
+
+        def cursor(row):
+            return Product.encode_cursor(sort, direction, row[-1], row[0])
+
+        prev_cursor = next_cursor = None
         if rows:
-            for row in rows:
-                row = Product._ensure_row_shape(row)
-                items.append(Product(*row))
+            if backward:
+                prev_cursor = cursor(rows[0]) if has_more else None
+                next_cursor = cursor(rows[-1]) if before_key is not None else None
+            else:
+                prev_cursor = cursor(rows[0]) if (after_key is not None or offset > 0) else None
+                next_cursor = cursor(rows[-1]) if has_more else None
 
-        return items, total
+        return items, total, prev_cursor, next_cursor
 
     @staticmethod
     def get_categories():
-        rows = app.db.execute('''
+        return app.cache.get_or_set(Product.CATEGORIES_CACHE_KEY, Product._load_categories)
+
+    @staticmethod
+    def _load_categories():
+        rows = app.db.read('''
 SELECT name FROM Categories
 WHERE name IS NOT NULL AND name <> ''
 ORDER BY name
 ''')
-        return [r[0] for r in rows] if rows else []
\ No newline at end of file
+        return [r[0] for r in rows] if rows else []
@@ -1,14 +1,97 @@
 # app/models/review.py
 from flask import current_app as app
 
+from .. import export
+from ..pagination import InvalidCursor, encode_cursor, decode_cursor, cursor_key
+
+
 class Review:
+    # reviews per page on the product page and in /api/products/<pid>/reviews
+    PAGE_SIZE = 20
+
+    # sort -> (key columns ending in the review_id tiebreaker, direction).
+    # All columns of a sort run in the same direction so a page can seek
+    # with one row comparison, and each sort is a single index range scan
+    # (db/migrations/005_review_pagination.sql); highest and lowest read
+    # the same index in opposite directions.
+    SORTS = {
+        'newest': (('R.date_reviewed', 'R.review_id'), 'DESC'),
+        'highest': (('R.rating', 'R.date_reviewed', 'R.review_id'), 'DESC'),
+        'lowest': (('R.rating', 'R.date_reviewed', 'R.review_id'), 'ASC'),
+    }
+    KEY_TYPES = {'R.rating': 'INT', 'R.date_reviewed': 'TIMESTAMP', 'R.review_id': 'INT'}
+
+    # columns of a seller's review export; product_id and product_name are
+    # empty on reviews of the seller themselves
+    EXPORT_COLUMNS = ('kind', 'review_id', 'product_id', 'product_name', 'reviewer_id',
+                      'rating', 'comment', 'date_reviewed')
+
     @staticmethod
-    def get_for_product(pid):
-        rows = app.db.execute('''
-SELECT R.review_id, R.rating, R.comment, R.date_reviewed, U.id, U.firstname, U.lastname
+    def get_for_product(pid, sort='newest', after=None, limit=PAGE_SIZE, tx=None):
+        """
+        One page of a product's reviews as (reviews, next_cursor).  Pass
+        next_cursor back as after= for the following page; it is None on
+        the last page; a malformed one raises InvalidCursor.  With tx the
+        query runs in that open transaction.
+        """
+        if sort not in Review.SORTS:
+            sort = 'newest'
+        key_cols, direction = Review.SORTS[sort]
+
+        where = 'R.product_id = :pid'
+        params = {'pid': pid, 'limit': limit + 1}
+
+        seek = decode_cursor(after)
+        # a cursor from another sort starts over, as Product.get_page does
+        if seek is not None and seek.get('s') == sort:
+            keys = seek.get('k')
+            if not isinstance(keys, list) or len(keys) != len(key_cols):
+                raise InvalidCursor()
+            placeholders = []
+            for i, (col, value) in enumerate(zip(key_cols, keys)):
+                params[f'k{i}'] = cursor_key(value, Review.KEY_TYPES[col])
+                placeholders.append(f'CAST(:k{i} AS {Review.KEY_TYPES[col]})')
+            op = '<' if direction == 'DESC' else '>'
+            where += f" AND ({', '.join(key_cols)}) {op} ({', '.join(placeholders)})"
+
+        execute = tx.execute if tx is not None else app.db.read
+        rows = execute(f'''
+SELECT R.review_id, R.rating, R.comment, R.date_reviewed, R.user_id, U.firstname, U.lastname
 FROM Reviews R
 LEFT JOIN Users U ON U.id = R.user_id
-WHERE R.product_id = :pid
-ORDER BY R.date_reviewed DESC
-''', pid=pid)
-        return [dict(review_id=r[0], rating=r[1], comment=r[2], date_reviewed=r[3], user_id=r[4], firstname=r[5], lastname=r[6]) for r in rows] if rows else []
+WHERE {where}
+ORDER BY {', '.join(f'{col} {direction}' for col in key_cols)}
+LIMIT :limit
+''', **params)
+
+        reviews = [dict(review_id=r[0], rating=r[1], comment=r[2], date_reviewed=r[3],
+                        user_id=r[4], firstname=r[5], lastname=r[6]) for r in rows[:limit]]
+
+        next_cursor = None
+        if len(rows) > limit:
+            last = reviews[-1]
+            columns = {'R.rating': last['rating'], 'R.date_reviewed': last['date_reviewed'],
+                       'R.review_id': last['review_id']}
+            next_cursor = encode_cursor({'s': sort, 'k': [str(columns[col]) for col in key_cols]})
+        return reviews, next_cursor
+
+    @staticmethod
+    def export_for_seller(seller_id, fmt='csv'):
+        """
+        Every review a seller has received, newest first, as CSV or JSON
+        lines text chunks: product reviews of the products they list and
+        reviews of the seller.
+        """
+        return export.chunks(fmt, Review.EXPORT_COLUMNS, '''
+SELECT 'product' AS kind, R.review_id, R.product_id, P.name AS product_name,
+       R.user_id AS reviewer_id, R.rating, R.comment::text AS comment, R.date_reviewed
+FROM Inventory I
+JOIN Reviews R ON R.product_id = I.product_id
+JOIN Products P ON P.id = R.product_id
+WHERE I.seller_id = :seller_id
+UNION ALL
+SELECT 'seller', SR.id, NULL, NULL, SR.user_id, SR.rating, SR.comment, SR.date_reviewed
+FROM SellerReviews SR
+WHERE SR.seller_id = :seller_id
+ORDER BY date_reviewed DESC, review_id DESC
+''', seller_id=seller_id)
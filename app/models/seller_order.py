@@ -0,0 +1,168 @@
+# app/models/seller_order.py
+from flask import current_app as app
+
+from .. import export
+from ..pagination import encode_cursor, decode_cursor, cursor_key
+
+
+class SellerOrder:
+    """
+    A seller's view of the orders that include their items, read from the
+    OrderSellerSummary rows that db/migrations/008_order_seller_summary.sql
+    keeps current.
+    """
+
+    PAGE_SIZE = 25
+    MAX_PAGE_SIZE = 100
+    STATUSES = ('pending', 'partial', 'fulfilled')
+    # most item + order ids one /api/fulfill_items call may name
+    MAX_FULFILL_BATCH = 1000
+    # columns of an order history export, one row per line item
+    EXPORT_COLUMNS = ('order_id', 'order_date', 'buyer_name', 'buyer_email', 'buyer_address',
+                      'item_id', 'product_id', 'product_name', 'quantity', 'price',
+                      'fulfillment_status', 'fulfilled_date')
+
+    @staticmethod
+    def get_page(seller_id, status='all', after=None, limit=PAGE_SIZE, embed_items=False):
+        """
+        One page of the seller's orders, newest first, as (orders,
+        next_cursor).  status is 'all' or one of STATUSES; pass next_cursor
+        back as after= for the following page (None on the last page; a
+        malformed one raises InvalidCursor).
+        With embed_items each order carries its 'items' (this seller's
+        lines only), loaded with one more query for the whole page.
+        """
+        where = 's.seller_id = :seller_id'
+        params = {'seller_id': seller_id, 'limit': limit + 1}
+        if status in SellerOrder.STATUSES:
+            where += ' AND s.status = :status'
+            params['status'] = status
+
+        seek = decode_cursor(after)
+        if seek is not None:
+            where += ' AND (s.order_date, s.order_id) < (CAST(:cursor_date AS TIMESTAMP), CAST(:cursor_id AS INT))'
+            params['cursor_date'] = cursor_key(seek.get('d'), 'TIMESTAMP')
+            params['cursor_id'] = cursor_key(seek.get('o'), 'INT')
+
+        rows = app.db.read(f'''
+SELECT s.order_id, s.order_date, o.total_amount,
+       u.firstname || ' ' || u.lastname, u.email, COALESCE(u.address, 'No address provided'),
+       s.item_count, s.status, s.fulfilled_count, s.amount
+FROM OrderSellerSummary s
+JOIN Orders o ON o.id = s.order_id
+JOIN Users u ON u.id = o.user_id
+WHERE {where}
+  AND o.status != 'cancelled'
+ORDER BY s.order_date DESC, s.order_id DESC
+LIMIT :limit
+''', **params)
+
+        orders = [dict(order_id=r[0], order_date=str(r[1]),
+                       total_amount=float(r[2]) if r[2] else 0,
+                       buyer_name=r[3], buyer_email=r[4], buyer_address=r[5],
+                       item_count=r[6], status=r[7], fulfilled_count=r[8],
+                       seller_amount=float(r[9])) for r in rows[:limit]]
+
+        next_cursor = None
+        if len(rows) > limit:
+            last = rows[limit - 1]
+            next_cursor = encode_cursor({'d': last[1].isoformat(), 'o': last[0]})
+
+        if embed_items and orders:
+            items = SellerOrder.get_items(seller_id, [o['order_id'] for o in orders])
+            for order in orders:
+                order['items'] = items.get(order['order_id'], [])
+
+        return orders, next_cursor
+
+    @staticmethod
+    def get_items(seller_id, order_ids):
+        """{order_id: [line item dicts]} for the seller's lines in order_ids."""
+        rows = app.db.read('''
+SELECT oi.order_id, oi.id, oi.product_id, p.name, oi.quantity, oi.price,
+       oi.fulfillment_status, oi.fulfilled_date
+FROM OrderItems oi
+JOIN Products p ON oi.product_id = p.id
+WHERE oi.order_id = ANY(:order_ids) AND oi.seller_id = :seller_id
+ORDER BY oi.order_id, oi.id
+''', order_ids=list(order_ids), seller_id=seller_id)
+
+        items = {}
+        for r in rows:
+            items.setdefault(r[0], []).append(dict(
+                id=r[1], product_id=r[2], name=r[3], quantity=r[4],
+                price=float(r[5]) if r[5] else 0,
+                fulfillment_status=r[6],
+                fulfilled_date=str(r[7]) if r[7] else None))
+        return items
+
+    @staticmethod
+    def export(seller_id, fmt='csv', status='all'):
+        """
+        The seller's whole order history as CSV or JSON lines text chunks,
+        one row per line item of theirs, newest order first; status
+        filters as in get_page().
+        """
+        where = 's.seller_id = :seller_id'
+        params = {'seller_id': seller_id}
+        if status in SellerOrder.STATUSES:
+            where += ' AND s.status = :status'
+            params['status'] = status
+
+        return export.chunks(fmt, SellerOrder.EXPORT_COLUMNS, f'''
+SELECT s.order_id, s.order_date,
+       u.firstname || ' ' || u.lastname AS buyer_name, u.email AS buyer_email,
+       u.address AS buyer_address,
+       oi.id AS item_id, oi.product_id, p.name AS product_name, oi.quantity, oi.price,
+       oi.fulfillment_status, oi.fulfilled_date
+FROM OrderSellerSummary s
+JOIN Orders o ON o.id = s.order_id
+JOIN Users u ON u.id = o.user_id
+JOIN OrderItems oi ON oi.order_id = s.order_id AND oi.seller_id = s.seller_id
+JOIN Products p ON p.id = oi.product_id
+WHERE {where}
+  AND o.status != 'cancelled'
+ORDER BY s.order_date DESC, s.order_id DESC, oi.id
+''', **params)
+
+    @staticmethod
+    def fulfill(seller_id, item_ids=(), order_ids=()):
+        """
+        Mark the seller's lines fulfilled: the items in item_ids plus every
+        line of theirs in order_ids.  The ownership check and the update are
+        one statement, so the OrderItems triggers update the seller and
+        order rollups once for the whole batch.
+
+        Returns (items, missing_orders): a result per line -- 'fulfilled',
+        'already_fulfilled' or, for item_ids that aren't the seller's,
+        'not_found' -- and the order_ids with none of the seller's lines.
+        """
+        item_ids = list(dict.fromkeys(item_ids))
+        order_ids = list(dict.fromkeys(order_ids))
+        # the outer SELECT reads OrderItems as it was before the UPDATE
+        rows = app.db.execute('''
+WITH updated AS (
+    UPDATE OrderItems
+    SET fulfillment_status = 'fulfilled',
+        fulfilled_date = CURRENT_TIMESTAMP
+    WHERE (id = ANY(:item_ids) OR order_id = ANY(:order_ids))
+      AND seller_id = :seller_id
+      AND fulfillment_status IS DISTINCT FROM 'fulfilled'
+    RETURNING id
+)
+SELECT oi.id, oi.order_id, updated.id IS NOT NULL
+FROM OrderItems oi
+LEFT JOIN updated ON updated.id = oi.id
+WHERE (oi.id = ANY(:item_ids) OR oi.order_id = ANY(:order_ids))
+  AND oi.seller_id = :seller_id
+ORDER BY oi.order_id, oi.id
+''', item_ids=item_ids, order_ids=order_ids, seller_id=seller_id)
+
+        items = [dict(id=r[0], order_id=r[1],
+                      result='fulfilled' if r[2] else 'already_fulfilled') for r in rows]
+        found_items = {r[0] for r in rows}
+        found_orders = {r[1] for r in rows}
+        items += [dict(id=item_id, order_id=None, result='not_found')
+                  for item_id in item_ids if item_id not in found_items]
+        missing_orders = [order_id for order_id in order_ids if order_id not in found_orders]
+        return items, missing_orders
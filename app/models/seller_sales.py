@@ -0,0 +1,115 @@
+# app/models/seller_sales.py
+from datetime import date, datetime, timedelta, timezone
+
+from flask import current_app as app
+
+
+class SellerDailySales:
+    """
+    Seller dashboard numbers, read from the SellerDailySales rollup that
+    the triggers in db/migrations/007_seller_daily_sales.sql keep current.
+    Every query is a range scan of one seller's days, so its cost depends
+    on the range asked for, not on the length of the seller's history.
+    """
+
+    # preset ranges (days, ending today) offered by the dashboard
+    RANGES = (7, 30, 90, 365)
+    DEFAULT_RANGE = 30
+    # longest custom range accepted, in days
+    MAX_RANGE = 3660
+
+    @staticmethod
+    def today():
+        # Orders.order_date is stored in UTC
+        return datetime.now(timezone.utc).date()
+
+    @staticmethod
+    def resolve_range(days=None, start=None, end=None):
+        """
+        (start, end) dates, both inclusive, from ?days=N or ?start=&end=
+        (YYYY-MM-DD).  Raises ValueError for anything else.
+        """
+        if start or end:
+            end = date.fromisoformat(end) if end else SellerDailySales.today()
+            start = date.fromisoformat(start) if start else end - timedelta(days=SellerDailySales.DEFAULT_RANGE - 1)
+            if start > end:
+                raise ValueError('start must not be after end')
+            if (end - start).days >= SellerDailySales.MAX_RANGE:
+                raise ValueError(f'range is limited to {SellerDailySales.MAX_RANGE} days')
+            return start, end
+
+        days = int(days) if days else SellerDailySales.DEFAULT_RANGE
+        if days not in SellerDailySales.RANGES:
+            raise ValueError(f"days must be one of {', '.join(map(str, SellerDailySales.RANGES))}")
+        end = SellerDailySales.today()
+        return end - timedelta(days=days - 1), end
+
+    @staticmethod
+    def get_summary(seller_id, start, end, top=10):
+        """Top products, daily timeline and fulfillment breakdown for [start, end]."""
+        with app.db.transaction(readonly=True) as tx:
+            top_products = tx.execute('''
+SELECT s.product_id, p.name, s.items, s.orders, s.revenue
+FROM (
+    SELECT product_id, SUM(items) AS items, SUM(orders) AS orders, SUM(revenue) AS revenue
+    FROM SellerDailySales
+    WHERE seller_id = :seller_id AND day BETWEEN :start AND :end
+    GROUP BY product_id
+    ORDER BY items DESC, product_id
+    LIMIT :top
+) s
+JOIN Products p ON p.id = s.product_id
+ORDER BY s.items DESC, s.product_id
+''', seller_id=seller_id, start=start, end=end, top=top)
+
+            # one row per day, plus the range totals on the rollup row
+            # (day IS NULL) for the fulfillment breakdown
+            days = tx.execute('''
+SELECT day, SUM(items), SUM(revenue),
+       SUM(lines), SUM(fulfilled_lines), SUM(fulfilled_revenue)
+FROM SellerDailySales
+WHERE seller_id = :seller_id AND day BETWEEN :start AND :end
+GROUP BY ROLLUP (day)
+ORDER BY day NULLS LAST
+''', seller_id=seller_id, start=start, end=end)
+
+            # orders per day from the per-(order, seller) summary: summing
+            # SellerDailySales.orders would count an order once per product
+            orders = dict(tx.execute('''
+SELECT order_date::date, COUNT(*)
+FROM OrderSellerSummary
+WHERE seller_id = :seller_id
+  AND order_date >= :start AND order_date < :end + 1
+GROUP BY order_date::date
+''', seller_id=seller_id, start=start, end=end))
+
+        timeline = [dict(date=str(r[0]), order_count=orders.get(r[0], 0), items_sold=int(r[1]),
+                         revenue=float(r[2])) for r in days[:-1]]
+
+        totals = days[-1]
+        fulfillment = []
+        if totals[3]:
+            pending_lines = totals[3] - totals[4]
+            if pending_lines:
+                fulfillment.append(dict(status='pending', count=int(pending_lines),
+                                        value=float(totals[2] - totals[5])))
+            if totals[4]:
+                fulfillment.append(dict(status='fulfilled', count=int(totals[4]),
+                                        value=float(totals[5])))
+
+        return dict(
+            top_products=[dict(id=r[0], name=r[1], total_sold=int(r[2]), order_count=int(r[3]),
+                               revenue=float(r[4])) for r in top_products],
+            sales_timeline=timeline,
+            fulfillment_stats=fulfillment,
+        )
+
+    @staticmethod
+    def backfill(start=None, end=None):
+        """
+        Rebuild the rollup for days in [start, end] (None = unbounded) from
+        OrderItems.  Returns the number of rows written.
+        """
+        with app.db.transaction() as tx:
+            return tx.execute('SELECT backfill_seller_daily_sales(:start, :end)',
+                              start=start, end=end)[0][0]
@@ -0,0 +1,34 @@
+# app/models/seller_stats.py
+from flask import current_app as app
+
+
+class SellerStats:
+    """
+    Per-seller profile numbers, read from the SellerStats rollup that the
+    triggers in db/migrations/006_seller_stats.sql keep current.
+    """
+
+    @staticmethod
+    def get(seller_id):
+        rows = app.db.read('''
+SELECT product_count, order_count, items_sold, revenue, fulfillment_rate,
+       product_avg_rating, product_review_count,
+       seller_avg_rating, seller_review_count
+FROM SellerStats
+WHERE seller_id = :seller_id
+''', seller_id=seller_id)
+        if not rows:
+            # a user who has never listed, sold or been reviewed
+            return dict(product_count=0, order_count=0, items_sold=0, total_revenue=0.0,
+                        fulfillment_rate=0.0, avg_rating=0.0, review_count=0,
+                        seller_avg_rating=None, seller_review_count=0)
+        r = rows[0]
+        return dict(product_count=r[0],
+                    order_count=r[1],
+                    items_sold=r[2],
+                    total_revenue=float(r[3]),
+                    fulfillment_rate=float(r[4]),
+                    avg_rating=float(r[5]) if r[5] is not None else 0.0,
+                    review_count=r[6],
+                    seller_avg_rating=float(r[7]) if r[7] is not None else None,
+                    seller_review_count=r[8])
@@ -1,5 +1,5 @@
 from flask_login import UserMixin
-from flask import current_app as app
+from flask import current_app as app, g
 from werkzeug.security import generate_password_hash, check_password_hash
 
 from .. import login
@@ -85,43 +85,69 @@ RETURNING id
     @staticmethod
     @login.user_loader
     def get(id):
-        """Load user by ID for Flask-Login"""
-        print(f"=== User.get() called with id={id}, type={type(id)} ===")
-        
-        # Handle None/empty ID
+        """
+        Load user by ID (also Flask-Login's user_loader).
+
+        Users are kept in a per-request identity map on flask.g, so the
+        login check and the view asking for the same user share one query
+        and one User object.  With USER_CACHE_TTL > 0 the row is also kept
+        in app.cache across requests; anything that changes a Users row
+        must call User.invalidate().
+        """
         if id is None:
-            print("ERROR: User.get() received None")
+            app.logger.debug("User.get: no id")
             return None
-        
-        # Convert to int since Flask-Login might pass string
+
+        # Flask-Login passes the id as a string
         try:
             user_id = int(id)
-        except (ValueError, TypeError) as e:
-            print(f"ERROR: Could not convert id to int: {id}, error: {e}")
+        except (ValueError, TypeError):
+            app.logger.debug(f"User.get: bad id {id!r}")
             return None
-        
-        # Query database
+
+        identity_map = g.setdefault('users_by_id', {})
+        if user_id in identity_map:
+            return identity_map[user_id]
+
         try:
-            rows = app.db.execute("""
-                SELECT id, email, firstname, lastname, address, balance
-                FROM Users
-                WHERE id = :id
-            """, id=user_id)
-            
-            if not rows:
-                print(f"ERROR: User.get() found no user with ID: {user_id}")
-                return None
-            
-            user = User(*(rows[0]))
-            print(f"SUCCESS: User.get() loaded user: {user.email} (ID: {user.id})")
-            return user
-            
-        except Exception as e:
-            print(f"ERROR: Database error in User.get(): {e}")
-            import traceback
-            traceback.print_exc()
+            if app.config['USER_CACHE_TTL'] > 0:
+                row = app.cache.get_or_set(User._cache_key(user_id),
+                                           lambda: User._load_row(user_id),
+                                           ttl=app.config['USER_CACHE_TTL'])
+            else:
+                row = User._load_row(user_id)
+        except Exception:
+            app.logger.exception(f"User.get: could not load user {user_id}")
             return None
-        
+
+        if row is None:
+            app.logger.debug(f"User.get: no user with id {user_id}")
+        user = User(*row) if row is not None else None
+        identity_map[user_id] = user
+        return user
+
+    @staticmethod
+    def _load_row(user_id):
+        rows = app.db.read_prepared("""
+            SELECT id, email, firstname, lastname, address, balance
+            FROM Users
+            WHERE id = :id
+        """, id=user_id)
+        return tuple(rows[0]) if rows else None
+
+    @staticmethod
+    def _cache_key(user_id):
+        return f'user:{user_id}'
+
+    @staticmethod
+    def invalidate(*user_ids):
+        """Forget cached copies of these users after changing their rows."""
+        identity_map = g.get('users_by_id')
+        for user_id in user_ids:
+            if identity_map is not None:
+                identity_map.pop(int(user_id), None)
+        app.cache.invalidate(*(User._cache_key(int(user_id)) for user_id in user_ids))
+
     @staticmethod
     def update_profile(user_id, email, firstname, lastname, address):
         """Update user profile information (not password)"""
@@ -139,9 +165,10 @@ WHERE id = :user_id
                 firstname=firstname,
                 lastname=lastname,
                 address=address)
+            User.invalidate(user_id)
             return True
-        except Exception as e:
-            print(f"Error updating profile: {e}")
+        except Exception:
+            app.logger.exception("Error updating profile")
             return False
 
     @staticmethod
@@ -164,28 +191,25 @@ WHERE id = :user_id
     def update_balance(user_id, amount_change):
         """Add or subtract from user balance"""
         try:
-            app.db.execute('''
+            app.db.run_transaction(lambda tx: tx.execute('''
 UPDATE Users
 SET balance = balance + :amount_change
 WHERE id = :user_id
 ''',
                 user_id=user_id,
-                amount_change=amount_change)
+                amount_change=amount_change))
+            User.invalidate(user_id)
             return True
-        except Exception as e:
-            print(f"Error updating balance: {e}")
+        except Exception:
+            app.logger.exception("Error updating balance")
             return False
 
     @staticmethod
     def get_balance(user_id):
         """Get current balance"""
-        rows = app.db.execute('''
-SELECT balance
-FROM Users
-WHERE id = :user_id
-''', user_id=user_id)
-        return float(rows[0][0]) if rows else 0.0
-    
+        user = User.get(user_id)
+        return user.balance if user else 0.0
+
     @staticmethod
     def is_seller(user_id):
         """Check if a user is a seller (has inventory) - placeholder for now"""
@@ -0,0 +1,86 @@
+# app/models/version.py
+from flask import current_app as app
+
+
+class Version:
+    """
+    Fingerprints of the rows a page is built from, for its ETag and
+    Last-Modified (see app/conditional.py).  Each method returns
+    (token, last_modified); token changes whenever any of those rows is
+    inserted, updated or deleted.  Per-user and per-product pages
+    aggregate the version/updated_at columns that
+    db/migrations/009_version_stamps.sql maintains; whole-table pages read
+    the trigger-bumped VersionStamps rows from 012_version_stamp_rows.sql.
+    """
+
+    @staticmethod
+    def _stamp(sql, **params):
+        """(count, token, last_modified) over the (version, updated_at) rows of sql."""
+        rows = app.db.read(f'''
+SELECT COUNT(*), COALESCE(SUM(v.version), 0), MAX(v.updated_at)
+FROM ({sql}) AS v (version, updated_at)
+''', **params)
+        count, total, last_modified = rows[0]
+        return count, f'{count}-{total}', last_modified
+
+    @staticmethod
+    def _scope(scope):
+        """(token, last_modified) from a scope's VersionStamps slots."""
+        rows = app.db.read('''
+SELECT SUM(version), MAX(updated_at)
+FROM VersionStamps
+WHERE scope = :scope
+''', scope=scope)
+        total, last_modified = rows[0]
+        return str(total), last_modified
+
+    @staticmethod
+    def product(pid):
+        """The product detail page: the product, its stats, sellers and reviews."""
+        count, token, last_modified = Version._stamp('''
+SELECT version, updated_at FROM Products WHERE id = :pid
+UNION ALL
+SELECT version, updated_at FROM ProductStats WHERE product_id = :pid
+UNION ALL
+SELECT version, updated_at FROM Inventory WHERE product_id = :pid
+UNION ALL
+SELECT version, updated_at FROM Reviews WHERE product_id = :pid
+''', pid=pid)
+        # no Products row: let the view 404
+        return (token, last_modified) if count else None
+
+    @staticmethod
+    def catalog():
+        """Product listings: every product and its stats."""
+        return Version._scope('catalog')
+
+    @staticmethod
+    def seller_inventory(seller_id):
+        """A seller's listings and the products they list."""
+        _count, token, last_modified = Version._stamp('''
+SELECT i.version + p.version, GREATEST(i.updated_at, p.updated_at)
+FROM Inventory i
+JOIN Products p ON p.id = i.product_id
+WHERE i.seller_id = :seller_id
+''', seller_id=seller_id)
+        return token, last_modified
+
+    @staticmethod
+    def cart(uid):
+        """A user's cart lines and the product/seller prices they show."""
+        _count, token, last_modified = Version._stamp('''
+SELECT c.version + p.version + COALESCE(i.version, 0),
+       GREATEST(c.updated_at, p.updated_at, i.updated_at)
+FROM CartItems c
+JOIN Products p ON c.pid = p.id
+LEFT JOIN Inventory i
+       ON c.seller_id = i.seller_id
+      AND c.pid = i.product_id
+WHERE c.uid = :uid
+''', uid=uid)
+        return token, last_modified
+
+    @staticmethod
+    def reviews():
+        """The review summary: all product and seller reviews."""
+        return Version._scope('reviews')
@@ -0,0 +1,64 @@
+import base64
+import json
+from datetime import datetime
+from decimal import Decimal, InvalidOperation
+
+from werkzeug.exceptions import BadRequest
+
+
+class InvalidCursor(BadRequest):
+    """A page token that doesn't decode, or whose keys don't fit its sort."""
+    description = 'invalid cursor'
+
+
+def encode_cursor(payload):
+    """Opaque, URL-safe page token for a JSON-serialisable payload."""
+    raw = json.dumps(payload, separators=(',', ':')).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+
+def decode_cursor(token):
+    """
+    The dict payload of a token made by encode_cursor, or None without a
+    token.  Raises InvalidCursor if it is malformed.
+    """
+    if not token:
+        return None
+    try:
+        raw = base64.urlsafe_b64decode(token + '=' * (-len(token) % 4))
+        payload = json.loads(raw)
+    except Exception:
+        raise InvalidCursor()
+    if not isinstance(payload, dict):
+        raise InvalidCursor()
+    return payload
+
+
+def cursor_key(value, sql_type):
+    """
+    A key from a decoded cursor as the string a keyset query CASTs to
+    sql_type (INT, NUMERIC, TIMESTAMP or TEXT).  Raises InvalidCursor if
+    it isn't a valid value of that type, so a tampered token is a 400
+    rather than a database error.
+    """
+    if isinstance(value, bool) or not isinstance(value, (str, int, float)):
+        raise InvalidCursor()
+    text = str(value)
+    try:
+        if sql_type == 'INT':
+            number = int(text)
+            if not -2**31 <= number < 2**31:
+                raise InvalidCursor()
+            return str(number)
+        if sql_type == 'NUMERIC':
+            number = Decimal(text)
+            if not number.is_finite():
+                raise InvalidCursor()
+            return str(number)
+        if sql_type == 'TIMESTAMP':
+            return datetime.fromisoformat(text).isoformat(sep=' ')
+    except (ValueError, InvalidOperation):
+        raise InvalidCursor()
+    if sql_type == 'TEXT' and '\x00' not in text:
+        return text
+    raise InvalidCursor()
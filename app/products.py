@@ -1,3 +1,4 @@
+import click
 from flask import (
     Blueprint,
     request,
@@ -10,13 +11,18 @@ from flask import (
     abort,
 )
 from flask_login import login_required, current_user
+from .conditional import conditional
 from .models.product import Product
+from .models.review import Review
+from .models.version import Version
+from .pagination import InvalidCursor
 import math
 
 bp = Blueprint('products_api', __name__, url_prefix='')
 
 
 @bp.route('/api/products/top', methods=['GET'])
+@conditional(Version.catalog)
 def top_products():
     k_raw = request.args.get('k', 10)
     try:
@@ -43,7 +49,80 @@ def top_products():
         return jsonify(success=False, error=str(e)), 500
 
 
+@bp.route('/api/products/search', methods=['GET'])
+def search_products():
+    """Ranked type-ahead search: ?q=<text>&k=<max results, default 10>."""
+    q = request.args.get('q', '').strip()
+    try:
+        k = min(max(1, int(request.args.get('k', 10))), 100)
+    except Exception:
+        k = 10
+
+    try:
+        data = []
+        for p, rank in Product.search(q, k):
+            data.append({
+                'id': p.id,
+                'name': p.name,
+                'price': float(p.price) if p.price is not None else None,
+                'category': p.category,
+                'rank': rank,
+            })
+        return jsonify(success=True, q=q, data=data)
+    except Exception as e:
+        current_app.logger.exception("Error searching products")
+        return jsonify(success=False, error=str(e)), 500
+
+
+@bp.route('/api/products', methods=['GET'])
+def products_page_api():
+    """
+    Cursor-paginated product listing.  Pass next_cursor back as ?after=
+    (or prev_cursor as ?before=) to get the neighbouring page; cursors are
+    tied to the sort/dir they were issued for.  ?count=exact|estimate|none.
+    """
+    try:
+        per_page = int(request.args.get('per_page', 50))
+    except Exception:
+        per_page = 50
+    count = request.args.get('count', 'estimate')
+    if count not in ('exact', 'estimate'):
+        count = None
+
+    try:
+        products, total, prev_cursor, next_cursor = Product.get_page(
+            per_page=per_page,
+            sort=request.args.get('sort', 'price'),
+            direction=request.args.get('dir', 'asc'),
+            q=request.args.get('q') or None,
+            category=request.args.get('category') or None,
+            ratings=request.args.getlist('ratings'),
+            min_price=request.args.get('min_price') or None,
+            max_price=request.args.get('max_price') or None,
+            after=request.args.get('after'),
+            before=request.args.get('before'),
+            last=request.args.get('last') == '1',
+            count=count
+        )
+        data = [{
+            'id': p.id,
+            'name': p.name,
+            'price': float(p.price) if p.price is not None else None,
+            'category': p.category,
+            'avg_rating': p.avg_rating,
+            'total_sold': p.total_sold,
+        } for p in products]
+        return jsonify(success=True, data=data, total=total,
+                       prev_cursor=prev_cursor, next_cursor=next_cursor)
+    except InvalidCursor:
+        raise
+    except Exception as e:
+        current_app.logger.exception("Error fetching product page")
+        return jsonify(success=False, error=str(e)), 500
+
+
 @bp.route('/product_browser', methods=['GET'])
+@conditional(Version.catalog)
 def product_browser():
     page_raw = request.args.get('page', None)
     per_page_raw = request.args.get('per_page', None)
@@ -100,17 +179,36 @@ def product_browser():
     min_price_val = _parse_price(min_price_raw)
     max_price_val = _parse_price(max_price_raw)
 
+    # keyset navigation: after/before are cursors from the previous page,
+    # last=1 jumps to the final page
+    after = request.args.get('after') or None
+    before = request.args.get('before') or None
+    last = request.args.get('last') == '1'
+    seeking = bool(after or before or last)
+
+    # Count exactly on the first request and carry the total along in the
+    # Next/Prev links, so paging through results never re-counts them.
+    count = 'exact'
+    total = None
+    if seeking:
+        try:
+            total = max(0, int(request.args.get('total', '')))
+            count = None
+        except ValueError:
+            count = 'estimate'
+
     current_app.logger.debug(
         f"product_browser: page={page} per_page={per_page} sort={sort_key} "
         f"dir={sort_dir} q='{q}' category='{category}' ratings='{ratings}' "
-        f"min_price='{min_price_val}' max_price='{max_price_val}'"
+        f"min_price='{min_price_val}' max_price='{max_price_val}' "
+        f"after={after} before={before} last={last}"
     )
 
     try:
         categories = Product.get_categories()
         category_filter = category if category else None
 
-        products, total = Product.get_page(
+        products, counted, prev_cursor, next_cursor = Product.get_page(
             page=page,
             per_page=per_page,
             sort=sort_key,
@@ -120,32 +218,19 @@ def product_browser():
             available=True,
             ratings=ratings,
             min_price=min_price_val,
-            max_price=max_price_val
+            max_price=max_price_val,
+            after=after,
+            before=before,
+            last=last,
+            count=count
         )
+        if counted is not None:
+            total = counted
 
         total_pages = max(1, math.ceil(total / per_page)) if per_page > 0 else 1
-
-        # ensure avg_rating set on each product (one query for all products on this page)
-        pids = [p.id for p in products]
-        if pids:
-            rows = current_app.db.execute("""
-                SELECT product_id, AVG(rating)::numeric AS avg_rating
-                FROM Reviews
-                WHERE product_id = ANY(:pids)
-                GROUP BY product_id
-            """, pids=pids)
-            avg_map = {r[0]: float(r[1]) for r in rows} if rows else {}
-            for p in products:
-                if getattr(p, 'avg_rating', None) is None:
-                    p.avg_rating = avg_map.get(p.id)
-                else:
-                    try:
-                        p.avg_rating = float(p.avg_rating) if p.avg_rating is not None else None
-                    except Exception:
-                        p.avg_rating = avg_map.get(p.id)
-        else:
-            for p in products:
-                p.avg_rating = None
+        if last:
+            page = total_pages
+        page = min(max(1, page), total_pages)
 
         try:
             ui_max_price = Product.get_max_price()
@@ -170,8 +255,12 @@ def product_browser():
             ratings_selected=ratings or [],
             min_price=(min_price_raw if min_price_raw != '' else ''),
             max_price=(max_price_raw if max_price_raw != '' else ''),
-            ui_max_price=ui_max_price
+            ui_max_price=ui_max_price,
+            prev_cursor=prev_cursor,
+            next_cursor=next_cursor
         )
+    except InvalidCursor:
+        raise
     except Exception as e:
         current_app.logger.exception("Error in product_browser")
         return render_template(
@@ -191,121 +280,64 @@ def product_browser():
             ratings_selected=ratings or [],
             min_price=(min_price_raw if min_price_raw != '' else ''),
             max_price=(max_price_raw if max_price_raw != '' else ''),
-            ui_max_price=Product.get_max_price() if hasattr(Product, 'get_max_price') else 0
+            ui_max_price=Product.get_max_price() if hasattr(Product, 'get_max_price') else 0,
+            prev_cursor=None,
+            next_cursor=None
         )
 
 
 @bp.route('/product/<int:pid>')
+@conditional(Version.product)
 def product_detail(pid):
-    product = Product.get(pid)
-    if not product:
+    viewer_id = current_user.id if current_user.is_authenticated else None
+    detail = Product.get_detail(pid, viewer_id=viewer_id)
+    if not detail:
         abort(404)
 
-    db = current_app.db
+    product = detail['product']
+    return render_template(
+        'product_detail.html',
+        product=product,
+        sellers=detail['sellers'],
+        reviews=detail['reviews'],
+        reviews_next_cursor=detail['reviews_next_cursor'],
+        creator=detail['creator'],
+        product_total_sold=product.total_sold,
+        user_has_review=detail['user_has_review'],
+    )
 
-    # average rating + count
-    stats = db.execute("""
-        SELECT AVG(rating)::numeric, COUNT(*)
-        FROM Reviews
-        WHERE product_id = :pid
-    """, pid=pid)
-    if stats:
-        avg_val = stats[0][0]
-        cnt_val = stats[0][1]
-        product.avg_rating = float(avg_val) if avg_val is not None else None
-        product.review_count = int(cnt_val)
-    else:
-        product.avg_rating = None
-        product.review_count = 0
 
-    # total sold
-    product_total_sold = 0
+@bp.route('/api/products/<int:pid>/reviews', methods=['GET'])
+def product_reviews_api(pid):
+    """
+    A page of a product's reviews: ?sort=newest|highest|lowest, ?limit=
+    (max 100) and ?after=<next_cursor from the previous page>.
+    """
+    sort = request.args.get('sort', 'newest')
     try:
-        total_row = db.execute(
-            "SELECT COALESCE(SUM(quantity),0) FROM OrderItems WHERE product_id = :pid",
-            pid=pid
-        )
-        if total_row:
-            product_total_sold = int(total_row[0][0])
+        limit = min(max(1, int(request.args.get('limit', Review.PAGE_SIZE))), 100)
     except Exception:
-        current_app.logger.exception("Could not fetch product total sales; continuing with zero")
-
-    # creator
-    creator = None
-    if getattr(product, 'creator_id', None) is not None:
-        r = db.execute("SELECT id, firstname, lastname FROM Users WHERE id = :uid",
-                       uid=product.creator_id)
-        if r:
-            creator = {'id': r[0][0], 'firstname': r[0][1], 'lastname': r[0][2]}
-
-    # sellers
-    sellers_rows = db.execute("""
-      SELECT i.seller_id, i.quantity, COALESCE(i.seller_price, p.price) as seller_price,
-             u.firstname, u.lastname
-      FROM Inventory i
-      JOIN Users u ON u.id = i.seller_id
-      LEFT JOIN Products p ON p.id = i.product_id
-      WHERE i.product_id = :pid
-      ORDER BY i.seller_id
-    """, pid=pid)
-
-    sellers = []
-    if sellers_rows:
-        for r in sellers_rows:
-            sellers.append({
-                'seller_id': r[0],
-                'quantity': r[1],
-                'seller_price': float(r[2]) if r[2] is not None else None,
-                'firstname': r[3],
-                'lastname': r[4]
-            })
-
-    # reviews list
-    review_rows = db.execute("""
-      SELECT r.user_id,
-             r.rating,
-             r.comment,
-             r.date_reviewed,
-             u.firstname,
-             u.lastname
-      FROM Reviews r
-      LEFT JOIN Users u ON u.id = r.user_id
-      WHERE r.product_id = :pid
-      ORDER BY r.date_reviewed DESC
-    """, pid=pid)
-
-    reviews = []
-    if review_rows:
-        for r in review_rows:
-            reviews.append({
-                'user_id':       r[0],
-                'rating':        int(r[1]),
-                'comment':       r[2],
-                'date_reviewed': r[3],
-                'firstname':     r[4],
-                'lastname':      r[5],
-            })
-
-    # whether current user has review (for the button text)
-    user_has_review = False
-    if current_user.is_authenticated:
-        row = db.execute("""
-            SELECT 1
-            FROM Reviews
-            WHERE product_id = :pid AND user_id = :uid
-            LIMIT 1
-        """, pid=pid, uid=current_user.id)
-        user_has_review = bool(row)
+        limit = Review.PAGE_SIZE
 
-    return render_template(
-        'product_detail.html',
-        product=product,
-        sellers=sellers,
-        reviews=reviews,
-        creator=creator,
-        product_total_sold=product_total_sold,
-        user_has_review=user_has_review,
-    )
+    try:
+        reviews, next_cursor = Review.get_for_product(
+            pid, sort=sort, after=request.args.get('after'), limit=limit)
+        data = [{
+            'review_id': r['review_id'],
+            'user_id': r['user_id'],
+            'rating': r['rating'],
+            'comment': r['comment'],
+            # same text the page renders server-side
+            'date_reviewed': str(r['date_reviewed']),
+            'firstname': r['firstname'],
+            'lastname': r['lastname'],
+        } for r in reviews]
+        return jsonify(success=True, data=data, next_cursor=next_cursor)
+    except InvalidCursor:
+        raise
+    except Exception as e:
+        current_app.logger.exception("Error fetching product reviews")
+        return jsonify(success=False, error=str(e)), 500
 
 
 @bp.route('/product/<int:pid>/sell', methods=['POST'])
@@ -340,9 +372,9 @@ def product_sell(pid):
 
     seller_id = current_user.id
 
-    try:
+    def restock(tx):
         if seller_price is not None:
-            db.execute("""
+            tx.execute("""
                 INSERT INTO Inventory (seller_id, product_id, quantity, seller_price)
                 VALUES (:seller_id, :pid, :qty, :seller_price)
                 ON CONFLICT (seller_id, product_id) DO UPDATE
@@ -350,17 +382,21 @@ def product_sell(pid):
                       seller_price = EXCLUDED.seller_price;
             """, seller_id=seller_id, pid=pid, qty=qty, seller_price=seller_price)
         else:
-            update_res = db.execute("""
+            update_res = tx.execute("""
                 UPDATE Inventory
                 SET quantity = quantity + :qty
                 WHERE seller_id = :seller_id AND product_id = :pid
                 RETURNING seller_id;
             """, qty=qty, seller_id=seller_id, pid=pid)
             if not update_res:
-                db.execute("""
+                tx.execute("""
                     INSERT INTO Inventory (seller_id, product_id, quantity, seller_price)
                     VALUES (:seller_id, :pid, :qty, NULL)
                 """, seller_id=seller_id, pid=pid, qty=qty)
+
+    try:
+        db.run_transaction(restock)
+        Product.invalidate_catalog_cache()
         flash("Your inventory has been updated", "success")
     except Exception:
         current_app.logger.exception("Error adding/updating inventory")
@@ -409,6 +445,7 @@ def product_new():
         """, name=name, description=description or None, image_url=image_url or None,
            price=price, available=True, category_id=category_id, creator_id=current_user.id)
         new_id = res[0][0]
+        Product.invalidate_catalog_cache()
         flash('Product created', 'success')
         return redirect(url_for('products_api.product_detail', pid=new_id))
     except Exception as e:
@@ -468,6 +505,7 @@ def product_edit(pid):
             WHERE id = :pid
         """, name=name, description=description or None, image_url=image_url or None,
            price=price, category_id=category_id, pid=pid)
+        Product.invalidate_catalog_cache()
         flash('Product updated', 'success')
         return redirect(url_for('products_api.product_detail', pid=pid))
     except Exception as e:
@@ -517,20 +555,21 @@ def product_add_review(pid):
         return render_template('review_form.html', product=product)
 
     try:
-        # delete any previous review from this user for this product
-        db.execute("""
-            DELETE FROM Reviews
-            WHERE product_id = :pid AND user_id = :uid
-        """, pid=pid, uid=current_user.id)
-
-        # insert fresh review
-        db.execute("""
-            INSERT INTO Reviews (product_id, user_id, rating, comment, date_reviewed)
-            VALUES (:pid, :uid, :rating, :comment, NOW())
-        """, pid=pid,
-           uid=current_user.id,
-           rating=rating,
-           comment=comment or None)
+        with db.transaction() as tx:
+            # delete any previous review from this user for this product
+            tx.execute("""
+                DELETE FROM Reviews
+                WHERE product_id = :pid AND user_id = :uid
+            """, pid=pid, uid=current_user.id)
+
+            # insert fresh review
+            tx.execute("""
+                INSERT INTO Reviews (product_id, user_id, rating, comment, date_reviewed)
+                VALUES (:pid, :uid, :rating, :comment, NOW())
+            """, pid=pid,
+               uid=current_user.id,
+               rating=rating,
+               comment=comment or None)
 
         flash('Review saved!', 'success')
         return redirect(url_for('products_api.product_detail', pid=pid))
@@ -556,3 +595,11 @@ def product_review_delete(pid):
 
     flash('Your review was deleted.', 'success')
     return redirect(url_for('products_api.product_detail', pid=pid))
+
+
+@bp.cli.command('reconcile-product-stats')
+def reconcile_product_stats():
+    """Rebuild drifted ProductStats rows from their source tables."""
+    rows = Product.reconcile_stats()
+    Product.invalidate_catalog_cache()
+    click.echo(f"ProductStats: corrected {rows} rows")
@@ -1,9 +1,21 @@
+import click
 from flask import (
     Blueprint, request, jsonify, current_app,
     render_template, redirect, url_for, flash
 )
 from flask_login import current_user, login_required
-from .users import get_seller_statistics, get_seller_reviews
+from sqlalchemy.exc import DBAPIError
+from . import export
+from .conditional import conditional
+from .db import is_retryable
+from .models.inventory import Inventory
+from .models.product import Product
+from .models.review import Review
+from .models.seller_order import SellerOrder
+from .models.seller_sales import SellerDailySales
+from .models.version import Version
+from .serialize import json_response
+from .users import get_seller_statistics, get_seller_reviews, PROFILE_REVIEW_LIMIT
 
 sellers_bp = Blueprint('sellers', __name__)
 
@@ -17,66 +29,48 @@ def user_has_purchased_from_seller(user_id, seller_id):
     an item sold by seller_id.
     """
     rows = current_app.db.execute("""
-        SELECT COUNT(*)
-        FROM Orders o
-        JOIN OrderItems oi ON o.id = oi.order_id
-        WHERE o.user_id = :uid
-          AND oi.seller_id = :sid
+        SELECT EXISTS (
+            SELECT 1
+            FROM Orders o
+            JOIN OrderItems oi ON o.id = oi.order_id
+            WHERE o.user_id = :uid
+              AND oi.seller_id = :sid
+        )
     """, uid=user_id, sid=seller_id)
 
-    return rows[0][0] > 0
+    return rows[0][0]
 
 
 
 # ============================================================================
 # Inventory API (used by seller_profile.js)
 # ============================================================================
+def _seller_inventory_version():
+    seller_id = request.args.get('seller_id', type=int)
+    return Version.seller_inventory(seller_id) if seller_id is not None else None
+
+
 @sellers_bp.route('/api/seller_inventory', methods=['GET'])
+@conditional(_seller_inventory_version)
 def seller_inventory():
     seller_id = request.args.get('seller_id', type=int)
     if seller_id is None:
         return jsonify({"error": "seller_id required"}), 400
 
-    db = current_app.db
-    query = """
-        SELECT p.id AS product_id,
+    # encoded by Postgres: big sellers list thousands of rows
+    body = current_app.db.read_json("""
+        SELECT p.id,
                p.name,
                p.price AS base_price,
                i.seller_price,
                i.quantity,
-               p.available
+               COALESCE(p.available, FALSE) AS available
         FROM Inventory i
         JOIN Products p ON i.product_id = p.id
         WHERE i.seller_id = :seller_id
         ORDER BY p.id
-    """
-    rows = db.execute(query, seller_id=seller_id)
-    cols = ['product_id', 'name', 'base_price', 'seller_price',
-            'quantity', 'available']
-    results = [dict(zip(cols, row)) for row in rows]
-
-    # normalize/serialize for JSON
-    for r in results:
-        r['id'] = r.pop('product_id')
-        av = r.get('available')
-        if isinstance(av, bool):
-            r['available'] = av
-        else:
-            r['available'] = str(av).lower() in ('t', 'true', '1', 'yes')
-
-        if r.get('base_price') is not None:
-            try:
-                r['base_price'] = float(r['base_price'])
-            except Exception:
-                pass
-
-        if r.get('seller_price') is not None:
-            try:
-                r['seller_price'] = float(r['seller_price'])
-            except Exception:
-                pass
-
-    return jsonify(results)
+    """, seller_id=seller_id)
+    return json_response(body)
 
 
 # ============================================================================
@@ -85,7 +79,7 @@ def seller_inventory():
 @sellers_bp.route('/sellers')
 def sellers_list():
     db = current_app.db
-    rows = db.execute("""
+    rows = db.read("""
         SELECT u.id, u.email, u.firstname, u.lastname,
                COUNT(i.product_id) AS item_count
         FROM Users u
@@ -110,7 +104,7 @@ def sellers_list():
 # ============================================================================
 # Seller profile: inventory + stats + review eligibility
 # ============================================================================
-from .users import get_seller_statistics, get_seller_reviews
+from .users import get_seller_statistics, get_seller_reviews, PROFILE_REVIEW_LIMIT
 # ^ make sure this import is at the top of sellers.py
 
 @sellers_bp.route('/sellers/<int:seller_id>')
@@ -137,13 +131,13 @@ def seller_profile(seller_id):
     # summary stats (products, orders, revenue, etc.)
     seller_stats = get_seller_statistics(seller_id)
 
-    # ---------- get SELLER reviews via helper (uses SellerReviews) ----------
-    reviews = get_seller_reviews(seller_id)
+    # ---------- newest SELLER reviews via helper (uses SellerReviews) ----------
+    reviews = get_seller_reviews(seller_id, limit=PROFILE_REVIEW_LIMIT)
 
-    # compute seller_avg_rating and seller_review_count for template
-    if reviews:
-        seller_review_count = len(reviews)
-        seller_avg_rating = sum(r['rating'] for r in reviews) / seller_review_count
+    # seller_avg_rating and seller_review_count for template, from the rollup
+    if seller_stats:
+        seller_review_count = seller_stats['seller_review_count']
+        seller_avg_rating = seller_stats['seller_avg_rating']
     else:
         seller_review_count = 0
         seller_avg_rating = None
@@ -243,13 +237,14 @@ def add_to_inventory():
                 "error": "Product already in your inventory. Use update to modify quantity or price."
             }), 409
 
-        db.execute("""
+        db.run_transaction(lambda tx: tx.execute("""
             INSERT INTO Inventory (seller_id, product_id, quantity, seller_price)
             VALUES (:seller_id, :product_id, :quantity, :seller_price)
             ON CONFLICT (seller_id, product_id)
             DO UPDATE SET quantity = :quantity, seller_price = :seller_price
         """, seller_id=current_user.id, product_id=product_id,
-           quantity=quantity, seller_price=seller_price)
+           quantity=quantity, seller_price=seller_price))
+        Product.invalidate_catalog_cache()
         return jsonify({"success": True})
     except Exception as e:
         return jsonify({"error": str(e)}), 500
@@ -275,14 +270,17 @@ def update_inventory():
 
     db = current_app.db
     try:
-        db.execute("""
+        db.run_transaction(lambda tx: tx.execute("""
             UPDATE Inventory
             SET quantity = :quantity, seller_price = :seller_price
             WHERE seller_id = :seller_id AND product_id = :product_id
         """, seller_id=current_user.id, product_id=product_id,
-           quantity=quantity, seller_price=seller_price)
+           quantity=quantity, seller_price=seller_price))
+        Product.invalidate_catalog_cache()
         return jsonify({"success": True})
     except Exception as e:
+        if is_retryable(e):
+            return jsonify({"error": "Inventory is busy, please try again"}), 503
         return jsonify({"error": str(e)}), 500
 
 
@@ -298,15 +296,81 @@ def remove_from_inventory():
 
     db = current_app.db
     try:
-        db.execute("""
+        db.run_transaction(lambda tx: tx.execute("""
             DELETE FROM Inventory
             WHERE seller_id = :seller_id AND product_id = :product_id
-        """, seller_id=current_user.id, product_id=product_id)
+        """, seller_id=current_user.id, product_id=product_id))
+        Product.invalidate_catalog_cache()
         return jsonify({"success": True})
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
 
+@sellers_bp.route('/api/seller_inventory/import', methods=['POST'])
+@login_required
+def import_inventory():
+    """
+    Add or update many listings at once from CSV (product_id,quantity,
+    seller_price with a header row) or JSON lines, sent as the request body
+    or as a multipart 'file' upload.  ?format=csv|jsonl, otherwise taken
+    from the upload's extension or the Content-Type (default csv).
+    Returns a result per data row.
+    """
+    upload = request.files.get('file')
+    source = upload.stream if upload else request.stream
+
+    fmt = request.args.get('format')
+    if fmt is None:
+        filename = (upload.filename or '') if upload else ''
+        content_type = request.mimetype or ''
+        is_jsonl = (filename.endswith(('.jsonl', '.ndjson'))
+                    or content_type in ('application/jsonl', 'application/x-ndjson'))
+        fmt = 'jsonl' if is_jsonl else 'csv'
+    if fmt not in ('csv', 'jsonl'):
+        return jsonify({"error": "format must be csv or jsonl"}), 400
+
+    try:
+        results = Inventory.bulk_import(current_user.id, source, fmt=fmt)
+    except DBAPIError as e:
+        if is_retryable(e):
+            return jsonify({"error": "inventory_busy", "message": "Please try again."}), 503
+        # a malformed file aborts COPY; nothing was applied
+        current_app.logger.warning(f"inventory_import_failed seller={current_user.id}: {e.orig}")
+        return jsonify({"error": "Could not read the import file"}), 400
+    Product.invalidate_catalog_cache()
+
+    counts = {'inserted': 0, 'updated': 0, 'error': 0}
+    for r in results:
+        counts[r['result']] += 1
+    return jsonify({"success": True, **counts, "results": results})
+
+
+@sellers_bp.route('/api/seller_inventory/export', methods=['GET'])
+@login_required
+def export_inventory():
+    """
+    Download this seller's inventory in the format /import reads.
+    ?format=csv|jsonl (default csv).
+    """
+    fmt = request.args.get('format', 'csv')
+    if fmt not in export.FORMATS:
+        return jsonify({"error": "format must be csv or jsonl"}), 400
+    return export.download(fmt, 'inventory', Inventory.export(current_user.id, fmt))
+
+
+@sellers_bp.route('/api/seller_reviews/export', methods=['GET'])
+@login_required
+def export_seller_reviews():
+    """
+    Download every review this seller has received, of their products and
+    of them.  ?format=csv|jsonl (default csv).
+    """
+    fmt = request.args.get('format', 'csv')
+    if fmt not in export.FORMATS:
+        return jsonify({"error": "format must be csv or jsonl"}), 400
+    return export.download(fmt, 'reviews', Review.export_for_seller(current_user.id, fmt))
+
+
 # ============================================================================
 # Seller REVIEWS: add / edit / delete
 # ============================================================================
@@ -429,91 +493,37 @@ def delete_seller_review(seller_id):
 @sellers_bp.route('/api/seller_orders', methods=['GET'])
 @login_required
 def seller_orders_api():
-    """Get all orders for this seller"""
-    status_filter = request.args.get('status', 'all')
-
-    db = current_app.db
-
-    query = """
-        WITH seller_order_items AS (
-            SELECT oi.order_id,
-                   COUNT(*) as seller_item_count,
-                   SUM(CASE WHEN oi.fulfillment_status = 'fulfilled'
-                            THEN 1 ELSE 0 END) as fulfilled_count
-            FROM orderitems oi
-            WHERE oi.seller_id = :seller_id
-            GROUP BY oi.order_id
-        )
-        SELECT o.id AS order_id,
-               o.order_date,
-               o.total_amount,
-               u.firstname || ' ' || u.lastname AS buyer_name,
-               u.email AS buyer_email,
-               COALESCE(u.address, 'No address provided') AS buyer_address,
-               soi.seller_item_count,
-               CASE
-                   WHEN soi.fulfilled_count = soi.seller_item_count THEN 'fulfilled'
-                   WHEN soi.fulfilled_count = 0 THEN 'pending'
-                   ELSE 'partial'
-               END as fulfillment_status
-        FROM orders o
-        JOIN seller_order_items soi ON o.id = soi.order_id
-        JOIN users u ON o.user_id = u.id
-        WHERE o.status != 'cancelled'
     """
+    One page of this seller's orders, newest first.
 
-    if status_filter == 'pending':
-        query += " AND soi.fulfilled_count < soi.seller_item_count"
-    elif status_filter == 'fulfilled':
-        query += " AND soi.fulfilled_count = soi.seller_item_count"
-
-    query += " ORDER BY o.order_date DESC"
-
-    rows = db.execute(query, seller_id=current_user.id)
-
-    orders = []
-    for row in rows:
-        orders.append({
-            'order_id': row[0],
-            'order_date': str(row[1]),
-            'total_amount': float(row[2]) if row[2] else 0,
-            'buyer_name': row[3],
-            'buyer_email': row[4],
-            'buyer_address': row[5],
-            'item_count': row[6],
-            'status': row[7]
-        })
-
-    return jsonify(orders)
+    ?status=all|pending|partial|fulfilled  (default all)
+    ?limit=N                               (default 25, max 100)
+    ?after=<next_cursor of the previous page>
+    ?embed=items                           include each order's line items
+    """
+    status_filter = request.args.get('status', 'all')
+    if status_filter != 'all' and status_filter not in SellerOrder.STATUSES:
+        return jsonify({"error": "status must be all, pending, partial or fulfilled"}), 400
+
+    limit = request.args.get('limit', SellerOrder.PAGE_SIZE, type=int)
+    limit = max(1, min(limit, SellerOrder.MAX_PAGE_SIZE))
+
+    orders, next_cursor = SellerOrder.get_page(
+        current_user.id,
+        status=status_filter,
+        after=request.args.get('after'),
+        limit=limit,
+        embed_items=request.args.get('embed') == 'items',
+    )
+    return jsonify({'orders': orders, 'next_cursor': next_cursor})
 
 
 @sellers_bp.route('/api/order_items/<int:order_id>', methods=['GET'])
 @login_required
 def get_order_items(order_id):
     """Get line items for a specific order (only this seller's items)"""
-    db = current_app.db
-    rows = db.execute("""
-        SELECT oi.id, oi.product_id, p.name, oi.quantity, oi.price,
-               oi.fulfillment_status, oi.fulfilled_date
-        FROM OrderItems oi
-        JOIN Products p ON oi.product_id = p.id
-        WHERE oi.order_id = :order_id AND oi.seller_id = :seller_id
-        ORDER BY oi.id
-    """, order_id=order_id, seller_id=current_user.id)
-
-    items = []
-    for row in rows:
-        items.append({
-            'id': row[0],
-            'product_id': row[1],
-            'name': row[2],
-            'quantity': row[3],
-            'price': float(row[4]) if row[4] else 0,
-            'fulfillment_status': row[5],
-            'fulfilled_date': str(row[6]) if row[6] else None
-        })
-
-    return jsonify(items)
+    items = SellerOrder.get_items(current_user.id, [order_id])
+    return jsonify(items.get(order_id, []))
 
 
 @sellers_bp.route('/api/fulfill_item', methods=['POST'])
@@ -526,28 +536,69 @@ def fulfill_item():
     if not item_id:
         return jsonify({"error": "item_id required"}), 400
 
-    db = current_app.db
     try:
-        # First verify this item belongs to this seller
-        check = list(db.execute("""
-            SELECT id FROM OrderItems
-            WHERE id = :item_id AND seller_id = :seller_id
-        """, item_id=item_id, seller_id=current_user.id))
-
-        if not check:
+        items, _ = SellerOrder.fulfill(current_user.id, item_ids=[int(item_id)])
+        if items[0]['result'] == 'not_found':
             return jsonify({"error": "Item not found or unauthorized"}), 404
-
-        db.execute("""
-            UPDATE OrderItems
-            SET fulfillment_status = 'fulfilled',
-                fulfilled_date = CURRENT_TIMESTAMP
-            WHERE id = :item_id AND seller_id = :seller_id
-        """, item_id=item_id, seller_id=current_user.id)
         return jsonify({"success": True})
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
 
+@sellers_bp.route('/api/seller_orders/export', methods=['GET'])
+@login_required
+def export_seller_orders():
+    """
+    Download this seller's whole order history, one row per line item.
+
+    ?format=csv|jsonl                      (default csv)
+    ?status=all|pending|partial|fulfilled  (default all)
+    """
+    fmt = request.args.get('format', 'csv')
+    if fmt not in export.FORMATS:
+        return jsonify({"error": "format must be csv or jsonl"}), 400
+    status_filter = request.args.get('status', 'all')
+    if status_filter != 'all' and status_filter not in SellerOrder.STATUSES:
+        return jsonify({"error": "status must be all, pending, partial or fulfilled"}), 400
+    return export.download(fmt, 'orders',
+                           SellerOrder.export(current_user.id, fmt, status=status_filter))
+
+
+@sellers_bp.route('/api/fulfill_items', methods=['POST'])
+@login_required
+def fulfill_items():
+    """
+    Mark many order items as fulfilled at once.
+
+    Body: {"item_ids": [...], "order_ids": [...]} (either or both); an
+    order id fulfills every line of this seller's in that order.  Returns
+    a result per line and the order ids that had none of the seller's lines.
+    """
+    data = request.get_json(silent=True) or {}
+    try:
+        item_ids = [int(i) for i in data.get('item_ids') or []]
+        order_ids = [int(i) for i in data.get('order_ids') or []]
+    except (TypeError, ValueError):
+        return jsonify({"error": "item_ids and order_ids must be lists of integers"}), 400
+
+    if not item_ids and not order_ids:
+        return jsonify({"error": "item_ids or order_ids required"}), 400
+    if len(item_ids) + len(order_ids) > SellerOrder.MAX_FULFILL_BATCH:
+        return jsonify({"error": f"at most {SellerOrder.MAX_FULFILL_BATCH} ids per request"}), 400
+
+    try:
+        items, missing_orders = SellerOrder.fulfill(current_user.id, item_ids=item_ids, order_ids=order_ids)
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+    return jsonify({
+        "success": True,
+        "fulfilled": sum(1 for item in items if item['result'] == 'fulfilled'),
+        "items": items,
+        "missing_order_ids": missing_orders,
+    })
+
+
 @sellers_bp.route('/seller/orders')
 @login_required
 def seller_orders_page():
@@ -558,50 +609,28 @@ def seller_orders_page():
 @sellers_bp.route('/api/seller_analytics', methods=['GET'])
 @login_required
 def seller_analytics():
-    """Get analytics data for seller's products"""
+    """
+    Get analytics data for seller's products over a date range:
+    ?days=7|30|90|365 (default 30) or a custom ?start=YYYY-MM-DD&end=YYYY-MM-DD.
+    Sales come from the SellerDailySales rollup.
+    """
     db = current_app.db
 
     try:
-        # 1. Top selling products by quantity
-        top_products = list(db.execute("""
-            SELECT p.id, p.name,
-                   SUM(oi.quantity) as total_sold,
-                   COUNT(DISTINCT oi.order_id) as order_count,
-                   SUM(oi.quantity * oi.price) as revenue
-            FROM orderitems oi
-            JOIN products p ON oi.product_id = p.id
-            WHERE oi.seller_id = :seller_id
-            GROUP BY p.id, p.name
-            ORDER BY total_sold DESC
-            LIMIT 10
-        """, seller_id=current_user.id))
-
-        # 2. Sales over time (last 30 days)
-        sales_timeline = list(db.execute("""
-            SELECT DATE(o.order_date) as sale_date,
-                   COUNT(DISTINCT oi.order_id) as order_count,
-                   SUM(oi.quantity) as items_sold,
-                   SUM(oi.quantity * oi.price) as daily_revenue
-            FROM orderitems oi
-            JOIN orders o ON oi.order_id = o.id
-            WHERE oi.seller_id = :seller_id
-              AND o.order_date >= CURRENT_DATE - 30
-            GROUP BY DATE(o.order_date)
-            ORDER BY sale_date ASC
-        """, seller_id=current_user.id))
+        start, end = SellerDailySales.resolve_range(
+            days=request.args.get('days'),
+            start=request.args.get('start'),
+            end=request.args.get('end'),
+        )
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
 
-        # 3. Fulfillment status breakdown
-        fulfillment_stats = list(db.execute("""
-            SELECT oi.fulfillment_status,
-                   COUNT(*) as count,
-                   SUM(oi.quantity * oi.price) as total_value
-            FROM orderitems oi
-            WHERE oi.seller_id = :seller_id
-            GROUP BY oi.fulfillment_status
-        """, seller_id=current_user.id))
+    try:
+        # 1-3. Top products, sales timeline and fulfillment breakdown
+        summary = SellerDailySales.get_summary(current_user.id, start, end)
 
         # 4. Inventory status
-        inventory_stats = list(db.execute("""
+        inventory_stats = list(db.read("""
             SELECT
                 COUNT(*) as total_products,
                 SUM(quantity) as total_inventory,
@@ -612,33 +641,8 @@ def seller_analytics():
         """, seller_id=current_user.id))
 
         return jsonify({
-            'top_products': [
-                {
-                    'id': row[0],
-                    'name': row[1],
-                    'total_sold': int(row[2]) if row[2] else 0,
-                    'order_count': int(row[3]) if row[3] else 0,
-                    'revenue': float(row[4]) if row[4] else 0
-                }
-                for row in top_products
-            ],
-            'sales_timeline': [
-                {
-                    'date': str(row[0]),
-                    'order_count': int(row[1]) if row[1] else 0,
-                    'items_sold': int(row[2]) if row[2] else 0,
-                    'revenue': float(row[3]) if row[3] else 0
-                }
-                for row in sales_timeline
-            ],
-            'fulfillment_stats': [
-                {
-                    'status': row[0],
-                    'count': int(row[1]) if row[1] else 0,
-                    'value': float(row[2]) if row[2] else 0
-                }
-                for row in fulfillment_stats
-            ],
+            'range': {'start': start.isoformat(), 'end': end.isoformat()},
+            **summary,
             'inventory_stats': {
                 'total_products': int(inventory_stats[0][0]) if inventory_stats and inventory_stats[0][0] else 0,
                 'total_inventory': int(inventory_stats[0][1]) if inventory_stats and inventory_stats[0][1] else 0,
@@ -651,6 +655,16 @@ def seller_analytics():
         return jsonify({"error": str(e)}), 500
 
 
+@sellers_bp.cli.command('backfill-daily-sales')
+@click.option('--start', type=click.DateTime(formats=['%Y-%m-%d']), help='First day to rebuild (default: all history).')
+@click.option('--end', type=click.DateTime(formats=['%Y-%m-%d']), help='Last day to rebuild (default: all history).')
+def backfill_daily_sales(start, end):
+    """Rebuild the SellerDailySales rollup from OrderItems."""
+    rows = SellerDailySales.backfill(start.date() if start else None,
+                                     end.date() if end else None)
+    click.echo(f"SellerDailySales: wrote {rows} rows")
+
+
 @sellers_bp.route('/seller/analytics')
 @login_required
 def seller_analytics_page():
@@ -0,0 +1,60 @@
+import datetime
+import decimal
+import json
+
+from flask import current_app
+from flask.json.provider import DefaultJSONProvider
+from sqlalchemy.engine import Row
+
+try:
+    import orjson
+except ImportError:  # optional; the stdlib encoder does the same, slower
+    orjson = None
+
+
+def _default(o):
+    """Types neither encoder handles on its own."""
+    if isinstance(o, decimal.Decimal):
+        # NUMERIC(12,2) values round-trip through a double unchanged
+        return float(o)
+    if isinstance(o, (datetime.date, datetime.time)):
+        return o.isoformat()
+    if isinstance(o, Row):
+        return tuple(o)
+    if hasattr(o, '__html__'):
+        return str(o.__html__())
+    raise TypeError(f'Object of type {type(o).__name__} is not JSON serializable')
+
+
+class FastJSONProvider(DefaultJSONProvider):
+    """
+    jsonify() through orjson when it is installed.  Decimal is encoded as
+    a JSON number and dates/times as ISO 8601, so views can return model
+    values without converting them field by field; database rows become
+    arrays.  Keys are not sorted.  Without orjson the stdlib encoder is
+    used with the same conversions.
+    """
+
+    def dumps(self, obj, **kwargs):
+        if orjson is not None and not kwargs:
+            return orjson.dumps(obj, default=_default, option=orjson.OPT_NON_STR_KEYS).decode()
+        kwargs.setdefault('default', _default)
+        return json.dumps(obj, **kwargs)
+
+    def loads(self, s, **kwargs):
+        if orjson is not None and not kwargs:
+            return orjson.loads(s)
+        return json.loads(s, **kwargs)
+
+    def response(self, *args, **kwargs):
+        obj = self._prepare_response_obj(args, kwargs)
+        if orjson is not None:
+            body = orjson.dumps(obj, default=_default, option=orjson.OPT_NON_STR_KEYS)
+        else:
+            body = json.dumps(obj, default=_default, separators=(',', ':'))
+        return self._app.response_class(body, mimetype=self.mimetype)
+
+
+def json_response(body, status=200):
+    """A JSON response from already-encoded text, e.g. DB.read_json()'s."""
+    return current_app.response_class(body, status=status, mimetype='application/json')
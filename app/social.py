@@ -8,6 +8,9 @@ from flask import (
     url_for,
 )
 from flask_login import login_required, current_user
+from .conditional import conditional
+from .models.version import Version
+from .serialize import json_response
 
 
 social_bp = Blueprint("social", __name__)
@@ -68,13 +71,12 @@ def get_feedback():
         LIMIT 5
     """
     try:
-        reviews = db.execute(query, input_user_id=input_user_id)
+        body = db.read_json(query, input_user_id=input_user_id)
     except Exception as e:
         current_app.logger.exception("DB error fetching reviews (API)")
         return jsonify({"error": "database_error", "detail": str(e)}), 500
 
-    columns = ["product_id", "rating", "comment", "date_reviewed"]
-    return jsonify([dict(zip(columns, row)) for row in reviews])
+    return json_response(body)
 
 
 @social_bp.route("/submit_review", methods=["POST"])
@@ -154,6 +156,7 @@ def my_reviews():
 
 
 @social_bp.route("/review_summary")
+@conditional(Version.reviews)
 def review_summary():
     """
     Show summary ratings for products and sellers:
@@ -176,7 +179,7 @@ def review_summary():
     else:
         prod_order = "MAX(r.date_reviewed) DESC"
 
-    product_rows = db.execute(f"""
+    product_rows = db.read(f"""
         SELECT p.id,
                p.name,
                AVG(r.rating)::numeric AS avg_rating,
@@ -209,7 +212,7 @@ def review_summary():
         else:
             seller_order = "MAX(sr.date_reviewed) DESC"
 
-        seller_rows = db.execute(f"""
+        seller_rows = db.read(f"""
             SELECT u.id,
                    u.firstname,
                    u.lastname,
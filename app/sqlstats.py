@@ -0,0 +1,146 @@
+import logging
+import re
+import threading
+import time
+from collections import Counter
+
+from flask import g, has_request_context, request
+from sqlalchemy import event
+
+
+_LITERALS = re.compile(r"'(?:[^']|'')*'|\b\d+(?:\.\d+)?\b")
+_IN_LISTS = re.compile(r'\bIN\s*\((?:\s*\?\s*,)*\s*\?\s*\)', re.IGNORECASE)
+_WHITESPACE = re.compile(r'\s+')
+
+
+def normalize(statement):
+    """SQL text with literals, IN lists and layout folded, for grouping."""
+    statement = _LITERALS.sub('?', statement)
+    statement = _IN_LISTS.sub('IN (...)', statement)
+    return _WHITESPACE.sub(' ', statement).strip()
+
+
+class RequestSQL:
+    """The statements one request ran; kept on flask.g."""
+
+    def __init__(self):
+        self.count = 0
+        self.seconds = 0.0
+        self.rows = 0
+        self.slowest_seconds = 0.0
+        self.slowest = None
+        self.statements = Counter()
+
+    def record(self, statement, seconds, rows):
+        self.count += 1
+        self.seconds += seconds
+        self.rows += rows
+        if seconds >= self.slowest_seconds:
+            self.slowest_seconds = seconds
+            self.slowest = statement
+        self.statements[normalize(statement)] += 1
+
+    def repeated(self, threshold):
+        """(statement, times) for statements run more than threshold times."""
+        return [(sql, n) for sql, n in self.statements.most_common() if n > threshold]
+
+
+class SQLStats:
+    """
+    Per-request SQL accounting on top of the engine's cursor events, so
+    everything DB.execute/read/transaction runs is counted.  Each request
+    gets a log line with its statement count, DB time, rows and slowest
+    statement, and a warning when one statement repeats more than
+    SQL_REPEAT_THRESHOLD times (an N+1 loop).  In debug mode, or with
+    SQL_STATS_HEADERS, the numbers also go out as X-SQL-* headers.
+    Totals per endpoint are kept for get_stats().
+    """
+
+    def __init__(self, app):
+        self.log = app.config['SQL_STATS_LOG']
+        # a child of app.logger, so lines go to its handlers; app.logger
+        # itself is left at WARNING outside debug, which drops info()
+        self.logger = app.logger.getChild('sqlstats')
+        if self.log:
+            self.logger.setLevel(logging.INFO)
+        self.headers = app.debug or app.config['SQL_STATS_HEADERS']
+        self.repeat_threshold = app.config['SQL_REPEAT_THRESHOLD']
+        self._endpoints = {}
+        self._lock = threading.Lock()
+
+        engine = app.db.engine
+        event.listen(engine, 'before_cursor_execute', self._before_cursor_execute)
+        event.listen(engine, 'after_cursor_execute', self._after_cursor_execute)
+        app.after_request(self._after_request)
+
+    # The start time rides on the statement's execution context, not the
+    # connection: after_cursor_execute doesn't fire for a statement that
+    # raises, so anything kept per connection would be left behind for the
+    # next statement to pick up.
+    @staticmethod
+    def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        if context is not None and has_request_context():
+            context._sqlstats_start = time.perf_counter()
+
+    @staticmethod
+    def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        start = getattr(context, '_sqlstats_start', None)
+        if start is None or not has_request_context():
+            return
+        seconds = time.perf_counter() - start
+        if 'sql' not in g:
+            g.sql = RequestSQL()
+        # -1 for server-side cursors, whose rows aren't fetched yet
+        g.sql.record(statement, seconds, max(cursor.rowcount, 0))
+
+    def _after_request(self, response):
+        sql = g.get('sql')
+        if sql is None:
+            return response
+        endpoint = request.endpoint or request.path
+        repeated = sql.repeated(self.repeat_threshold)
+
+        if self.headers:
+            response.headers['X-SQL-Count'] = str(sql.count)
+            response.headers['X-SQL-Time-ms'] = f'{sql.seconds * 1000:.1f}'
+            response.headers['X-SQL-Rows'] = str(sql.rows)
+            response.headers['X-SQL-Slowest-ms'] = f'{sql.slowest_seconds * 1000:.1f}'
+            if repeated:
+                response.headers['X-SQL-Repeated'] = str(repeated[0][1])
+        if self.log:
+            self.logger.info(
+                f"sql endpoint={endpoint} status={response.status_code} count={sql.count} "
+                f"time_ms={sql.seconds * 1000:.1f} rows={sql.rows} "
+                f"slowest_ms={sql.slowest_seconds * 1000:.1f} slowest={normalize(sql.slowest)[:200]!r}")
+        for statement, times in repeated:
+            self.logger.warning(
+                f"sql_repeated endpoint={endpoint} times={times} statement={statement[:200]!r}")
+
+        self._add(endpoint, sql, bool(repeated))
+        return response
+
+    def _add(self, endpoint, sql, repeated):
+        with self._lock:
+            totals = self._endpoints.get(endpoint)
+            if totals is None:
+                totals = self._endpoints[endpoint] = dict(
+                    requests=0, statements=0, time_ms=0.0, rows=0, max_statements=0,
+                    slowest_ms=0.0, slowest=None, repeated_requests=0)
+            totals['requests'] += 1
+            totals['statements'] += sql.count
+            totals['time_ms'] += sql.seconds * 1000
+            totals['rows'] += sql.rows
+            totals['max_statements'] = max(totals['max_statements'], sql.count)
+            totals['repeated_requests'] += repeated
+            if sql.slowest_seconds * 1000 >= totals['slowest_ms']:
+                totals['slowest_ms'] = sql.slowest_seconds * 1000
+                totals['slowest'] = normalize(sql.slowest)
+
+    def get_stats(self):
+        """{endpoint: totals} plus per-request averages, as plain dicts."""
+        with self._lock:
+            stats = {endpoint: dict(totals) for endpoint, totals in self._endpoints.items()}
+        for totals in stats.values():
+            totals['avg_statements'] = totals['statements'] / totals['requests']
+            totals['avg_time_ms'] = totals['time_ms'] / totals['requests']
+        return stats
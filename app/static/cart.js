@@ -21,247 +21,238 @@ function updateTotalsDisplay() {
     }
 }
 
-function loadCart() {
-    fetch('/api/cart')
+/* ---------- Batched cart API ---------- */
+
+// Ops waiting to be sent; flushCart() sends them all in one
+// /api/cart/batch request, which also returns both carts.
+let pendingOps = [];
+let flushTimer = null;
+
+function showCartError(status) {
+    const cartDiv = document.getElementById('cart-body');
+    if (!cartDiv) return;
+    if (status === 401) {
+        cartDiv.innerHTML =
+            "<div class='alert alert-warning mb-0'>You must be logged in to view your cart.</div>";
+    } else {
+        cartDiv.innerHTML =
+            "<div class='alert alert-danger mb-0'>An error occurred loading cart.</div>";
+    }
+    const btn = document.getElementById('checkout-btn');
+    if (btn) btn.disabled = true;
+}
+
+function flushCart() {
+    clearTimeout(flushTimer);
+    flushTimer = null;
+    const ops = pendingOps;
+    pendingOps = [];
+
+    return fetch('/api/cart/batch', {
+        method: 'POST',
+        headers: { 'Content-Type': 'application/json' },
+        body: JSON.stringify({ ops })
+    })
         .then(response => {
-            if (!response.ok) {
-                const cartDiv = document.getElementById('cart-body');
-                if (!cartDiv) return;
-                if (response.status === 401) {
-                    cartDiv.innerHTML =
-                        "<div class='alert alert-warning mb-0'>You must be logged in to view your cart.</div>";
-                } else {
-                    cartDiv.innerHTML =
-                        "<div class='alert alert-danger mb-0'>An error occurred loading cart.</div>";
-                }
-                const btn = document.getElementById('checkout-btn');
-                if (btn) btn.disabled = true;
-                return [];
+            if (response.status === 401) {
+                showCartError(401);
+                return null;
             }
-            return response.json();
+            return response.json().then(data => {
+                if (!data.success) {
+                    alert("Failed to update cart: " + (data.message || data.error || "Unknown error"));
+                    // nothing in the batch was applied; show the carts as they are
+                    if (ops.length) return flushCart();
+                    showCartError(response.status);
+                    return null;
+                }
+                renderCart(data.cart);
+                renderSaved(data.saved);
+                return data;
+            });
         })
-        .then(data => {
-            if (!data || !Array.isArray(data)) return;
+        .catch(() => showCartError(500));
+}
+
+// Queue a cart op; ops queued within `delay` ms go out together.
+function queueCartOp(op, delay = 0) {
+    pendingOps.push(op);
+    clearTimeout(flushTimer);
+    flushTimer = setTimeout(flushCart, delay);
+}
 
-            const tbody = document.getElementById('cart-table-body');
-            const emptyElem = document.getElementById('cart-empty');
-            const btn = document.getElementById('checkout-btn');
+function loadCart() {
+    return flushCart();
+}
 
-            if (!tbody || !emptyElem) return;
+function renderCart(data) {
+    if (!data || !Array.isArray(data)) return;
 
-            tbody.innerHTML = '';
-            let total = 0;
+    const tbody = document.getElementById('cart-table-body');
+    const emptyElem = document.getElementById('cart-empty');
+    const btn = document.getElementById('checkout-btn');
 
-            if (data.length === 0) {
-                emptyElem.style.display = 'block';
-                currentSubtotal = 0;
-                currentDiscount = 0;
-                updateTotalsDisplay();
-                if (btn) btn.disabled = true;
-                return;
-            }
+    if (!tbody || !emptyElem) return;
 
-            emptyElem.style.display = 'none';
-            if (btn) btn.disabled = false;
-
-            data.forEach(item => {
-                const lineTotal = Number(item.price) * Number(item.quantity || 0);
-                total += lineTotal;
-
-                const imgSrc = (item.image_url && item.image_url.trim())
-                    ? item.image_url
-                    : `https://picsum.photos/seed/${item.pid}/80/80`;
-
-                const productUrl = `/product/${item.pid}`;
-
-                const tr = document.createElement('tr');
-                tr.innerHTML = `
-                    <td>
-                      <div class="d-flex align-items-center">
-                        <img src="${imgSrc}"
-                             alt="${item.name}"
-                             class="me-2"
-                             style="width:64px;height:64px;object-fit:cover;border:1px solid #eee;border-radius:4px;">
-                        <div>
-                          <a href="${productUrl}" class="fw-semibold text-decoration-none">
-                            ${item.name}
-                          </a><br>
-                          <small class="text-muted">Product ID: ${item.pid}</small>
-                        </div>
-                      </div>
-                    </td>
-                    <td>${item.seller_id}</td>
-                    <td>$${Number(item.price).toFixed(2)}</td>
-                    <td style="width:110px;">
-                      <input type="number"
-                             class="form-control form-control-sm text-center cart-qty-input"
-                             value="${item.quantity}"
-                             min="1"
-                             data-pid="${item.pid}"
-                             data-sid="${item.seller_id}">
-                    </td>
-                    <td>$${lineTotal.toFixed(2)}</td>
-                    <td>
-                      <div class="btn-group btn-group-sm" role="group">
-                        <button class="btn btn-outline-secondary"
-                                onclick="saveForLater(${item.pid}, ${item.seller_id})">
-                          Save
-                        </button>
-                        <button class="btn btn-outline-danger"
-                                onclick="removeFromCart(${item.pid}, ${item.seller_id})">
-                          Remove
-                        </button>
-                      </div>
-                    </td>
-                `;
-                tbody.appendChild(tr);
-
-                const qtyInput = tr.querySelector('.cart-qty-input');
-                qtyInput.addEventListener('change', function () {
-                    const pid = this.getAttribute('data-pid');
-                    const seller_id = this.getAttribute('data-sid');
-                    const quantity = this.value;
-                    if (Number(quantity) < 1) {
-                        this.value = 1;
-                    }
-                    updateCart(pid, seller_id, this.value);
-                });
-            });
+    tbody.innerHTML = '';
+    let total = 0;
+
+    if (data.length === 0) {
+        emptyElem.style.display = 'block';
+        currentSubtotal = 0;
+        currentDiscount = 0;
+        updateTotalsDisplay();
+        if (btn) btn.disabled = true;
+        return;
+    }
 
-            currentSubtotal = total;
-            currentDiscount = 0; // reset discount when cart changes
-            updateTotalsDisplay();
+    emptyElem.style.display = 'none';
+    if (btn) btn.disabled = false;
+
+    data.forEach(item => {
+        const lineTotal = Number(item.price) * Number(item.quantity || 0);
+        total += lineTotal;
+
+        const imgSrc = (item.image_url && item.image_url.trim())
+            ? item.image_url
+            : `https://picsum.photos/seed/${item.pid}/80/80`;
+
+        const productUrl = `/product/${item.pid}`;
+
+        const tr = document.createElement('tr');
+        tr.innerHTML = `
+            <td>
+              <div class="d-flex align-items-center">
+                <img src="${imgSrc}"
+                     alt="${item.name}"
+                     class="me-2"
+                     style="width:64px;height:64px;object-fit:cover;border:1px solid #eee;border-radius:4px;">
+                <div>
+                  <a href="${productUrl}" class="fw-semibold text-decoration-none">
+                    ${item.name}
+                  </a><br>
+                  <small class="text-muted">Product ID: ${item.pid}</small>
+                </div>
+              </div>
+            </td>
+            <td>${item.seller_id}</td>
+            <td>$${Number(item.price).toFixed(2)}</td>
+            <td style="width:110px;">
+              <input type="number"
+                     class="form-control form-control-sm text-center cart-qty-input"
+                     value="${item.quantity}"
+                     min="1"
+                     data-pid="${item.pid}"
+                     data-sid="${item.seller_id}">
+            </td>
+            <td>$${lineTotal.toFixed(2)}</td>
+            <td>
+              <div class="btn-group btn-group-sm" role="group">
+                <button class="btn btn-outline-secondary"
+                        onclick="saveForLater(${item.pid}, ${item.seller_id})">
+                  Save
+                </button>
+                <button class="btn btn-outline-danger"
+                        onclick="removeFromCart(${item.pid}, ${item.seller_id})">
+                  Remove
+                </button>
+              </div>
+            </td>
+        `;
+        tbody.appendChild(tr);
+
+        const qtyInput = tr.querySelector('.cart-qty-input');
+        qtyInput.addEventListener('change', function () {
+            const pid = this.getAttribute('data-pid');
+            const seller_id = this.getAttribute('data-sid');
+            const quantity = this.value;
+            if (Number(quantity) < 1) {
+                this.value = 1;
+            }
+            // typing through several values sends one batch
+            queueCartOp({ op: 'update', pid: Number(pid), seller_id: Number(seller_id),
+                          quantity: Number(this.value) }, 400);
         });
+    });
+
+    currentSubtotal = total;
+    currentDiscount = 0; // reset discount when cart changes
+    updateTotalsDisplay();
 }
 
 /* ---------- Saved for later ---------- */
 
-function loadSaved() {
-    fetch('/api/cart/saved')
-        .then(r => r.ok ? r.json() : [])
-        .then(data => {
-            const tbody = document.getElementById('saved-table-body');
-            const emptyElem = document.getElementById('saved-empty');
-            if (!tbody || !emptyElem) return;
-
-            tbody.innerHTML = '';
-            if (!data || data.length === 0) {
-                emptyElem.style.display = 'block';
-                return;
-            }
-            emptyElem.style.display = 'none';
-
-            data.forEach(item => {
-                const imgSrc = (item.image_url && item.image_url.trim())
-                    ? item.image_url
-                    : `https://picsum.photos/seed/${item.pid}/80/80`;
-                const productUrl = `/product/${item.pid}`;
-
-                const tr = document.createElement('tr');
-                tr.innerHTML = `
-                    <td>
-                      <div class="d-flex align-items-center">
-                        <img src="${imgSrc}"
-                             alt="${item.name}"
-                             class="me-2"
-                             style="width:48px;height:48px;object-fit:cover;border:1px solid #eee;border-radius:4px;">
-                        <div>
-                          <a href="${productUrl}" class="fw-semibold text-decoration-none">
-                            ${item.name}
-                          </a><br>
-                          <small class="text-muted">Product ID: ${item.pid}</small>
-                        </div>
-                      </div>
-                    </td>
-                    <td>${item.seller_id}</td>
-                    <td>$${Number(item.price).toFixed(2)}</td>
-                    <td style="width:110px;">
-                      <input type="number"
-                             class="form-control form-control-sm text-center"
-                             value="${item.quantity}"
-                             min="1"
-                             disabled>
-                    </td>
-                    <td>
-                      <button class="btn btn-sm btn-outline-primary"
-                              onclick="moveToCart(${item.pid}, ${item.seller_id})">
-                        Move to Cart
-                      </button>
-                    </td>
-                `;
-                tbody.appendChild(tr);
-            });
-        });
+function renderSaved(data) {
+    const tbody = document.getElementById('saved-table-body');
+    const emptyElem = document.getElementById('saved-empty');
+    if (!tbody || !emptyElem) return;
+
+    tbody.innerHTML = '';
+    if (!data || data.length === 0) {
+        emptyElem.style.display = 'block';
+        return;
+    }
+    emptyElem.style.display = 'none';
+
+    data.forEach(item => {
+        const imgSrc = (item.image_url && item.image_url.trim())
+            ? item.image_url
+            : `https://picsum.photos/seed/${item.pid}/80/80`;
+        const productUrl = `/product/${item.pid}`;
+
+        const tr = document.createElement('tr');
+        tr.innerHTML = `
+            <td>
+              <div class="d-flex align-items-center">
+                <img src="${imgSrc}"
+                     alt="${item.name}"
+                     class="me-2"
+                     style="width:48px;height:48px;object-fit:cover;border:1px solid #eee;border-radius:4px;">
+                <div>
+                  <a href="${productUrl}" class="fw-semibold text-decoration-none">
+                    ${item.name}
+                  </a><br>
+                  <small class="text-muted">Product ID: ${item.pid}</small>
+                </div>
+              </div>
+            </td>
+            <td>${item.seller_id}</td>
+            <td>$${Number(item.price).toFixed(2)}</td>
+            <td style="width:110px;">
+              <input type="number"
+                     class="form-control form-control-sm text-center"
+                     value="${item.quantity}"
+                     min="1"
+                     disabled>
+            </td>
+            <td>
+              <button class="btn btn-sm btn-outline-primary"
+                      onclick="moveToCart(${item.pid}, ${item.seller_id})">
+                Move to Cart
+              </button>
+            </td>
+        `;
+        tbody.appendChild(tr);
+    });
 }
 
 window.saveForLater = function (pid, seller_id) {
-    fetch('/api/cart/save', {
-        method: 'POST',
-        headers: { 'Content-Type': 'application/json' },
-        body: JSON.stringify({ pid, seller_id, saved: true })
-    })
-        .then(r => r.json())
-        .then(d => {
-            if (d.success) {
-                loadCart();
-                loadSaved();
-            } else {
-                alert("Failed to save item: " + (d.error || "Unknown error"));
-            }
-        });
+    queueCartOp({ op: 'save', pid, seller_id });
 };
 
 window.moveToCart = function (pid, seller_id) {
-    fetch('/api/cart/save', {
-        method: 'POST',
-        headers: { 'Content-Type': 'application/json' },
-        body: JSON.stringify({ pid, seller_id, saved: false })
-    })
-        .then(r => r.json())
-        .then(d => {
-            if (d.success) {
-                loadCart();
-                loadSaved();
-            } else {
-                alert("Failed to move item: " + (d.error || "Unknown error"));
-            }
-        });
+    queueCartOp({ op: 'unsave', pid, seller_id });
 };
 
-/* ---------- Existing cart APIs ---------- */
+/* ---------- Existing cart actions, now sent through the batch API ---------- */
 
 window.updateCart = function (pid, seller_id, quantity) {
-    fetch('/api/cart/update', {
-        method: 'POST',
-        headers: { 'Content-Type': 'application/json' },
-        body: JSON.stringify({ pid, seller_id, quantity: Number(quantity) })
-    })
-        .then(response => response.json())
-        .then(data => {
-            if (data.success) {
-                loadCart();
-                loadSaved();
-            } else {
-                alert("Failed to update cart: " + (data.error || "Unknown error"));
-            }
-        });
+    queueCartOp({ op: 'update', pid: Number(pid), seller_id: Number(seller_id),
+                  quantity: Number(quantity) });
 };
 
 window.removeFromCart = function (pid, seller_id) {
-    fetch('/api/cart/remove', {
-        method: 'POST',
-        headers: { 'Content-Type': 'application/json' },
-        body: JSON.stringify({ pid, seller_id })
-    })
-        .then(response => response.json())
-        .then(data => {
-            if (data.success) {
-                loadCart();
-                loadSaved();
-            } else {
-                alert("Failed to remove from cart: " + (data.error || "Unknown error"));
-            }
-        });
+    queueCartOp({ op: 'remove', pid, seller_id });
 };
 
 /* ---------- Coupon: apply button + checkout ---------- */
@@ -302,7 +293,6 @@ window.checkoutCart = function () {
             if (!contentType || !contentType.includes("application/json")) {
                 alert("You must be logged in to checkout.");
                 loadCart();
-                loadSaved();
                 return Promise.reject("Not JSON: " + response.status);
             }
             return response.json();
@@ -321,7 +311,6 @@ window.checkoutCart = function () {
                 alert(data.message || "Checkout failed");
             }
             loadCart();
-            loadSaved();
         })
         .catch(err => {
             if (typeof err === "string" && err.startsWith("Not JSON:")) {
@@ -334,5 +323,4 @@ window.checkoutCart = function () {
 
 document.addEventListener('DOMContentLoaded', function () {
     loadCart();
-    loadSaved();
 });
\ No newline at end of file
@@ -7,6 +7,7 @@ from wtforms.validators import ValidationError, DataRequired, Email, EqualTo, Le
 from .models.user import User
 from flask import jsonify
 from .models.purchase import Purchase
+from .models.seller_stats import SellerStats
 from flask import current_app as app
 
 from flask import Blueprint
@@ -260,70 +261,28 @@ def order_details(order_id):
 # ============================================================================
 
 def get_seller_statistics(seller_id):
-    """Get statistics for a seller - gracefully handles missing tables"""
+    """Get statistics for a seller from the SellerStats rollup (one row lookup)"""
     try:
-        # Get total products
-        product_count = app.db.execute('''
-            SELECT COUNT(*) FROM products WHERE creator_id = :seller_id
-        ''', seller_id=seller_id)[0][0]
-        
-        # Get total sales
-        sales_data = app.db.execute('''
-            SELECT COUNT(DISTINCT o.id) as order_count,
-                   COALESCE(SUM(oi.quantity), 0) as items_sold,
-                   COALESCE(SUM(oi.price * oi.quantity), 0) as total_revenue
-            FROM orders o
-            JOIN orderitems oi ON o.id = oi.order_id
-            JOIN products p ON oi.product_id = p.id
-            WHERE p.creator_id = :seller_id
-            AND oi.fulfillment_status = 'fulfilled'
-        ''', seller_id=seller_id)
-        
-        # Try to get reviews (gracefully fail if table doesn't exist)
-        try:
-            rating_data = app.db.execute('''
-                SELECT AVG(r.rating) as avg_rating, COUNT(*) as review_count
-                FROM reviews r
-                JOIN products p ON r.product_id = p.id
-                WHERE p.creator_id = :seller_id
-            ''', seller_id=seller_id)
-            avg_rating = float(rating_data[0][0]) if rating_data and rating_data[0][0] else 0.0
-            review_count = rating_data[0][1] if rating_data else 0
-        except:
-            avg_rating = 0.0
-            review_count = 0
-        
-        # Get fulfillment rate
-        fulfillment_data = app.db.execute('''
-            SELECT 
-                COUNT(*) as total_orders,
-                COUNT(CASE WHEN oi.fulfillment_status = 'fulfilled' THEN 1 END) as fulfilled
-            FROM orderitems oi
-            JOIN products p ON oi.product_id = p.id
-            WHERE p.creator_id = :seller_id
-        ''', seller_id=seller_id)
-        
-        return {
-            'product_count': product_count,
-            'order_count': sales_data[0][0] if sales_data else 0,
-            'items_sold': sales_data[0][1] if sales_data else 0,
-            'total_revenue': float(sales_data[0][2]) if sales_data else 0.0,
-            'avg_rating': avg_rating,
-            'review_count': review_count,
-            'fulfillment_rate': (fulfillment_data[0][1] / fulfillment_data[0][0] * 100) if fulfillment_data and fulfillment_data[0][0] > 0 else 0
-        }
+        return SellerStats.get(seller_id)
     except Exception as e:
         print(f"Error getting seller statistics: {e}")
         return None
 
 
-def get_seller_reviews(seller_id):
+# seller reviews listed on /user/<id> and /sellers/<id>
+PROFILE_REVIEW_LIMIT = 20
+
+
+def get_seller_reviews(seller_id, limit=None):
     """
     Get *seller* reviews for a seller from SellerReviews.
 
     This returns a list of dicts that work for BOTH:
     - seller_profile.html (uses rating/comment/date_reviewed/reviewer_name)
     - public_profile.html (uses reviewer_id, review_text, created_at, etc.)
+
+    With limit, only the newest `limit` reviews are returned; the totals
+    come from get_seller_statistics.
     """
     try:
         rows = app.db.execute('''
@@ -339,7 +298,8 @@ def get_seller_reviews(seller_id):
             JOIN Users u ON sr.user_id = u.id
             WHERE sr.seller_id = :seller_id
             ORDER BY sr.date_reviewed DESC
-        ''', seller_id=seller_id)
+            LIMIT :limit
+        ''', seller_id=seller_id, limit=limit)
 
         reviews = []
         for row in rows:
@@ -410,18 +370,30 @@ def public_profile(user_id):
 
     if is_seller:
         seller_stats = get_seller_statistics(user_id)
-        reviews = get_seller_reviews(user_id)
+        reviews = get_seller_reviews(user_id, limit=PROFILE_REVIEW_LIMIT)
 
         if current_user.is_authenticated and current_user.id != user_id:
             # has this user ever ordered from this seller?
             sellers_bought = get_user_sellers(current_user.id)
             has_purchased_from_seller = any(s['id'] == user_id for s in sellers_bought)
 
-            # does this user already have a review?
-            for r in reviews:
-                if r.get('reviewer_id') == current_user.id:
-                    my_seller_review = r
-                    break
+            # does this user already have a review?  (it may be older than
+            # the reviews listed on the page)
+            rows = app.db.execute("""
+                SELECT rating, comment, date_reviewed
+                FROM SellerReviews
+                WHERE seller_id = :sid AND user_id = :uid
+                LIMIT 1
+            """, sid=user_id, uid=current_user.id)
+            if rows:
+                my_seller_review = {
+                    'rating': int(rows[0][0]),
+                    'comment': rows[0][1],
+                    'review_text': rows[0][1],
+                    'date_reviewed': rows[0][2],
+                    'created_at': rows[0][2],
+                    'reviewer_id': current_user.id,
+                }
     
     return render_template(
         'public_profile.html', 
@@ -517,30 +489,31 @@ def seller_review(seller_id):
         return redirect(url_for('users.seller_review', seller_id=seller_id))
 
     try:
-        existing = app.db.execute("""
-            SELECT id
-            FROM SellerReviews
-            WHERE seller_id = :sid AND user_id = :uid
-            LIMIT 1
-        """, sid=seller_id, uid=current_user.id)
-
-        if existing:
-            # update existing
-            app.db.execute("""
-                UPDATE SellerReviews
-                SET rating = :rating,
-                    comment = :comment,
-                    date_reviewed = NOW()
+        with app.db.transaction() as tx:
+            existing = tx.execute("""
+                SELECT id
+                FROM SellerReviews
                 WHERE seller_id = :sid AND user_id = :uid
-            """, rating=rating, comment=comment or None,
-               sid=seller_id, uid=current_user.id)
-        else:
-            # insert new
-            app.db.execute("""
-                INSERT INTO SellerReviews (seller_id, user_id, rating, comment, date_reviewed)
-                VALUES (:sid, :uid, :rating, :comment, NOW())
-            """, sid=seller_id, uid=current_user.id,
-               rating=rating, comment=comment or None)
+                LIMIT 1
+            """, sid=seller_id, uid=current_user.id)
+
+            if existing:
+                # update existing
+                tx.execute("""
+                    UPDATE SellerReviews
+                    SET rating = :rating,
+                        comment = :comment,
+                        date_reviewed = NOW()
+                    WHERE seller_id = :sid AND user_id = :uid
+                """, rating=rating, comment=comment or None,
+                   sid=seller_id, uid=current_user.id)
+            else:
+                # insert new
+                tx.execute("""
+                    INSERT INTO SellerReviews (seller_id, user_id, rating, comment, date_reviewed)
+                    VALUES (:sid, :uid, :rating, :comment, NOW())
+                """, sid=seller_id, uid=current_user.id,
+                   rating=rating, comment=comment or None)
 
         flash('Seller review saved!', 'success')
     except Exception as e:
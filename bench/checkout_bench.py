@@ -0,0 +1,152 @@
+"""
+Checkout benchmark: statement count and latency of the per-line checkout
+loop that /api/cart/checkout used to run vs. the set-based Checkout engine.
+
+Places real orders, so point .flaskenv at a scratch copy of the database:
+
+    python bench/checkout_bench.py [--repeat 5] [--sizes 1,10,100]
+"""
+import argparse
+import os
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from sqlalchemy import event
+
+from app import create_app
+from app.models.checkout import Checkout, CheckoutError
+
+
+BENCH_EMAIL = 'checkout-bench@example.com'
+
+
+def legacy_checkout(db, uid):
+    """The pre-engine algorithm: a few statements per cart line."""
+    cart_items = db.execute("""
+      SELECT CartItems.pid, CartItems.seller_id,
+             COALESCE(Inventory.seller_price, Products.price) AS price,
+             CartItems.quantity
+      FROM CartItems
+      JOIN Products ON CartItems.pid = Products.id
+      LEFT JOIN Inventory
+             ON CartItems.seller_id = Inventory.seller_id
+            AND CartItems.pid = Inventory.product_id
+      WHERE CartItems.uid = :uid
+    """, uid=uid)
+    db.execute("SELECT COALESCE(balance,0)::numeric FROM Users WHERE id = :uid", uid=uid)
+
+    total = 0.0
+    order_rows = []
+    seller_totals = {}
+    for pid, seller_id, price, qty in cart_items:
+        res = db.execute("""
+            UPDATE Inventory
+            SET quantity = quantity - :qty
+            WHERE seller_id = :seller_id AND product_id = :pid AND quantity >= :qty
+            RETURNING quantity,
+                      COALESCE(seller_price,
+                               (SELECT price FROM Products WHERE id = :pid)) AS actual_price;
+        """, seller_id=seller_id, pid=pid, qty=qty)
+        price = float(res[0][1])
+        total += price * qty
+        order_rows.append((pid, seller_id, qty, price))
+        seller_totals[seller_id] = seller_totals.get(seller_id, 0.0) + price * qty
+
+    db.execute("SELECT COALESCE(balance,0)::numeric FROM Users WHERE id = :uid FOR UPDATE", uid=uid)
+    order_id = db.execute("""
+        INSERT INTO Orders (user_id, total_amount) VALUES (:uid, :total) RETURNING id;
+    """, uid=uid, total=round(total, 2))[0][0]
+    for pid, seller_id, qty, price in order_rows:
+        db.execute("""
+            INSERT INTO OrderItems (order_id, product_id, seller_id, quantity, price)
+            VALUES (:order_id, :product_id, :seller_id, :quantity, :price)
+        """, order_id=order_id, product_id=pid, seller_id=seller_id, quantity=qty, price=price)
+    db.execute("UPDATE Users SET balance = balance - :amount WHERE id = :uid",
+               uid=uid, amount=round(total, 2))
+    for seller_id, amount in seller_totals.items():
+        db.execute("UPDATE Users SET balance = balance + :amount WHERE id = :sid",
+                   sid=seller_id, amount=amount)
+    db.execute("DELETE FROM CartItems WHERE uid = :uid", uid=uid)
+    return order_id
+
+
+def setup_buyer(db):
+    rows = db.execute("SELECT id FROM Users WHERE email = :email", email=BENCH_EMAIL)
+    if rows:
+        uid = rows[0][0]
+    else:
+        uid = db.execute("""
+            INSERT INTO Users (email, password, firstname, lastname)
+            VALUES (:email, '-', 'Checkout', 'Bench')
+            RETURNING id
+        """, email=BENCH_EMAIL)[0][0]
+    db.execute("UPDATE Users SET balance = 1e9 WHERE id = :uid", uid=uid)
+    return uid
+
+
+def fill_cart(db, uid, size):
+    """Put `size` distinct in-stock (product, seller) lines in the cart."""
+    db.execute("DELETE FROM CartItems WHERE uid = :uid", uid=uid)
+    inserted = db.execute("""
+        WITH lines AS (
+            SELECT DISTINCT ON (product_id) product_id, seller_id
+            FROM Inventory
+            WHERE seller_id <> :uid
+            ORDER BY product_id, seller_id
+            LIMIT :size
+        ), restocked AS (
+            UPDATE Inventory i
+            SET quantity = i.quantity + 10
+            FROM lines
+            WHERE i.product_id = lines.product_id AND i.seller_id = lines.seller_id
+        )
+        INSERT INTO CartItems (uid, pid, seller_id, quantity)
+        SELECT :uid, product_id, seller_id, 1 FROM lines
+    """, uid=uid, size=size)
+    if inserted < size:
+        sys.exit(f"Only {inserted} in-stock products available for a cart of {size}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--sizes', default='1,10,100')
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    app = create_app()
+    with app.app_context():
+        db = app.db
+        statements = [0]
+
+        @event.listens_for(db.engine, 'before_cursor_execute')
+        def count(*_args):
+            statements[0] += 1
+
+        uid = setup_buyer(db)
+        engines = {
+            'per-line': lambda: legacy_checkout(db, uid),
+            'set-based': lambda: Checkout.place_order(uid),
+        }
+
+        print(f"{'cart size':>9}  {'engine':<10} {'statements':>10} {'median ms':>10}")
+        for size in [int(s) for s in args.sizes.split(',')]:
+            for name, run in engines.items():
+                timings = []
+                for _ in range(args.repeat):
+                    fill_cart(db, uid, size)
+                    statements[0] = 0
+                    start = time.perf_counter()
+                    try:
+                        run()
+                    except CheckoutError as e:
+                        sys.exit(f"{name} checkout failed: {e.message}")
+                    timings.append((time.perf_counter() - start) * 1000)
+                print(f"{size:>9}  {name:<10} {statements[0]:>10} "
+                      f"{statistics.median(timings):>10.1f}")
+
+
+if __name__ == '__main__':
+    main()
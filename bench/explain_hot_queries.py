@@ -0,0 +1,253 @@
+"""
+EXPLAIN regression check for the hot lookup queries: every table a hot
+query touches by foreign key must be read through the index that
+db/migrations/ built for it, never with a sequential scan.  The
+statements are captured from the model methods that run them, so the
+check follows the code.
+
+With --seed the script first inflates the database to roughly --rows
+OrderItems (1M by default) plus proportional Orders, Products, Inventory
+and reviews, so the planner sees production-sized tables.  Seeding writes
+a lot of rows; only use it on a scratch database:
+
+    python bench/explain_hot_queries.py --seed --rows 1000000
+    python bench/explain_hot_queries.py          # check only
+
+Exits non-zero if any query misses its index.
+"""
+import argparse
+import json
+import os
+import sys
+from contextlib import contextmanager
+from datetime import datetime
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from sqlalchemy import event
+
+from app import create_app
+from app.models.cart import Cart
+from app.models.product import Product
+from app.models.purchase import Purchase
+from app.models.review import Review
+from app.models.seller_order import SellerOrder
+from app.models.seller_stats import SellerStats
+from app.pagination import encode_cursor
+from app.users import get_seller_reviews, PROFILE_REVIEW_LIMIT
+
+
+SEED_SQL = [
+    # users: buyers and sellers
+    """
+    INSERT INTO Users (email, password, firstname, lastname, balance)
+    SELECT 'bench' || g || '@example.com', '-', 'Bench', 'User' || g, 1000
+    FROM generate_series(1, :users) g
+    ON CONFLICT (email) DO NOTHING
+    """,
+    """
+    INSERT INTO Products (name, description, price, available, category_id, creator_id)
+    SELECT 'bench product ' || g, 'generated for EXPLAIN checks',
+           (g % 500) + 0.99, TRUE,
+           (SELECT MIN(id) FROM Categories),
+           (SELECT MIN(id) FROM Users) + g % :users
+    FROM generate_series(1, :products) g
+    ON CONFLICT (name) DO NOTHING
+    """,
+    # five sellers per product
+    """
+    INSERT INTO Inventory (seller_id, product_id, quantity, seller_price)
+    SELECT u.id, p.id, (p.id + k) % 20, (p.id % 500) + k
+    FROM (SELECT id FROM Products ORDER BY id DESC LIMIT :products) p
+    CROSS JOIN generate_series(0, 4) k
+    JOIN (SELECT id, row_number() OVER (ORDER BY id) - 1 AS n FROM Users) u
+      ON u.n = (p.id * 7 + k) % :users
+    ON CONFLICT DO NOTHING
+    """,
+    """
+    INSERT INTO Orders (user_id, total_amount, order_date, status)
+    SELECT (SELECT MIN(id) FROM Users) + g % :users, 10,
+           NOW() - (g % 365) * INTERVAL '1 day', 'pending'
+    FROM generate_series(1, :orders) g
+    """,
+    """
+    WITH o AS (
+        SELECT id, row_number() OVER (ORDER BY id) - 1 AS n
+        FROM (SELECT id FROM Orders ORDER BY id DESC LIMIT :orders) recent
+    ), i AS (
+        SELECT seller_id, product_id,
+               row_number() OVER (ORDER BY product_id, seller_id) - 1 AS n
+        FROM Inventory
+    )
+    INSERT INTO OrderItems (order_id, product_id, seller_id, quantity, price, fulfillment_status)
+    SELECT o.id, i.product_id, i.seller_id, 1 + g % 3, 9.99,
+           CASE WHEN g % 3 = 0 THEN 'fulfilled' ELSE 'pending' END
+    FROM generate_series(1, :rows) g
+    JOIN o ON o.n = g % :orders
+    JOIN i ON i.n = (g::bigint * 7919) % (SELECT COUNT(*) FROM Inventory)
+    """,
+    # ten reviewers per product
+    """
+    INSERT INTO Reviews (product_id, user_id, rating, comment)
+    SELECT p.id, u.id, 1 + (p.id + k) % 5, 'bench review'
+    FROM (SELECT id FROM Products ORDER BY id DESC LIMIT :products) p
+    CROSS JOIN generate_series(0, 9) k
+    JOIN (SELECT id, row_number() OVER (ORDER BY id) - 1 AS n FROM Users) u
+      ON u.n = (p.id + k * 37) % :users
+    ON CONFLICT DO NOTHING
+    """,
+    # and one best-seller reviewed by every user, for the review pages
+    """
+    INSERT INTO Reviews (product_id, user_id, rating, comment)
+    SELECT (SELECT MAX(id) FROM Products), u.id, 1 + u.id % 5, 'bench review'
+    FROM Users u
+    ON CONFLICT DO NOTHING
+    """,
+    """
+    INSERT INTO SellerReviews (seller_id, user_id, rating, comment)
+    SELECT (SELECT MIN(id) FROM Users) + g % :users,
+           (SELECT MIN(id) FROM Users) + (g * 13) % :users,
+           1 + g % 5, 'bench seller review'
+    FROM generate_series(1, :rows / 20) g
+    """,
+    "ANALYZE",
+]
+
+
+@contextmanager
+def captured(db):
+    """Collect the (statement, parameters) every cursor runs in the block."""
+    statements = []
+
+    def record(conn, cursor, statement, parameters, context, executemany):
+        statements.append((statement, parameters))
+
+    event.listen(db.engine, 'before_cursor_execute', record)
+    try:
+        yield statements
+    finally:
+        event.remove(db.engine, 'before_cursor_execute', record)
+
+
+def hot_queries(db):
+    """
+    (name, statement, parameters, {table: expected index}) for each hot
+    query, captured from the model code that runs it so the check follows
+    the SQL the app actually sends.
+    """
+    pid = db.execute("SELECT product_id FROM OrderItems ORDER BY id DESC LIMIT 1")[0][0]
+    sid = db.execute("SELECT seller_id FROM OrderItems ORDER BY id DESC LIMIT 1")[0][0]
+    uid = db.execute("SELECT user_id FROM Orders ORDER BY id DESC LIMIT 1")[0][0]
+    cart_uid = db.execute("SELECT COALESCE(MAX(uid), 0) FROM CartItems")[0][0]
+    reviewed_pid = db.execute("""
+        SELECT product_id FROM Reviews GROUP BY product_id ORDER BY COUNT(*) DESC LIMIT 1
+    """)[0][0]
+    now = datetime.utcnow().isoformat(sep=' ')
+
+    # (name, call, which of its statements to check, {table: expected index})
+    calls = [
+        ('Product.get', lambda: Product.get(pid), 0, {
+            'productstats': 'productstats_pkey',
+        }),
+        ('Product.get_detail sellers', lambda: Product.get_detail(pid), 0, {
+            'inventory': 'inventory_product_idx',
+        }),
+        ('Product.get_page cursor (price desc)', lambda: Product.get_page(
+            sort='price', direction='desc', count=None,
+            after=Product.encode_cursor('price', 'desc', '50.00', pid)), 0, {
+            'productstats': 'productstats_min_price_id_idx',
+        }),
+        ('Product.get_page cursor (name asc)', lambda: Product.get_page(
+            sort='name', direction='asc', count=None,
+            after=Product.encode_cursor('name', 'asc', 'm', pid)), 0, {
+            'products': 'products_lower_name_id_idx',
+        }),
+        ('Review.get_for_product (newest)', lambda: Review.get_for_product(
+            reviewed_pid, sort='newest', after=encode_cursor({'s': 'newest', 'k': [now, 0]})), 0,
+            {'reviews': 'reviews_product_date_idx'}),
+        ('Review.get_for_product (lowest)', lambda: Review.get_for_product(
+            reviewed_pid, sort='lowest', after=encode_cursor({'s': 'lowest', 'k': [1, now, 0]})), 0,
+            {'reviews': 'reviews_product_rating_date_idx'}),
+        ('SellerOrder.get_page', lambda: SellerOrder.get_page(
+            sid, after=encode_cursor({'d': now, 'o': 0})), 0,
+            {'ordersellersummary': 'ordersellersummary_seller_date_idx'}),
+        ('SellerOrder.get_page (pending)', lambda: SellerOrder.get_page(sid, status='pending'), 0,
+            {'ordersellersummary': 'ordersellersummary_seller_status_date_idx'}),
+        ('SellerOrder.get_items', lambda: SellerOrder.get_items(
+            sid, [r[0] for r in db.execute(
+                "SELECT order_id FROM OrderItems WHERE seller_id = :sid LIMIT 25", sid=sid)]), -1,
+            {'orderitems': 'orderitems_order_seller_idx'}),
+        ('Purchase.history_for_user', lambda: Purchase.history_for_user(uid), 0, {
+            'orders': 'orders_user_date_idx',
+            'orderitems': 'orderitems_order_seller_idx',
+        }),
+        ('Cart.get', lambda: Cart.get(cart_uid), 0,
+            {'cartitems': 'cartitems_uid_pid_seller_id_key'}),
+        ('get_seller_reviews', lambda: get_seller_reviews(sid, limit=PROFILE_REVIEW_LIMIT), 0,
+            {'sellerreviews': 'sellerreviews_seller_date_idx'}),
+        ('SellerStats.get', lambda: SellerStats.get(sid), 0,
+            {'sellerstats': 'sellerstats_pkey'}),
+    ]
+
+    # EXPLAIN the plain statement, not an EXECUTE of a prepared one
+    prepared, db.prepared_statements = db.prepared_statements, False
+    queries = []
+    try:
+        for name, call, which, expected in calls:
+            with captured(db) as statements:
+                call()
+            statement, parameters = statements[which]
+            queries.append((name, statement, parameters, expected))
+    finally:
+        db.prepared_statements = prepared
+    return queries
+
+
+def plan_nodes(node):
+    yield node
+    for child in node.get('Plans', []):
+        yield from plan_nodes(child)
+
+
+def check(db, name, statement, parameters, expected):
+    with db.engine.connect() as conn:
+        plan = conn.exec_driver_sql('EXPLAIN (FORMAT JSON) ' + statement, parameters).scalar()
+    if isinstance(plan, str):
+        plan = json.loads(plan)
+    nodes = list(plan_nodes(plan[0]['Plan']))
+    problems = []
+    for table, index in expected.items():
+        on_table = [n for n in nodes if n.get('Relation Name') == table]
+        if any(n['Node Type'] == 'Seq Scan' for n in on_table):
+            problems.append(f"sequential scan on {table}")
+        if not any(n.get('Index Name') == index for n in nodes):
+            problems.append(f"{index} not used")
+    status = 'FAIL' if problems else 'ok'
+    print(f"{status:>4}  {name}" + (f": {'; '.join(problems)}" if problems else ''))
+    return not problems
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--seed', action='store_true',
+                        help='inflate the database before checking (scratch DBs only)')
+    parser.add_argument('--rows', type=int, default=1_000_000,
+                        help='OrderItems rows to add when seeding')
+    args = parser.parse_args()
+
+    app = create_app()
+    with app.app_context():
+        db = app.db
+        if args.seed:
+            sizes = dict(rows=args.rows, orders=args.rows // 5,
+                         products=args.rows // 10, users=max(100, args.rows // 100))
+            for sql in SEED_SQL:
+                used = {k: v for k, v in sizes.items() if ':' + k in sql}
+                db.execute(sql, **used)
+
+        results = [check(db, *q) for q in hot_queries(db)]
+        sys.exit(0 if all(results) else 1)
+
+
+if __name__ == '__main__':
+    main()
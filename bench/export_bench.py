@@ -0,0 +1,75 @@
+"""
+Export memory benchmark: peak Python heap while writing an N-row CSV the
+old way (DB.read() fetches everything, then csv.writer over the list) vs.
+export.chunks() over DB.stream()'s server-side cursor, with the chunks
+discarded as a streamed response would send them.  The rows come from
+generate_series, so no data is needed:
+
+    python bench/export_bench.py [--rows 200000] [--batch-size 1000]
+"""
+import argparse
+import csv
+import io
+import os
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from app import create_app
+from app import export
+
+
+ROWS_SQL = """
+SELECT g AS id, md5(g::text) AS name, (g % 1000) + 0.99 AS price, now() AS exported_at
+FROM generate_series(1, :n) AS g
+ORDER BY g
+"""
+COLUMNS = ('id', 'name', 'price', 'exported_at')
+
+
+def buffered(app, n):
+    buf = io.StringIO()
+    writer = csv.writer(buf)
+    writer.writerow(COLUMNS)
+    writer.writerows(app.db.read(ROWS_SQL, n=n))
+    return len(buf.getvalue())
+
+
+def streamed(app, n, fmt='csv'):
+    return sum(len(chunk) for chunk in export.chunks(fmt, COLUMNS, ROWS_SQL, n=n))
+
+
+def measure(fn):
+    """(ms, peak MiB, bytes); timed on a separate run, as tracing slows it."""
+    start = time.perf_counter()
+    size = fn()
+    seconds = time.perf_counter() - start
+    tracemalloc.start()
+    fn()
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return seconds * 1000, peak / 2**20, size
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--rows', type=int, default=200_000)
+    parser.add_argument('--batch-size', type=int, default=1000)
+    args = parser.parse_args()
+
+    app = create_app()
+    app.config['EXPORT_BATCH_SIZE'] = args.batch_size
+    with app.app_context():
+        print(f"{'path':<14} {'rows':>8} {'ms':>8} {'peak MiB':>9} {'bytes':>11}")
+        for n in (args.rows // 10, args.rows):
+            for name, fn in (('read + csv', lambda: buffered(app, n)),
+                             ('stream csv', lambda: streamed(app, n)),
+                             ('stream jsonl', lambda: streamed(app, n, 'jsonl'))):
+                ms, peak, size = measure(fn)
+                print(f"{name:<14} {n:>8} {ms:>8.0f} {peak:>9.1f} {size:>11}")
+
+
+if __name__ == '__main__':
+    main()
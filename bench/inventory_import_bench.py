@@ -0,0 +1,127 @@
+"""
+Seller inventory resync benchmark: the per-product /update path (one
+ownership/existence check plus one write per row) vs. Inventory.bulk_import
+(COPY into a temp table + one INSERT ... ON CONFLICT).
+
+Creates --skus products and a bench seller the first time it runs, so
+point .flaskenv at a scratch copy of the database.  The per-row path is
+timed on the first --legacy-rows rows and extrapolated:
+
+    python bench/inventory_import_bench.py [--skus 50000] [--legacy-rows 2000] [--repeat 3]
+"""
+import argparse
+import io
+import os
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from sqlalchemy import event
+
+from app import create_app
+from app.models.inventory import Inventory
+
+
+BENCH_SELLER = 'inventory-bench@example.com'
+
+
+def legacy_row(db, seller_id, product_id, quantity, seller_price):
+    """What one /api/seller_inventory/add or /update request used to run."""
+    db.execute("SELECT id, available FROM Products WHERE id = :pid", pid=product_id)
+    existing = db.execute("""
+        SELECT seller_id FROM Inventory
+        WHERE seller_id = :seller_id AND product_id = :product_id
+    """, seller_id=seller_id, product_id=product_id)
+    if existing:
+        db.execute("""
+            UPDATE Inventory
+            SET quantity = :quantity, seller_price = :seller_price
+            WHERE seller_id = :seller_id AND product_id = :product_id
+        """, seller_id=seller_id, product_id=product_id,
+            quantity=quantity, seller_price=seller_price)
+    else:
+        db.execute("""
+            INSERT INTO Inventory (seller_id, product_id, quantity, seller_price)
+            VALUES (:seller_id, :product_id, :quantity, :seller_price)
+        """, seller_id=seller_id, product_id=product_id,
+            quantity=quantity, seller_price=seller_price)
+
+
+def setup(db, n_skus):
+    """(seller_id, [product ids]) for the bench, creating them if needed."""
+    seller = db.execute("""
+        INSERT INTO Users (email, password, firstname, lastname, balance)
+        VALUES (:email, '-', 'Inventory', 'Bench', 0)
+        ON CONFLICT (email) DO UPDATE SET firstname = EXCLUDED.firstname
+        RETURNING id
+    """, email=BENCH_SELLER)[0][0]
+    have = db.execute("SELECT COUNT(*) FROM Products WHERE name LIKE 'inventory-bench-%'")[0][0]
+    if have < n_skus:
+        db.execute("""
+            INSERT INTO Products (name, description, price, available, category_id, creator_id)
+            SELECT 'inventory-bench-' || g, 'generated for the inventory import benchmark',
+                   10 + g % 90, TRUE, (SELECT MIN(id) FROM Categories), :seller
+            FROM generate_series(:start, :n) g
+        """, seller=seller, start=have + 1, n=n_skus)
+        db.execute("ANALYZE")
+    pids = [r[0] for r in db.execute("""
+        SELECT id FROM Products WHERE name LIKE 'inventory-bench-%' ORDER BY id LIMIT :n
+    """, n=n_skus)]
+    return seller, pids
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--skus', type=int, default=50_000)
+    parser.add_argument('--legacy-rows', type=int, default=2_000)
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    app = create_app()
+    with app.app_context():
+        db = app.db
+        statements = [0]
+
+        @event.listens_for(db.engine, 'before_cursor_execute')
+        def count(*_args):
+            statements[0] += 1
+
+        seller, pids = setup(db, args.skus)
+
+        def feed(round_):
+            # every round changes every row, so each is a real resync
+            return [(pid, (pid + round_) % 100, f'{5 + (pid + round_) % 50}.99') for pid in pids]
+
+        print(f"{'path':<12} {'rows':>8} {'statements':>10} {'median s':>9} {'rows/s':>9}")
+
+        timings = []
+        for round_ in range(args.repeat):
+            rows = feed(round_)[:args.legacy_rows]
+            statements[0] = 0
+            start = time.perf_counter()
+            for row in rows:
+                legacy_row(db, seller, *row)
+            timings.append(time.perf_counter() - start)
+        per_row = statistics.median(timings) / len(rows)
+        print(f"{'per-row':<12} {len(rows):>8} {statements[0]:>10} "
+              f"{statistics.median(timings):>9.2f} {1 / per_row:>9.0f}"
+              f"   (~{per_row * len(pids):.0f} s for {len(pids)} rows)")
+
+        timings = []
+        for round_ in range(args.repeat):
+            body = 'product_id,quantity,seller_price\n' + ''.join(
+                f'{pid},{qty},{price}\n' for pid, qty, price in feed(round_))
+            statements[0] = 0
+            start = time.perf_counter()
+            results = Inventory.bulk_import(seller, io.BytesIO(body.encode()))
+            timings.append(time.perf_counter() - start)
+            assert all(r['result'] != 'error' for r in results), results[:5]
+        # COPY goes around the SQLAlchemy cursor events, so count it by hand
+        print(f"{'bulk_import':<12} {len(pids):>8} {statements[0] + 1:>10} "
+              f"{statistics.median(timings):>9.2f} {len(pids) / statistics.median(timings):>9.0f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,139 @@
+"""
+JSON serialization benchmark for a 10k-row /api/seller_inventory
+response: the old path (fetch rows, dict(zip(...)) per row, convert
+Decimals field by field, Flask's default jsonify encoder) vs.
+FastJSONProvider over the same dicts vs. DB.read_json (Postgres encodes
+the rows), plus bytes on the wire with gzip/brotli.
+
+Creates --rows products and a bench seller listing them the first time it
+runs, so point .flaskenv at a scratch copy of the database:
+
+    python bench/json_bench.py [--rows 10000] [--repeat 10]
+"""
+import argparse
+import gzip
+import os
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from flask.json.provider import DefaultJSONProvider
+
+from app import create_app
+from app.compress import brotli
+from app.serialize import FastJSONProvider, orjson
+
+
+BENCH_SELLER = 'json-bench@example.com'
+
+INVENTORY_SQL = """
+    SELECT p.id,
+           p.name,
+           p.price AS base_price,
+           i.seller_price,
+           i.quantity,
+           COALESCE(p.available, FALSE) AS available
+    FROM Inventory i
+    JOIN Products p ON i.product_id = p.id
+    WHERE i.seller_id = :seller_id
+    ORDER BY p.id
+"""
+COLUMNS = ['id', 'name', 'base_price', 'seller_price', 'quantity', 'available']
+
+
+def setup(db, n_rows):
+    """The bench seller's id, giving them n_rows listings if needed."""
+    seller = db.execute("""
+        INSERT INTO Users (email, password, firstname, lastname, balance)
+        VALUES (:email, '-', 'JSON', 'Bench', 0)
+        ON CONFLICT (email) DO UPDATE SET firstname = EXCLUDED.firstname
+        RETURNING id
+    """, email=BENCH_SELLER)[0][0]
+    have = db.execute("SELECT COUNT(*) FROM Products WHERE name LIKE 'json-bench-%'")[0][0]
+    if have < n_rows:
+        db.execute("""
+            INSERT INTO Products (name, description, price, available, category_id, creator_id)
+            SELECT 'json-bench-' || g, 'generated for the JSON benchmark',
+                   10 + g % 90 + 0.99, TRUE, (SELECT MIN(id) FROM Categories), :seller
+            FROM generate_series(:start, :n) g
+        """, seller=seller, start=have + 1, n=n_rows)
+    db.execute("""
+        INSERT INTO Inventory (seller_id, product_id, quantity, seller_price)
+        SELECT :seller, id, id % 50, 5 + id % 40 + 0.49
+        FROM Products
+        WHERE name LIKE 'json-bench-%'
+        ORDER BY id
+        LIMIT :n
+        ON CONFLICT (seller_id, product_id) DO NOTHING
+    """, seller=seller, n=n_rows)
+    db.execute("ANALYZE")
+    return seller
+
+
+def legacy(app, seller):
+    """What /api/seller_inventory did before read_json."""
+    rows = app.db.execute(INVENTORY_SQL, seller_id=seller)
+    results = [dict(zip(COLUMNS, row)) for row in rows]
+    for r in results:
+        if r.get('base_price') is not None:
+            r['base_price'] = float(r['base_price'])
+        if r.get('seller_price') is not None:
+            r['seller_price'] = float(r['seller_price'])
+    return DefaultJSONProvider(app).dumps(results).encode()
+
+
+def provider(app, seller):
+    rows = app.db.read(INVENTORY_SQL, seller_id=seller)
+    return FastJSONProvider(app).response([dict(zip(COLUMNS, row)) for row in rows]).get_data()
+
+
+def read_json(app, seller):
+    return app.db.read_json(INVENTORY_SQL, seller_id=seller).encode()
+
+
+def timed(fn, repeat):
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        out = fn()
+        timings.append(time.perf_counter() - start)
+    return statistics.median(timings) * 1000, out
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--rows', type=int, default=10_000)
+    parser.add_argument('--repeat', type=int, default=10)
+    args = parser.parse_args()
+
+    app = create_app()
+    with app.app_context():
+        seller = setup(app.db, args.rows)
+        print(f"orjson: {'yes' if orjson else 'no'}   brotli: {'yes' if brotli else 'no'}")
+
+        fetch_ms, rows = timed(lambda: app.db.read(INVENTORY_SQL, seller_id=seller), args.repeat)
+        print(f"{len(rows)} rows; fetching them alone takes {fetch_ms:.1f} ms\n")
+
+        print(f"{'path':<14} {'median ms':>9} {'bytes':>9}")
+        bodies = {}
+        for name, fn in (('legacy', legacy), ('provider', provider), ('read_json', read_json)):
+            ms, body = timed(lambda: fn(app, seller), args.repeat)
+            bodies[name] = body
+            print(f"{name:<14} {ms:>9.1f} {len(body):>9}")
+
+        body = bodies['read_json']
+        print(f"\n{'encoding':<14} {'median ms':>9} {'bytes':>9}")
+        print(f"{'identity':<14} {0:>9.1f} {len(body):>9}")
+        ms, out = timed(lambda: gzip.compress(body, compresslevel=app.config['COMPRESS_GZIP_LEVEL']),
+                        args.repeat)
+        print(f"{'gzip':<14} {ms:>9.1f} {len(out):>9}")
+        if brotli is not None:
+            ms, out = timed(lambda: brotli.compress(body, quality=app.config['COMPRESS_BROTLI_QUALITY']),
+                            args.repeat)
+            print(f"{'br':<14} {ms:>9.1f} {len(out):>9}")
+
+
+if __name__ == '__main__':
+    main()
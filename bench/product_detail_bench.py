@@ -0,0 +1,149 @@
+"""
+Product page benchmark: round-trips and latency of the query-per-section
+loader product_detail used to run vs. Product.get_detail().
+
+Adds a product with --sellers sellers and --reviews reviews (plus the
+users behind them) the first time it runs, so point .flaskenv at a
+scratch copy of the database:
+
+    python bench/product_detail_bench.py [--sellers 100] [--reviews 10000] [--repeat 20]
+"""
+import argparse
+import os
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from sqlalchemy import event
+
+from app import create_app
+from app.models.product import Product
+
+
+BENCH_PRODUCT = 'product-detail-bench'
+
+
+def legacy_detail(db, pid, viewer_id):
+    """The pre-get_detail page: one transaction per section."""
+    product = Product.get(pid)
+    stats = db.execute("""
+        SELECT AVG(rating)::numeric, COUNT(*)
+        FROM Reviews
+        WHERE product_id = :pid
+    """, pid=pid)
+    db.execute("SELECT COALESCE(SUM(quantity),0) FROM OrderItems WHERE product_id = :pid", pid=pid)
+    db.execute("SELECT id, firstname, lastname FROM Users WHERE id = :uid", uid=product.creator_id)
+    sellers = db.execute("""
+      SELECT i.seller_id, i.quantity, COALESCE(i.seller_price, p.price) as seller_price,
+             u.firstname, u.lastname
+      FROM Inventory i
+      JOIN Users u ON u.id = i.seller_id
+      LEFT JOIN Products p ON p.id = i.product_id
+      WHERE i.product_id = :pid
+      ORDER BY i.seller_id
+    """, pid=pid)
+    reviews = db.execute("""
+      SELECT r.user_id, r.rating, r.comment, r.date_reviewed, u.firstname, u.lastname
+      FROM Reviews r
+      LEFT JOIN Users u ON u.id = r.user_id
+      WHERE r.product_id = :pid
+      ORDER BY r.date_reviewed DESC
+    """, pid=pid)
+    db.execute("""
+        SELECT 1 FROM Reviews WHERE product_id = :pid AND user_id = :uid LIMIT 1
+    """, pid=pid, uid=viewer_id)
+    # the page's template context, built the way the old view did
+    sellers = [{'seller_id': r[0], 'quantity': r[1],
+                'seller_price': float(r[2]) if r[2] is not None else None,
+                'firstname': r[3], 'lastname': r[4]} for r in sellers]
+    reviews = [{'user_id': r[0], 'rating': int(r[1]), 'comment': r[2],
+                'date_reviewed': r[3], 'firstname': r[4], 'lastname': r[5]} for r in reviews]
+    return product, stats, sellers, reviews
+
+
+def setup_product(db, n_sellers, n_reviews):
+    """The bench product's id, creating it and its sellers/reviewers if needed."""
+    rows = db.execute("SELECT id FROM Products WHERE name = :name", name=BENCH_PRODUCT)
+    if rows:
+        return rows[0][0]
+
+    n_users = max(n_sellers, n_reviews)
+    db.execute("""
+        INSERT INTO Users (email, password, firstname, lastname, balance)
+        SELECT 'detail-bench' || g || '@example.com', '-', 'Detail', 'Bench' || g, 0
+        FROM generate_series(1, :n) g
+        ON CONFLICT (email) DO NOTHING
+    """, n=n_users)
+    pid = db.execute("""
+        INSERT INTO Products (name, description, price, available, category_id, creator_id)
+        VALUES (:name, 'generated for the product page benchmark', 19.99, TRUE,
+                (SELECT MIN(id) FROM Categories), (SELECT MIN(id) FROM Users))
+        RETURNING id
+    """, name=BENCH_PRODUCT)[0][0]
+    bench_users = """
+        SELECT id, row_number() OVER (ORDER BY id) AS n
+        FROM Users WHERE email LIKE 'detail-bench%@example.com'
+    """
+    db.execute(f"""
+        INSERT INTO Inventory (seller_id, product_id, quantity, seller_price)
+        SELECT u.id, :pid, 1 + u.n % 50, 15 + u.n % 10
+        FROM ({bench_users}) u
+        WHERE u.n <= :n
+    """, pid=pid, n=n_sellers)
+    db.execute(f"""
+        INSERT INTO Reviews (product_id, user_id, rating, comment, date_reviewed)
+        SELECT :pid, u.id, 1 + u.n % 5, 'bench review ' || u.n,
+               NOW() - u.n * INTERVAL '1 minute'
+        FROM ({bench_users}) u
+        WHERE u.n <= :n
+    """, pid=pid, n=n_reviews)
+    db.execute("ANALYZE")
+    return pid
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--sellers', type=int, default=100)
+    parser.add_argument('--reviews', type=int, default=10_000)
+    parser.add_argument('--repeat', type=int, default=20)
+    args = parser.parse_args()
+
+    app = create_app()
+    with app.app_context():
+        db = app.db
+        statements = [0]
+
+        @event.listens_for(db.engine, 'before_cursor_execute')
+        def count(*_args):
+            statements[0] += 1
+
+        big = setup_product(db, args.sellers, args.reviews)
+        small = db.execute("""
+            SELECT product_id FROM Reviews
+            GROUP BY product_id ORDER BY COUNT(*), product_id LIMIT 1
+        """)[0][0]
+        viewer = db.execute("SELECT MIN(id) FROM Users")[0][0]
+
+        loaders = {
+            'per-section': lambda pid: legacy_detail(db, pid, viewer),
+            'get_detail': lambda pid: Product.get_detail(pid, viewer_id=viewer),
+        }
+
+        print(f"{'product':<28} {'loader':<12} {'statements':>10} {'median ms':>10}")
+        for label, pid in ((f'{args.sellers} sellers/{args.reviews} reviews', big),
+                           ('few reviews', small)):
+            for name, load in loaders.items():
+                timings = []
+                for _ in range(args.repeat):
+                    statements[0] = 0
+                    start = time.perf_counter()
+                    load(pid)
+                    timings.append((time.perf_counter() - start) * 1000)
+                print(f"{label:<28} {name:<12} {statements[0]:>10} "
+                      f"{statistics.median(timings):>10.1f}")
+
+
+if __name__ == '__main__':
+    main()
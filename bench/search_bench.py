@@ -0,0 +1,145 @@
+"""
+Product search benchmark: the old "name ILIKE '%q%' OR description ILIKE
+'%q%'" filter against the tsvector/GIN search from
+db/migrations/004_product_search.sql.
+
+With --seed the script first adds --products generated products (1M by
+default) whose names and descriptions are drawn from a small vocabulary,
+so common words match many rows, plus one of 5000 brand names each, so a
+brand matches a few hundred.  Seeding writes a lot of rows; only use it
+on a scratch database:
+
+    python bench/search_bench.py --seed --products 1000000
+    python bench/search_bench.py                  # benchmark only
+"""
+import argparse
+import os
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from app import create_app
+from app.models.product import Product
+
+
+VOCABULARY = '''
+wireless bluetooth headphones speaker charger cable laptop keyboard mouse
+monitor stand desk lamp chair pillow blanket mug kettle blender toaster
+knife skillet pan pot spatula bottle backpack wallet watch sunglasses
+jacket hoodie sneakers boots sandals socks scarf gloves umbrella tent
+lantern compass hammock cooler grill camera tripod lens drone battery
+portable compact deluxe classic modern vintage premium organic ergonomic
+waterproof rechargeable adjustable foldable stainless bamboo leather
+cotton wool ceramic glass steel aluminum red blue green black white grey
+'''.split()
+
+SEED_SQL = """
+INSERT INTO Products (name, description, price, available, category_id, creator_id)
+SELECT initcap(w[1 + (g * 7) % n] || ' ' || w[1 + (g * 13) % n] || ' ' || w[1 + (g * 31) % n])
+           || ' ' || (SELECT COALESCE(MAX(id), 0) FROM Products) + g,
+       w[1 + (g * 3) % n] || ' ' || w[1 + (g * 11) % n] || ' ' || w[1 + (g * 17) % n] || ' '
+           || w[1 + (g * 19) % n] || ' ' || w[1 + (g * 23) % n] || ' ' || w[1 + (g * 29) % n]
+           || ' by acme' || (g * 7) % 5000,
+       (g % 500) + 0.99, g % 10 <> 0,
+       (SELECT MIN(id) FROM Categories),
+       (SELECT MIN(id) FROM Users)
+FROM generate_series(1, :products) g,
+     (SELECT CAST(:words AS TEXT[]) AS w, cardinality(CAST(:words AS TEXT[])) AS n) vocab
+"""
+
+# (label, search box text): a rare word, a common word, two words, and a
+# type-ahead prefix
+QUERIES = [
+    ('one rare word', 'acme4242'),
+    ('one common word', 'wireless'),
+    ('two words', 'stainless kettle'),
+    ('prefix', 'headph'),
+]
+
+# one get_page-style page and its COUNT(*), the old way and the new way
+ILIKE_SQL = """
+SELECT P.id, P.name
+FROM Products P
+WHERE P.available = TRUE
+  AND (P.name ILIKE :q OR P.description ILIKE :q)
+ORDER BY P.id
+LIMIT :k
+"""
+
+ILIKE_COUNT_SQL = """
+SELECT COUNT(*)
+FROM Products P
+WHERE P.available = TRUE
+  AND (P.name ILIKE :q OR P.description ILIKE :q)
+"""
+
+FTS_SQL = """
+SELECT P.id, P.name
+FROM Products P
+WHERE P.available = TRUE
+  AND P.search_vector @@ to_tsquery('english', :tsq)
+ORDER BY P.id
+LIMIT :k
+"""
+
+FTS_COUNT_SQL = """
+SELECT COUNT(*)
+FROM Products P
+WHERE P.available = TRUE
+  AND P.search_vector @@ to_tsquery('english', :tsq)
+"""
+
+
+def timed(db, sql, params, repeat):
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        rows = db.read(sql, **params)
+        times.append(time.perf_counter() - start)
+    return statistics.median(times) * 1000, len(rows)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--seed', action='store_true',
+                        help='add generated products before benchmarking (scratch DBs only)')
+    parser.add_argument('--products', type=int, default=1_000_000,
+                        help='products to add when seeding')
+    parser.add_argument('--k', type=int, default=10, help='results per search')
+    parser.add_argument('--repeat', type=int, default=5, help='runs per query (median is reported)')
+    args = parser.parse_args()
+
+    app = create_app()
+    with app.app_context():
+        db = app.db
+        if args.seed:
+            db.execute(SEED_SQL, products=args.products, words=VOCABULARY)
+            db.execute("ANALYZE Products")
+        count = db.read("SELECT COUNT(*) FROM Products")[0][0]
+        print(f"{count} products, top {args.k}, median of {args.repeat} runs\n")
+        print(f"{'query':<16} {'ILIKE page':>11} {'ILIKE count':>12} {'FTS page':>9} "
+              f"{'FTS count':>10} {'search()':>9} {'matches':>8}   (ms)")
+
+        for label, text in QUERIES:
+            tsq = Product.search_query(text)
+            # ILIKE can't take a prefix of the last word either; match the
+            # whole text as a substring, which is what get_page used to do
+            ilike = {'q': f'%{text}%', 'k': args.k}
+            ilike_ms, _ = timed(db, ILIKE_SQL, ilike, args.repeat)
+            ilike_count_ms, _ = timed(db, ILIKE_COUNT_SQL, ilike, args.repeat)
+            fts = {'tsq': tsq, 'k': args.k}
+            fts_ms, _ = timed(db, FTS_SQL, fts, args.repeat)
+            fts_count_ms, _ = timed(db, FTS_COUNT_SQL, fts, args.repeat)
+            start = time.perf_counter()
+            for _ in range(args.repeat):
+                Product.search(text, args.k)
+            search_ms = (time.perf_counter() - start) / args.repeat * 1000
+            matches = db.read(FTS_COUNT_SQL, **fts)[0][0]
+            print(f"{label:<16} {ilike_ms:>11.1f} {ilike_count_ms:>12.1f} {fts_ms:>9.1f} "
+                  f"{fts_count_ms:>10.1f} {search_ms:>9.1f} {matches:>8}")
+
+
+if __name__ == '__main__':
+    main()
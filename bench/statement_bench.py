@@ -0,0 +1,112 @@
+"""
+Statement reuse benchmark: building a text() per call vs. DB's text()
+cache, and the hot lookups (Product.get, Cart.get, User row load) as
+plain statements vs. server-side prepared statements
+(DB_PREPARED_STATEMENTS).  Also reports the planning time Postgres
+reports for each form, which is what PREPARE saves on the server.
+
+Read-only; any database with the sample data will do:
+
+    python bench/statement_bench.py [--calls 2000] [--repeat 3]
+"""
+import argparse
+import os
+import re
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from sqlalchemy import text
+
+from app import create_app
+from app.models.cart import Cart
+from app.models.product import Product
+from app.models.user import User
+
+
+def timed(fn, calls, repeat):
+    """Median microseconds per call over repeat rounds of calls calls."""
+    rounds = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for i in range(calls):
+            fn(i)
+        rounds.append((time.perf_counter() - start) / calls * 1e6)
+    return statistics.median(rounds)
+
+
+def planning_ms(db, sqlstr, prepared, **params):
+    """Planning Time from EXPLAIN ANALYZE of the plain or prepared form."""
+    with db.transaction(readonly=True) as tx:
+        if prepared:
+            name, prepare_sql, names = db.prepared_form(sqlstr)
+            # under its own name: the pooled connection may hold the real one
+            tx.conn.exec_driver_sql(prepare_sql.replace(name, name + '_plan', 1))
+            name += '_plan'
+            # past the 5 custom plans, so Postgres settles on a generic one
+            for _ in range(6):
+                tx.execute(f"EXECUTE {name}({', '.join(':' + n for n in names)})", **params)
+            plan = tx.execute(f"EXPLAIN (ANALYZE, SUMMARY) EXECUTE {name}"
+                              f"({', '.join(':' + n for n in names)})", **params)
+            tx.conn.exec_driver_sql(f'DEALLOCATE {name}')
+        else:
+            plan = tx.execute('EXPLAIN (ANALYZE, SUMMARY) ' + sqlstr, **params)
+    for (line,) in plan:
+        match = re.match(r'Planning Time: ([\d.]+) ms', line)
+        if match:
+            return float(match.group(1))
+    return 0.0
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--calls', type=int, default=2_000)
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    app = create_app()
+    with app.app_context():
+        db = app.db
+        pids = [r[0] for r in db.read("SELECT id FROM Products ORDER BY id LIMIT 500")]
+        uids = [r[0] for r in db.read("SELECT id FROM Users ORDER BY id LIMIT 500")]
+        cart_uids = [r[0] for r in db.read("SELECT DISTINCT uid FROM CartItems ORDER BY uid LIMIT 500")]
+
+        page_sql = Product._base_select() + '''
+WHERE P.available = TRUE AND PS.min_price BETWEEN :lo AND :hi
+ORDER BY PS.min_price, P.id
+LIMIT :limit
+'''
+        print(f"{'text() for a get_page-sized query':<40} {'us/call':>8}")
+        print(f"{'  new text() per call':<40} {timed(lambda i: text(page_sql), args.calls, args.repeat):>8.1f}")
+        print(f"{'  DB.statements.text()':<40} "
+              f"{timed(lambda i: db.statements.text(page_sql), args.calls, args.repeat):>8.1f}")
+
+        # (label, one call, a fragment that picks out its statement, params for EXPLAIN)
+        lookups = (
+            ('Product.get', lambda i: Product.get(pids[i % len(pids)]), 'WHERE P.id = :id',
+             {'id': pids[0]}),
+            ('User row', lambda i: User._load_row(uids[i % len(uids)]), 'FROM Users',
+             {'id': uids[0]}),
+            ('Cart.get', lambda i: Cart.get(cart_uids[i % len(cart_uids)]), 'FROM CartItems c',
+             {'uid': cart_uids[0]}),
+        )
+
+        print(f"\n{'lookup':<14} {'plain us':>9} {'prepared us':>12} {'plan ms':>8} {'prepared plan ms':>17}")
+        for name, call, fragment, params in lookups:
+            db.prepared_statements = False
+            plain = timed(call, args.calls, args.repeat)
+            db.prepared_statements = True
+            call(0)  # PREPARE on this connection first
+            prepared = timed(call, args.calls, args.repeat)
+            sqlstr = next(s for s in db._prepared_forms if fragment in s)
+            print(f"{name:<14} {plain:>9.0f} {prepared:>12.0f} "
+                  f"{planning_ms(db, sqlstr, False, **params):>8.3f} "
+                  f"{planning_ms(db, sqlstr, True, **params):>17.3f}")
+
+        print('\n', db.statement_stats())
+
+
+if __name__ == '__main__':
+    main()
@@ -1,3 +1,6 @@
+-- Base tables only.  Secondary indexes and later schema changes are
+-- versioned under migrations/ and applied by migrate.sh.
+
 -- USERS
 CREATE TABLE Users (
     id INT NOT NULL PRIMARY KEY GENERATED BY DEFAULT AS IDENTITY,
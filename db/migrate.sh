@@ -0,0 +1,30 @@
+#!/bin/bash
+# Apply every db/migrations/*.sql not yet recorded in SchemaMigrations,
+# in file-name order.  Each migration runs in its own transaction together
+# with the row that records it, so a failed migration leaves no trace and
+# can simply be fixed and re-run.
+
+mypath=`realpath "$0"`
+mybase=`dirname "$mypath"`
+cd $mybase
+
+source ../.flaskenv
+dbname="${1:-$DB_NAME}"
+
+psql -qc "SET client_min_messages TO warning;
+CREATE TABLE IF NOT EXISTS SchemaMigrations (
+    version VARCHAR(255) NOT NULL PRIMARY KEY,
+    applied_at TIMESTAMP WITHOUT TIME ZONE NOT NULL DEFAULT (CURRENT_TIMESTAMP AT TIME ZONE 'UTC')
+)" $dbname || exit 1
+
+for f in migrations/*.sql; do
+    version=`basename $f .sql`
+    if [[ -n `psql -qtAc "SELECT 1 FROM SchemaMigrations WHERE version = '$version'" $dbname` ]]; then
+        continue
+    fi
+    echo "Applying $version"
+    psql -v ON_ERROR_STOP=1 --single-transaction -q \
+        -f $f \
+        -c "INSERT INTO SchemaMigrations(version) VALUES ('$version')" \
+        $dbname || exit 1
+done
@@ -0,0 +1,54 @@
+-- Secondary indexes for the foreign-key lookups the app runs on every page.
+-- Each index is shaped after the query that needs it; the query is named
+-- next to the index.  (CartItems.uid, Reviews.product_id, Wishes.uid and
+-- Inventory.seller_id are already the leading column of a unique/primary
+-- key index, so they need nothing extra.)
+
+-- Product._base_select / Product.get_page / index page:
+--   MIN(seller_price) FROM Inventory WHERE product_id = :pid AND quantity > 0
+-- Partial + covering, so the lowest in-stock price is an index-only scan.
+CREATE INDEX IF NOT EXISTS inventory_in_stock_price_idx
+    ON Inventory (product_id, seller_price)
+    WHERE quantity > 0;
+
+-- product_detail seller list, checkout seller selection:
+--   Inventory WHERE product_id = :pid [AND quantity >= :qty]
+CREATE INDEX IF NOT EXISTS inventory_product_idx
+    ON Inventory (product_id) INCLUDE (quantity, seller_price);
+
+-- Product._base_select total_sold, product_detail:
+--   SUM(quantity) FROM OrderItems WHERE product_id = :pid
+CREATE INDEX IF NOT EXISTS orderitems_product_idx
+    ON OrderItems (product_id) INCLUDE (quantity);
+
+-- /api/seller_orders, /api/seller_analytics, user_has_purchased_from_seller:
+--   OrderItems WHERE seller_id = :sid [GROUP BY order_id]
+CREATE INDEX IF NOT EXISTS orderitems_seller_order_idx
+    ON OrderItems (seller_id, order_id);
+
+-- Purchase.history_for_user / get_order_details / /api/order_items:
+--   JOIN OrderItems ON order_id [AND seller_id = :sid]
+CREATE INDEX IF NOT EXISTS orderitems_order_seller_idx
+    ON OrderItems (order_id, seller_id);
+
+-- Purchase.*, index page purchase history:
+--   Orders WHERE user_id = :uid ORDER BY order_date DESC
+CREATE INDEX IF NOT EXISTS orders_user_date_idx
+    ON Orders (user_id, order_date DESC);
+
+-- get_seller_reviews, seller_profile review lookups:
+--   SellerReviews WHERE seller_id = :sid [AND user_id = :uid] ORDER BY date_reviewed DESC
+CREATE INDEX IF NOT EXISTS sellerreviews_seller_date_idx
+    ON SellerReviews (seller_id, date_reviewed DESC);
+
+-- /my_reviews, /api/feedback, /reviews?user_id=:
+--   Reviews WHERE user_id = :uid ORDER BY date_reviewed DESC
+CREATE INDEX IF NOT EXISTS reviews_user_date_idx
+    ON Reviews (user_id, date_reviewed DESC);
+
+-- get_seller_statistics, User.is_seller:
+--   Products WHERE creator_id = :sid
+CREATE INDEX IF NOT EXISTS products_creator_idx
+    ON Products (creator_id);
+
+ANALYZE Inventory, OrderItems, Orders, SellerReviews, Reviews, Products;
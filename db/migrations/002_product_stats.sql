@@ -0,0 +1,194 @@
+-- Per-product aggregates that product listings sort and filter on, kept
+-- current by statement-level triggers so browsing never has to aggregate
+-- Inventory, OrderItems or Reviews per row.
+--
+-- min_price is the price a listing shows: the lowest in-stock seller
+-- price, falling back to the product's list price.
+
+CREATE TABLE ProductStats (
+    product_id INT NOT NULL PRIMARY KEY REFERENCES Products(id) ON DELETE CASCADE,
+    min_price DECIMAL(12,2) NOT NULL,
+    total_sold INT NOT NULL DEFAULT 0,
+    rating_sum INT NOT NULL DEFAULT 0,
+    review_count INT NOT NULL DEFAULT 0,
+    avg_rating NUMERIC GENERATED ALWAYS AS (
+        CASE WHEN review_count > 0 THEN rating_sum::numeric / review_count END
+    ) STORED,
+    seller_count INT NOT NULL DEFAULT 0
+);
+
+CREATE INDEX productstats_min_price_idx ON ProductStats (min_price);
+CREATE INDEX productstats_total_sold_idx ON ProductStats (total_sold);
+CREATE INDEX productstats_avg_rating_idx ON ProductStats (avg_rating);
+
+INSERT INTO ProductStats (product_id, min_price, total_sold, rating_sum, review_count, seller_count)
+SELECT p.id,
+       COALESCE(inv.min_price, p.price),
+       COALESCE(sold.total_sold, 0),
+       COALESCE(rev.rating_sum, 0),
+       COALESCE(rev.review_count, 0),
+       COALESCE(inv.seller_count, 0)
+FROM Products p
+LEFT JOIN (
+    SELECT product_id, MIN(seller_price) AS min_price, COUNT(*) AS seller_count
+    FROM Inventory
+    WHERE quantity > 0
+    GROUP BY product_id
+) inv ON inv.product_id = p.id
+LEFT JOIN (
+    SELECT product_id, SUM(quantity) AS total_sold
+    FROM OrderItems
+    GROUP BY product_id
+) sold ON sold.product_id = p.id
+LEFT JOIN (
+    SELECT product_id, SUM(rating) AS rating_sum, COUNT(*) AS review_count
+    FROM Reviews
+    GROUP BY product_id
+) rev ON rev.product_id = p.id;
+
+
+-- Recompute the stock-dependent columns for the given products.
+CREATE FUNCTION refresh_product_stock_stats(pids INT[]) RETURNS void AS $$
+    UPDATE ProductStats ps
+    SET min_price = s.min_price,
+        seller_count = s.seller_count
+    FROM (
+        SELECT p.id,
+               COALESCE(MIN(i.seller_price), p.price) AS min_price,
+               COUNT(i.seller_id) AS seller_count
+        FROM Products p
+        LEFT JOIN Inventory i ON i.product_id = p.id AND i.quantity > 0
+        WHERE p.id = ANY(pids)
+        GROUP BY p.id, p.price
+    ) s
+    WHERE ps.product_id = s.id
+      AND (ps.min_price, ps.seller_count) IS DISTINCT FROM (s.min_price, s.seller_count);
+$$ LANGUAGE sql;
+
+
+-- Products: new rows get a stats row, list-price changes move min_price.
+CREATE FUNCTION product_stats_products_sync() RETURNS trigger AS $$
+BEGIN
+    IF TG_OP = 'INSERT' THEN
+        INSERT INTO ProductStats (product_id, min_price)
+        SELECT id, price FROM new_rows;
+    ELSE
+        PERFORM refresh_product_stock_stats(ARRAY(
+            SELECT n.id
+            FROM new_rows n
+            JOIN old_rows o ON o.id = n.id
+            WHERE n.price IS DISTINCT FROM o.price
+        ));
+    END IF;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE TRIGGER product_stats_products_insert
+    AFTER INSERT ON Products
+    REFERENCING NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION product_stats_products_sync();
+CREATE TRIGGER product_stats_products_update
+    AFTER UPDATE ON Products
+    REFERENCING NEW TABLE AS new_rows OLD TABLE AS old_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION product_stats_products_sync();
+
+
+-- Inventory: any stock or price change can move min_price / seller_count.
+CREATE FUNCTION product_stats_inventory_sync() RETURNS trigger AS $$
+BEGIN
+    IF TG_OP = 'INSERT' THEN
+        PERFORM refresh_product_stock_stats(ARRAY(SELECT DISTINCT product_id FROM new_rows));
+    ELSIF TG_OP = 'UPDATE' THEN
+        PERFORM refresh_product_stock_stats(ARRAY(
+            SELECT product_id FROM new_rows
+            UNION
+            SELECT product_id FROM old_rows
+        ));
+    ELSE
+        PERFORM refresh_product_stock_stats(ARRAY(SELECT DISTINCT product_id FROM old_rows));
+    END IF;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE TRIGGER product_stats_inventory_insert
+    AFTER INSERT ON Inventory
+    REFERENCING NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION product_stats_inventory_sync();
+CREATE TRIGGER product_stats_inventory_update
+    AFTER UPDATE ON Inventory
+    REFERENCING NEW TABLE AS new_rows OLD TABLE AS old_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION product_stats_inventory_sync();
+CREATE TRIGGER product_stats_inventory_delete
+    AFTER DELETE ON Inventory
+    REFERENCING OLD TABLE AS old_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION product_stats_inventory_sync();
+
+
+-- OrderItems: add sold quantities, subtract them if lines are removed.
+CREATE FUNCTION product_stats_orderitems_sync() RETURNS trigger AS $$
+BEGIN
+    IF TG_OP IN ('INSERT', 'UPDATE') THEN
+        UPDATE ProductStats ps
+        SET total_sold = ps.total_sold + d.quantity
+        FROM (SELECT product_id, SUM(quantity) AS quantity
+              FROM new_rows GROUP BY product_id) d
+        WHERE ps.product_id = d.product_id;
+    END IF;
+    IF TG_OP IN ('UPDATE', 'DELETE') THEN
+        UPDATE ProductStats ps
+        SET total_sold = ps.total_sold - d.quantity
+        FROM (SELECT product_id, SUM(quantity) AS quantity
+              FROM old_rows GROUP BY product_id) d
+        WHERE ps.product_id = d.product_id;
+    END IF;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE TRIGGER product_stats_orderitems_insert
+    AFTER INSERT ON OrderItems
+    REFERENCING NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION product_stats_orderitems_sync();
+CREATE TRIGGER product_stats_orderitems_delete
+    AFTER DELETE ON OrderItems
+    REFERENCING OLD TABLE AS old_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION product_stats_orderitems_sync();
+
+
+-- Reviews: running rating sum and count; avg_rating follows.
+CREATE FUNCTION product_stats_reviews_sync() RETURNS trigger AS $$
+BEGIN
+    IF TG_OP IN ('INSERT', 'UPDATE') THEN
+        UPDATE ProductStats ps
+        SET rating_sum = ps.rating_sum + d.rating_sum,
+            review_count = ps.review_count + d.review_count
+        FROM (SELECT product_id, SUM(rating) AS rating_sum, COUNT(*) AS review_count
+              FROM new_rows GROUP BY product_id) d
+        WHERE ps.product_id = d.product_id;
+    END IF;
+    IF TG_OP IN ('UPDATE', 'DELETE') THEN
+        UPDATE ProductStats ps
+        SET rating_sum = ps.rating_sum - d.rating_sum,
+            review_count = ps.review_count - d.review_count
+        FROM (SELECT product_id, SUM(rating) AS rating_sum, COUNT(*) AS review_count
+              FROM old_rows GROUP BY product_id) d
+        WHERE ps.product_id = d.product_id;
+    END IF;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE TRIGGER product_stats_reviews_insert
+    AFTER INSERT ON Reviews
+    REFERENCING NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION product_stats_reviews_sync();
+CREATE TRIGGER product_stats_reviews_update
+    AFTER UPDATE ON Reviews
+    REFERENCING NEW TABLE AS new_rows OLD TABLE AS old_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION product_stats_reviews_sync();
+CREATE TRIGGER product_stats_reviews_delete
+    AFTER DELETE ON Reviews
+    REFERENCING OLD TABLE AS old_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION product_stats_reviews_sync();
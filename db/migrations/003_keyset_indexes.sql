@@ -0,0 +1,29 @@
+-- Keyset ("seek") pagination for Product.get_page.  Every browser sort
+-- orders by (sort key, product id) and a cursor page starts with
+--   WHERE (sort key, id) > (:key, :id)
+-- so each sort needs a btree on exactly that pair; the page is then an
+-- index range scan of per_page rows no matter how deep it is.  These
+-- replace the single-column sort indexes from 002.
+
+DROP INDEX IF EXISTS productstats_min_price_idx;
+DROP INDEX IF EXISTS productstats_total_sold_idx;
+DROP INDEX IF EXISTS productstats_avg_rating_idx;
+
+-- sort=price
+CREATE INDEX IF NOT EXISTS productstats_min_price_id_idx
+    ON ProductStats (min_price, product_id);
+
+-- sort=sales
+CREATE INDEX IF NOT EXISTS productstats_total_sold_id_idx
+    ON ProductStats (total_sold, product_id);
+
+-- sort=rating (unrated products sort as 0)
+CREATE INDEX IF NOT EXISTS productstats_rating_id_idx
+    ON ProductStats ((COALESCE(avg_rating, 0)), product_id);
+
+-- sort=name (sort=id uses the primary key)
+CREATE INDEX IF NOT EXISTS products_lower_name_id_idx
+    ON Products (lower(name), id);
+
+ANALYZE ProductStats;
+ANALYZE Products;
@@ -0,0 +1,24 @@
+-- Full-text product search.  "name ILIKE '%q%'" can't use a btree index,
+-- so every search scanned all of Products.  Instead keep a weighted
+-- tsvector of name (A) + description (B) next to each row and index it
+-- with GIN; Product.get_page and Product.search match it with
+--   search_vector @@ to_tsquery('english', 'word:* & word:*')
+-- (every word a prefix, for type-ahead) and rank with ts_rank.
+
+ALTER TABLE Products
+    ADD COLUMN IF NOT EXISTS search_vector tsvector
+    GENERATED ALWAYS AS (
+        setweight(to_tsvector('english', COALESCE(name, '')), 'A') ||
+        setweight(to_tsvector('english', COALESCE(description, '')), 'B')
+    ) STORED;
+
+CREATE INDEX IF NOT EXISTS products_search_idx
+    ON Products USING GIN (search_vector);
+
+-- Keep statistics on ~10x more lexemes than the default.  Without them the
+-- planner guesses a rare word matches ~2% of the catalog, and for
+-- Product.search's "LIMIT pool" it then prefers a sequential scan that
+-- reads the whole table to find a few hundred rows.
+ALTER TABLE Products ALTER COLUMN search_vector SET STATISTICS 1000;
+
+ANALYZE Products;
@@ -0,0 +1,15 @@
+-- Keyset pagination of a product's reviews (Review.get_for_product,
+-- /api/products/<pid>/reviews).  Each page is
+--   Reviews WHERE product_id = :pid AND (<sort key>, review_id) < (:key, :id)
+--   ORDER BY <sort key> DESC, review_id DESC LIMIT :n
+-- so each sort needs an index led by product_id and ending in review_id.
+
+-- sort=newest
+CREATE INDEX IF NOT EXISTS reviews_product_date_idx
+    ON Reviews (product_id, date_reviewed DESC, review_id DESC);
+
+-- sort=highest (read forwards) and sort=lowest (read backwards)
+CREATE INDEX IF NOT EXISTS reviews_product_rating_date_idx
+    ON Reviews (product_id, rating DESC, date_reviewed DESC, review_id DESC);
+
+ANALYZE Reviews;
@@ -0,0 +1,301 @@
+-- Per-seller aggregates shown on /sellers/<id> and /user/<id>, kept
+-- current by statement-level triggers (the same scheme as ProductStats in
+-- 002) so a profile view is a single-row lookup instead of aggregating
+-- OrderItems, Reviews and SellerReviews per request.
+--
+-- Sales are counted per OrderItems.seller_id (the seller who shipped the
+-- line); items_sold, revenue and order_count only count fulfilled lines,
+-- fulfillment_rate is fulfilled lines over all lines.  The product rating
+-- is over reviews of the products the seller created.
+
+CREATE TABLE SellerStats (
+    seller_id INT NOT NULL PRIMARY KEY REFERENCES Users(id) ON DELETE CASCADE,
+    product_count INT NOT NULL DEFAULT 0,
+    line_count INT NOT NULL DEFAULT 0,
+    fulfilled_line_count INT NOT NULL DEFAULT 0,
+    order_count INT NOT NULL DEFAULT 0,
+    items_sold INT NOT NULL DEFAULT 0,
+    revenue DECIMAL(14,2) NOT NULL DEFAULT 0,
+    fulfillment_rate NUMERIC GENERATED ALWAYS AS (
+        CASE WHEN line_count > 0 THEN 100.0 * fulfilled_line_count / line_count ELSE 0 END
+    ) STORED,
+    product_rating_sum INT NOT NULL DEFAULT 0,
+    product_review_count INT NOT NULL DEFAULT 0,
+    product_avg_rating NUMERIC GENERATED ALWAYS AS (
+        CASE WHEN product_review_count > 0 THEN product_rating_sum::numeric / product_review_count END
+    ) STORED,
+    seller_rating_sum INT NOT NULL DEFAULT 0,
+    seller_review_count INT NOT NULL DEFAULT 0,
+    seller_avg_rating NUMERIC GENERATED ALWAYS AS (
+        CASE WHEN seller_review_count > 0 THEN seller_rating_sum::numeric / seller_review_count END
+    ) STORED
+);
+
+INSERT INTO SellerStats (seller_id, product_count, line_count, fulfilled_line_count,
+                         order_count, items_sold, revenue,
+                         product_rating_sum, product_review_count,
+                         seller_rating_sum, seller_review_count)
+SELECT u.id,
+       COALESCE(prod.product_count, 0),
+       COALESCE(sales.line_count, 0),
+       COALESCE(sales.fulfilled_line_count, 0),
+       COALESCE(sales.order_count, 0),
+       COALESCE(sales.items_sold, 0),
+       COALESCE(sales.revenue, 0),
+       COALESCE(prev.rating_sum, 0),
+       COALESCE(prev.review_count, 0),
+       COALESCE(srev.rating_sum, 0),
+       COALESCE(srev.review_count, 0)
+FROM Users u
+LEFT JOIN (
+    SELECT creator_id, COUNT(*) AS product_count
+    FROM Products
+    GROUP BY creator_id
+) prod ON prod.creator_id = u.id
+LEFT JOIN (
+    SELECT seller_id,
+           COUNT(*) AS line_count,
+           COUNT(*) FILTER (WHERE fulfillment_status = 'fulfilled') AS fulfilled_line_count,
+           COUNT(DISTINCT order_id) FILTER (WHERE fulfillment_status = 'fulfilled') AS order_count,
+           SUM(quantity) FILTER (WHERE fulfillment_status = 'fulfilled') AS items_sold,
+           SUM(quantity * price) FILTER (WHERE fulfillment_status = 'fulfilled') AS revenue
+    FROM OrderItems
+    GROUP BY seller_id
+) sales ON sales.seller_id = u.id
+LEFT JOIN (
+    SELECT p.creator_id, SUM(r.rating) AS rating_sum, COUNT(*) AS review_count
+    FROM Reviews r
+    JOIN Products p ON p.id = r.product_id
+    GROUP BY p.creator_id
+) prev ON prev.creator_id = u.id
+LEFT JOIN (
+    SELECT seller_id, SUM(rating) AS rating_sum, COUNT(rating) AS review_count
+    FROM SellerReviews
+    GROUP BY seller_id
+) srev ON srev.seller_id = u.id;
+
+
+-- Products: count listings per creator.
+CREATE FUNCTION seller_stats_products_sync() RETURNS trigger AS $$
+BEGIN
+    IF TG_OP = 'INSERT' THEN
+        INSERT INTO SellerStats AS s (seller_id, product_count)
+        SELECT creator_id, COUNT(*) FROM new_rows GROUP BY creator_id
+        ON CONFLICT (seller_id) DO UPDATE
+        SET product_count = s.product_count + EXCLUDED.product_count;
+    ELSIF TG_OP = 'UPDATE' THEN
+        INSERT INTO SellerStats AS s (seller_id, product_count)
+        SELECT creator_id, SUM(delta)
+        FROM (
+            SELECT n.creator_id, 1 AS delta
+            FROM new_rows n JOIN old_rows o ON o.id = n.id
+            WHERE n.creator_id IS DISTINCT FROM o.creator_id
+            UNION ALL
+            SELECT o.creator_id, -1
+            FROM new_rows n JOIN old_rows o ON o.id = n.id
+            WHERE n.creator_id IS DISTINCT FROM o.creator_id
+        ) d
+        GROUP BY creator_id
+        ON CONFLICT (seller_id) DO UPDATE
+        SET product_count = s.product_count + EXCLUDED.product_count;
+    ELSE
+        UPDATE SellerStats s
+        SET product_count = s.product_count - d.product_count
+        FROM (SELECT creator_id, COUNT(*) AS product_count
+              FROM old_rows GROUP BY creator_id) d
+        WHERE s.seller_id = d.creator_id;
+    END IF;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE TRIGGER seller_stats_products_insert
+    AFTER INSERT ON Products
+    REFERENCING NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION seller_stats_products_sync();
+CREATE TRIGGER seller_stats_products_update
+    AFTER UPDATE ON Products
+    REFERENCING NEW TABLE AS new_rows OLD TABLE AS old_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION seller_stats_products_sync();
+CREATE TRIGGER seller_stats_products_delete
+    AFTER DELETE ON Products
+    REFERENCING OLD TABLE AS old_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION seller_stats_products_sync();
+
+
+-- OrderItems: checkout inserts pending lines, fulfill_item flips them to
+-- fulfilled.  Line totals move by (new version - old version) of each
+-- row; an (order, seller) pair counts towards order_count while it has at
+-- least one fulfilled line.
+CREATE FUNCTION seller_stats_orderitems_sync() RETURNS trigger AS $$
+BEGIN
+    IF TG_OP = 'INSERT' THEN
+        INSERT INTO SellerStats AS s (seller_id, line_count, fulfilled_line_count, items_sold, revenue)
+        SELECT seller_id,
+               COUNT(*),
+               COUNT(*) FILTER (WHERE fulfillment_status = 'fulfilled'),
+               COALESCE(SUM(quantity) FILTER (WHERE fulfillment_status = 'fulfilled'), 0),
+               COALESCE(SUM(quantity * price) FILTER (WHERE fulfillment_status = 'fulfilled'), 0)
+        FROM new_rows
+        GROUP BY seller_id
+        ON CONFLICT (seller_id) DO UPDATE
+        SET line_count = s.line_count + EXCLUDED.line_count,
+            fulfilled_line_count = s.fulfilled_line_count + EXCLUDED.fulfilled_line_count,
+            items_sold = s.items_sold + EXCLUDED.items_sold,
+            revenue = s.revenue + EXCLUDED.revenue;
+
+        -- lines are inserted pending, so this is normally a no-op
+        INSERT INTO SellerStats AS s (seller_id, order_count)
+        SELECT p.seller_id, COUNT(*)
+        FROM (SELECT DISTINCT order_id, seller_id FROM new_rows
+              WHERE fulfillment_status = 'fulfilled') p
+        WHERE NOT EXISTS (
+            SELECT 1 FROM OrderItems oi
+            WHERE oi.order_id = p.order_id AND oi.seller_id = p.seller_id
+              AND oi.fulfillment_status = 'fulfilled'
+              AND oi.id NOT IN (SELECT id FROM new_rows))
+        GROUP BY p.seller_id
+        ON CONFLICT (seller_id) DO UPDATE
+        SET order_count = s.order_count + EXCLUDED.order_count;
+    ELSE
+        INSERT INTO SellerStats AS s (seller_id, line_count, fulfilled_line_count, items_sold, revenue)
+        SELECT seller_id,
+               SUM(sign),
+               COALESCE(SUM(sign) FILTER (WHERE fulfilled), 0),
+               COALESCE(SUM(sign * quantity) FILTER (WHERE fulfilled), 0),
+               COALESCE(SUM(sign * quantity * price) FILTER (WHERE fulfilled), 0)
+        FROM (
+            SELECT 1 AS sign, seller_id, quantity, price,
+                   fulfillment_status = 'fulfilled' AS fulfilled
+            FROM new_rows
+            UNION ALL
+            SELECT -1, seller_id, quantity, price, fulfillment_status = 'fulfilled'
+            FROM old_rows
+        ) d
+        GROUP BY seller_id
+        ON CONFLICT (seller_id) DO UPDATE
+        SET line_count = s.line_count + EXCLUDED.line_count,
+            fulfilled_line_count = s.fulfilled_line_count + EXCLUDED.fulfilled_line_count,
+            items_sold = s.items_sold + EXCLUDED.items_sold,
+            revenue = s.revenue + EXCLUDED.revenue;
+
+        INSERT INTO SellerStats AS s (seller_id, order_count)
+        SELECT seller_id, SUM(now_fulfilled::int - was_fulfilled::int)
+        FROM (
+            SELECT p.seller_id,
+                   EXISTS (
+                       SELECT 1 FROM OrderItems oi
+                       WHERE oi.order_id = p.order_id AND oi.seller_id = p.seller_id
+                         AND oi.fulfillment_status = 'fulfilled'
+                   ) AS now_fulfilled,
+                   EXISTS (
+                       SELECT 1 FROM OrderItems oi
+                       WHERE oi.order_id = p.order_id AND oi.seller_id = p.seller_id
+                         AND oi.fulfillment_status = 'fulfilled'
+                         AND oi.id NOT IN (SELECT id FROM new_rows)
+                   ) OR EXISTS (
+                       SELECT 1 FROM old_rows o
+                       WHERE o.order_id = p.order_id AND o.seller_id = p.seller_id
+                         AND o.fulfillment_status = 'fulfilled'
+                   ) AS was_fulfilled
+            FROM (SELECT order_id, seller_id FROM new_rows
+                  UNION
+                  SELECT order_id, seller_id FROM old_rows) p
+        ) t
+        WHERE now_fulfilled <> was_fulfilled
+        GROUP BY seller_id
+        ON CONFLICT (seller_id) DO UPDATE
+        SET order_count = s.order_count + EXCLUDED.order_count;
+    END IF;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE TRIGGER seller_stats_orderitems_insert
+    AFTER INSERT ON OrderItems
+    REFERENCING NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION seller_stats_orderitems_sync();
+CREATE TRIGGER seller_stats_orderitems_update
+    AFTER UPDATE ON OrderItems
+    REFERENCING NEW TABLE AS new_rows OLD TABLE AS old_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION seller_stats_orderitems_sync();
+
+
+-- Reviews: running rating sum and count per product creator.
+CREATE FUNCTION seller_stats_reviews_sync() RETURNS trigger AS $$
+BEGIN
+    IF TG_OP IN ('INSERT', 'UPDATE') THEN
+        INSERT INTO SellerStats AS s (seller_id, product_rating_sum, product_review_count)
+        SELECT p.creator_id, SUM(n.rating), COUNT(*)
+        FROM new_rows n
+        JOIN Products p ON p.id = n.product_id
+        GROUP BY p.creator_id
+        ON CONFLICT (seller_id) DO UPDATE
+        SET product_rating_sum = s.product_rating_sum + EXCLUDED.product_rating_sum,
+            product_review_count = s.product_review_count + EXCLUDED.product_review_count;
+    END IF;
+    IF TG_OP IN ('UPDATE', 'DELETE') THEN
+        UPDATE SellerStats s
+        SET product_rating_sum = s.product_rating_sum - d.rating_sum,
+            product_review_count = s.product_review_count - d.review_count
+        FROM (SELECT p.creator_id, SUM(o.rating) AS rating_sum, COUNT(*) AS review_count
+              FROM old_rows o
+              JOIN Products p ON p.id = o.product_id
+              GROUP BY p.creator_id) d
+        WHERE s.seller_id = d.creator_id;
+    END IF;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE TRIGGER seller_stats_reviews_insert
+    AFTER INSERT ON Reviews
+    REFERENCING NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION seller_stats_reviews_sync();
+CREATE TRIGGER seller_stats_reviews_update
+    AFTER UPDATE ON Reviews
+    REFERENCING NEW TABLE AS new_rows OLD TABLE AS old_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION seller_stats_reviews_sync();
+CREATE TRIGGER seller_stats_reviews_delete
+    AFTER DELETE ON Reviews
+    REFERENCING OLD TABLE AS old_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION seller_stats_reviews_sync();
+
+
+-- SellerReviews: running rating sum and count per seller.
+CREATE FUNCTION seller_stats_sellerreviews_sync() RETURNS trigger AS $$
+BEGIN
+    IF TG_OP IN ('INSERT', 'UPDATE') THEN
+        INSERT INTO SellerStats AS s (seller_id, seller_rating_sum, seller_review_count)
+        SELECT seller_id, COALESCE(SUM(rating), 0), COUNT(rating)
+        FROM new_rows
+        WHERE seller_id IS NOT NULL
+        GROUP BY seller_id
+        ON CONFLICT (seller_id) DO UPDATE
+        SET seller_rating_sum = s.seller_rating_sum + EXCLUDED.seller_rating_sum,
+            seller_review_count = s.seller_review_count + EXCLUDED.seller_review_count;
+    END IF;
+    IF TG_OP IN ('UPDATE', 'DELETE') THEN
+        UPDATE SellerStats s
+        SET seller_rating_sum = s.seller_rating_sum - d.rating_sum,
+            seller_review_count = s.seller_review_count - d.review_count
+        FROM (SELECT seller_id, COALESCE(SUM(rating), 0) AS rating_sum, COUNT(rating) AS review_count
+              FROM old_rows GROUP BY seller_id) d
+        WHERE s.seller_id = d.seller_id;
+    END IF;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE TRIGGER seller_stats_sellerreviews_insert
+    AFTER INSERT ON SellerReviews
+    REFERENCING NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION seller_stats_sellerreviews_sync();
+CREATE TRIGGER seller_stats_sellerreviews_update
+    AFTER UPDATE ON SellerReviews
+    REFERENCING NEW TABLE AS new_rows OLD TABLE AS old_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION seller_stats_sellerreviews_sync();
+CREATE TRIGGER seller_stats_sellerreviews_delete
+    AFTER DELETE ON SellerReviews
+    REFERENCING OLD TABLE AS old_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION seller_stats_sellerreviews_sync();
@@ -0,0 +1,124 @@
+-- Daily per-seller, per-product sales that /api/seller_analytics reads
+-- instead of aggregating a seller's whole OrderItems history.  A range of
+-- N days touches at most N * (products sold per day) rows however long
+-- the history is.  Kept current by statement-level triggers on OrderItems
+-- (checkout inserts, fulfill_item updates); backfill_seller_daily_sales
+-- rebuilds any range (flask sellers backfill-daily-sales).
+--
+-- day is the UTC date of Orders.order_date.  orders counts distinct
+-- orders per (seller, day, product); lines / fulfilled_* drive the
+-- fulfillment breakdown.
+
+CREATE TABLE SellerDailySales (
+    seller_id INT NOT NULL REFERENCES Users(id) ON DELETE CASCADE,
+    day DATE NOT NULL,
+    product_id INT NOT NULL REFERENCES Products(id) ON DELETE CASCADE,
+    orders INT NOT NULL DEFAULT 0,
+    items INT NOT NULL DEFAULT 0,
+    revenue DECIMAL(14,2) NOT NULL DEFAULT 0,
+    lines INT NOT NULL DEFAULT 0,
+    fulfilled_lines INT NOT NULL DEFAULT 0,
+    fulfilled_revenue DECIMAL(14,2) NOT NULL DEFAULT 0,
+    PRIMARY KEY (seller_id, day, product_id)
+);
+
+
+-- Recompute every row for days in [from_day, to_day]; NULL leaves that
+-- end of the range open.
+CREATE FUNCTION backfill_seller_daily_sales(from_day DATE, to_day DATE) RETURNS INT AS $$
+    DELETE FROM SellerDailySales
+    WHERE (from_day IS NULL OR day >= from_day)
+      AND (to_day IS NULL OR day <= to_day);
+
+    WITH filled AS (
+        INSERT INTO SellerDailySales (seller_id, day, product_id, orders, items, revenue,
+                                      lines, fulfilled_lines, fulfilled_revenue)
+        SELECT oi.seller_id, o.order_date::date, oi.product_id,
+               COUNT(DISTINCT oi.order_id),
+               SUM(oi.quantity),
+               SUM(oi.quantity * oi.price),
+               COUNT(*),
+               COUNT(*) FILTER (WHERE oi.fulfillment_status = 'fulfilled'),
+               COALESCE(SUM(oi.quantity * oi.price) FILTER (WHERE oi.fulfillment_status = 'fulfilled'), 0)
+        FROM OrderItems oi
+        JOIN Orders o ON o.id = oi.order_id
+        WHERE (from_day IS NULL OR o.order_date >= from_day)
+          AND (to_day IS NULL OR o.order_date < to_day + 1)
+        GROUP BY oi.seller_id, o.order_date::date, oi.product_id
+        RETURNING 1
+    )
+    SELECT COUNT(*)::int FROM filled;
+$$ LANGUAGE sql;
+
+SELECT backfill_seller_daily_sales(NULL, NULL);
+
+
+-- OrderItems: add the new version of each row, subtract the old one.
+CREATE FUNCTION seller_daily_sales_orderitems_sync() RETURNS trigger AS $$
+BEGIN
+    IF TG_OP = 'INSERT' THEN
+        INSERT INTO SellerDailySales AS s (seller_id, day, product_id, orders, items, revenue,
+                                           lines, fulfilled_lines, fulfilled_revenue)
+        SELECT n.seller_id, o.order_date::date, n.product_id,
+               COUNT(DISTINCT n.order_id),
+               SUM(n.quantity),
+               SUM(n.quantity * n.price),
+               COUNT(*),
+               COUNT(*) FILTER (WHERE n.fulfillment_status = 'fulfilled'),
+               COALESCE(SUM(n.quantity * n.price) FILTER (WHERE n.fulfillment_status = 'fulfilled'), 0)
+        FROM new_rows n
+        JOIN Orders o ON o.id = n.order_id
+        GROUP BY n.seller_id, o.order_date::date, n.product_id
+        ON CONFLICT (seller_id, day, product_id) DO UPDATE
+        SET orders = s.orders + EXCLUDED.orders,
+            items = s.items + EXCLUDED.items,
+            revenue = s.revenue + EXCLUDED.revenue,
+            lines = s.lines + EXCLUDED.lines,
+            fulfilled_lines = s.fulfilled_lines + EXCLUDED.fulfilled_lines,
+            fulfilled_revenue = s.fulfilled_revenue + EXCLUDED.fulfilled_revenue;
+    ELSE
+        -- an order is in both versions of its rows, so orders only moves
+        -- if a line changes seller or product
+        INSERT INTO SellerDailySales AS s (seller_id, day, product_id, orders, items, revenue,
+                                           lines, fulfilled_lines, fulfilled_revenue)
+        SELECT d.seller_id, o.order_date::date, d.product_id,
+               COUNT(DISTINCT d.order_id) FILTER (WHERE d.sign = 1)
+                   - COUNT(DISTINCT d.order_id) FILTER (WHERE d.sign = -1),
+               SUM(d.sign * d.quantity),
+               SUM(d.sign * d.quantity * d.price),
+               SUM(d.sign),
+               COALESCE(SUM(d.sign) FILTER (WHERE d.fulfilled), 0),
+               COALESCE(SUM(d.sign * d.quantity * d.price) FILTER (WHERE d.fulfilled), 0)
+        FROM (
+            SELECT 1 AS sign, seller_id, product_id, order_id, quantity, price,
+                   fulfillment_status = 'fulfilled' AS fulfilled
+            FROM new_rows
+            UNION ALL
+            SELECT -1, seller_id, product_id, order_id, quantity, price,
+                   fulfillment_status = 'fulfilled'
+            FROM old_rows
+        ) d
+        JOIN Orders o ON o.id = d.order_id
+        GROUP BY d.seller_id, o.order_date::date, d.product_id
+        ON CONFLICT (seller_id, day, product_id) DO UPDATE
+        SET orders = s.orders + EXCLUDED.orders,
+            items = s.items + EXCLUDED.items,
+            revenue = s.revenue + EXCLUDED.revenue,
+            lines = s.lines + EXCLUDED.lines,
+            fulfilled_lines = s.fulfilled_lines + EXCLUDED.fulfilled_lines,
+            fulfilled_revenue = s.fulfilled_revenue + EXCLUDED.fulfilled_revenue;
+    END IF;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE TRIGGER seller_daily_sales_orderitems_insert
+    AFTER INSERT ON OrderItems
+    REFERENCING NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION seller_daily_sales_orderitems_sync();
+CREATE TRIGGER seller_daily_sales_orderitems_update
+    AFTER UPDATE ON OrderItems
+    REFERENCING NEW TABLE AS new_rows OLD TABLE AS old_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION seller_daily_sales_orderitems_sync();
+
+ANALYZE SellerDailySales;
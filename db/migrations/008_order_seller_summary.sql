@@ -0,0 +1,103 @@
+-- One row per (order, seller) with that seller's share of the order and
+-- its fulfillment status, so /api/seller_orders pages through a seller's
+-- orders with an index scan instead of grouping their whole OrderItems
+-- history.  Kept current by statement-level triggers on OrderItems
+-- (checkout inserts, fulfill_item updates).
+--
+-- order_date is copied from Orders so the listing order and keyset
+-- (order_date DESC, order_id DESC) are covered by the indexes below.
+
+CREATE TABLE OrderSellerSummary (
+    order_id INT NOT NULL REFERENCES Orders(id) ON DELETE CASCADE,
+    seller_id INT NOT NULL REFERENCES Users(id) ON DELETE CASCADE,
+    order_date TIMESTAMP WITHOUT TIME ZONE NOT NULL,
+    item_count INT NOT NULL DEFAULT 0,
+    fulfilled_count INT NOT NULL DEFAULT 0,
+    amount DECIMAL(12,2) NOT NULL DEFAULT 0,
+    status VARCHAR(10) GENERATED ALWAYS AS (
+        CASE
+            WHEN fulfilled_count >= item_count THEN 'fulfilled'
+            WHEN fulfilled_count = 0 THEN 'pending'
+            ELSE 'partial'
+        END
+    ) STORED,
+    PRIMARY KEY (order_id, seller_id)
+);
+
+INSERT INTO OrderSellerSummary (order_id, seller_id, order_date, item_count, fulfilled_count, amount)
+SELECT oi.order_id, oi.seller_id, o.order_date,
+       COUNT(*),
+       COUNT(*) FILTER (WHERE oi.fulfillment_status = 'fulfilled'),
+       SUM(oi.quantity * oi.price)
+FROM OrderItems oi
+JOIN Orders o ON o.id = oi.order_id
+GROUP BY oi.order_id, oi.seller_id, o.order_date;
+
+-- status=all
+CREATE INDEX ordersellersummary_seller_date_idx
+    ON OrderSellerSummary (seller_id, order_date DESC, order_id DESC);
+-- status=pending|partial|fulfilled
+CREATE INDEX ordersellersummary_seller_status_date_idx
+    ON OrderSellerSummary (seller_id, status, order_date DESC, order_id DESC);
+
+ANALYZE OrderSellerSummary;
+
+
+-- OrderItems: add the new version of each row, subtract the old one.
+CREATE FUNCTION order_seller_summary_orderitems_sync() RETURNS trigger AS $$
+BEGIN
+    IF TG_OP = 'INSERT' THEN
+        INSERT INTO OrderSellerSummary AS s (order_id, seller_id, order_date,
+                                             item_count, fulfilled_count, amount)
+        SELECT n.order_id, n.seller_id, o.order_date,
+               COUNT(*),
+               COUNT(*) FILTER (WHERE n.fulfillment_status = 'fulfilled'),
+               SUM(n.quantity * n.price)
+        FROM new_rows n
+        JOIN Orders o ON o.id = n.order_id
+        GROUP BY n.order_id, n.seller_id, o.order_date
+        ON CONFLICT (order_id, seller_id) DO UPDATE
+        SET item_count = s.item_count + EXCLUDED.item_count,
+            fulfilled_count = s.fulfilled_count + EXCLUDED.fulfilled_count,
+            amount = s.amount + EXCLUDED.amount;
+    ELSE
+        INSERT INTO OrderSellerSummary AS s (order_id, seller_id, order_date,
+                                             item_count, fulfilled_count, amount)
+        SELECT d.order_id, d.seller_id, o.order_date,
+               SUM(d.sign),
+               COALESCE(SUM(d.sign) FILTER (WHERE d.fulfilled), 0),
+               SUM(d.sign * d.quantity * d.price)
+        FROM (
+            SELECT 1 AS sign, order_id, seller_id, quantity, price,
+                   fulfillment_status = 'fulfilled' AS fulfilled
+            FROM new_rows
+            UNION ALL
+            SELECT -1, order_id, seller_id, quantity, price,
+                   fulfillment_status = 'fulfilled'
+            FROM old_rows
+        ) d
+        JOIN Orders o ON o.id = d.order_id
+        GROUP BY d.order_id, d.seller_id, o.order_date
+        ON CONFLICT (order_id, seller_id) DO UPDATE
+        SET item_count = s.item_count + EXCLUDED.item_count,
+            fulfilled_count = s.fulfilled_count + EXCLUDED.fulfilled_count,
+            amount = s.amount + EXCLUDED.amount;
+
+        -- a line moved to another seller or order
+        DELETE FROM OrderSellerSummary s
+        USING old_rows o
+        WHERE s.order_id = o.order_id AND s.seller_id = o.seller_id
+          AND s.item_count = 0;
+    END IF;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE TRIGGER order_seller_summary_orderitems_insert
+    AFTER INSERT ON OrderItems
+    REFERENCING NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION order_seller_summary_orderitems_sync();
+CREATE TRIGGER order_seller_summary_orderitems_update
+    AFTER UPDATE ON OrderItems
+    REFERENCING NEW TABLE AS new_rows OLD TABLE AS old_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION order_seller_summary_orderitems_sync();
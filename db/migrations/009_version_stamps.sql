@@ -0,0 +1,66 @@
+-- Row version stamps for HTTP validators (ETag / Last-Modified, see
+-- app/conditional.py and app/models/version.py).
+--
+-- Every insert and update gives the row a fresh number from one shared
+-- sequence and the current time.  A page's validator is then the COUNT,
+-- SUM(version) and MAX(updated_at) of the rows it is built from: any
+-- insert, update or delete among them changes the count or the sum,
+-- whatever order the writers commit in.  updated_at only feeds
+-- Last-Modified.
+--
+-- Covers the tables the conditional read endpoints render; names of
+-- users and categories are not versioned.
+
+CREATE SEQUENCE row_version_seq;
+
+CREATE FUNCTION bump_row_version() RETURNS trigger AS $$
+BEGIN
+    NEW.version := nextval('row_version_seq');
+    NEW.updated_at := clock_timestamp() AT TIME ZONE 'UTC';
+    RETURN NEW;
+END;
+$$ LANGUAGE plpgsql;
+
+ALTER TABLE Products
+    ADD COLUMN version BIGINT NOT NULL DEFAULT nextval('row_version_seq'),
+    ADD COLUMN updated_at TIMESTAMP WITHOUT TIME ZONE NOT NULL
+        DEFAULT (clock_timestamp() AT TIME ZONE 'UTC');
+ALTER TABLE ProductStats
+    ADD COLUMN version BIGINT NOT NULL DEFAULT nextval('row_version_seq'),
+    ADD COLUMN updated_at TIMESTAMP WITHOUT TIME ZONE NOT NULL
+        DEFAULT (clock_timestamp() AT TIME ZONE 'UTC');
+ALTER TABLE Inventory
+    ADD COLUMN version BIGINT NOT NULL DEFAULT nextval('row_version_seq'),
+    ADD COLUMN updated_at TIMESTAMP WITHOUT TIME ZONE NOT NULL
+        DEFAULT (clock_timestamp() AT TIME ZONE 'UTC');
+ALTER TABLE CartItems
+    ADD COLUMN version BIGINT NOT NULL DEFAULT nextval('row_version_seq'),
+    ADD COLUMN updated_at TIMESTAMP WITHOUT TIME ZONE NOT NULL
+        DEFAULT (clock_timestamp() AT TIME ZONE 'UTC');
+ALTER TABLE Reviews
+    ADD COLUMN version BIGINT NOT NULL DEFAULT nextval('row_version_seq'),
+    ADD COLUMN updated_at TIMESTAMP WITHOUT TIME ZONE NOT NULL
+        DEFAULT (clock_timestamp() AT TIME ZONE 'UTC');
+ALTER TABLE SellerReviews
+    ADD COLUMN version BIGINT NOT NULL DEFAULT nextval('row_version_seq'),
+    ADD COLUMN updated_at TIMESTAMP WITHOUT TIME ZONE NOT NULL
+        DEFAULT (clock_timestamp() AT TIME ZONE 'UTC');
+
+CREATE TRIGGER products_row_version
+    BEFORE UPDATE ON Products
+    FOR EACH ROW EXECUTE FUNCTION bump_row_version();
+CREATE TRIGGER productstats_row_version
+    BEFORE UPDATE ON ProductStats
+    FOR EACH ROW EXECUTE FUNCTION bump_row_version();
+CREATE TRIGGER inventory_row_version
+    BEFORE UPDATE ON Inventory
+    FOR EACH ROW EXECUTE FUNCTION bump_row_version();
+CREATE TRIGGER cartitems_row_version
+    BEFORE UPDATE ON CartItems
+    FOR EACH ROW EXECUTE FUNCTION bump_row_version();
+CREATE TRIGGER reviews_row_version
+    BEFORE UPDATE ON Reviews
+    FOR EACH ROW EXECUTE FUNCTION bump_row_version();
+CREATE TRIGGER sellerreviews_row_version
+    BEFORE UPDATE ON SellerReviews
+    FOR EACH ROW EXECUTE FUNCTION bump_row_version();
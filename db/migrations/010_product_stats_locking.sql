@@ -0,0 +1,80 @@
+-- refresh_product_stock_stats recomputed MIN(price) / COUNT from the
+-- statement's snapshot.  Two READ COMMITTED transactions changing the same
+-- product's Inventory each saw only their own change, and the later commit
+-- could leave a stale min_price / seller_count behind.  Lock the stats rows
+-- first: a second writer waits for the first to commit, and the UPDATE
+-- that follows takes a new snapshot that includes the first writer's rows.
+--
+-- reconcile_product_stats() recomputes every row from Inventory,
+-- OrderItems and Reviews and fixes any that drifted
+-- (flask products_api reconcile-product-stats).
+
+CREATE OR REPLACE FUNCTION refresh_product_stock_stats(pids INT[]) RETURNS void AS $$
+    -- in id order, so writers touching several products can't deadlock
+    SELECT 1 FROM ProductStats
+    WHERE product_id = ANY(pids)
+    ORDER BY product_id
+    FOR UPDATE;
+
+    UPDATE ProductStats ps
+    SET min_price = s.min_price,
+        seller_count = s.seller_count
+    FROM (
+        SELECT p.id,
+               COALESCE(MIN(i.seller_price), p.price) AS min_price,
+               COUNT(i.seller_id) AS seller_count
+        FROM Products p
+        LEFT JOIN Inventory i ON i.product_id = p.id AND i.quantity > 0
+        WHERE p.id = ANY(pids)
+        GROUP BY p.id, p.price
+    ) s
+    WHERE ps.product_id = s.id
+      AND (ps.min_price, ps.seller_count) IS DISTINCT FROM (s.min_price, s.seller_count);
+$$ LANGUAGE sql;
+
+
+-- Recompute every product's stats; returns the number of rows corrected
+-- or added.
+CREATE FUNCTION reconcile_product_stats() RETURNS INT AS $$
+    WITH actual AS (
+        SELECT p.id AS product_id,
+               COALESCE(inv.min_price, p.price) AS min_price,
+               COALESCE(sold.total_sold, 0) AS total_sold,
+               COALESCE(rev.rating_sum, 0) AS rating_sum,
+               COALESCE(rev.review_count, 0) AS review_count,
+               COALESCE(inv.seller_count, 0) AS seller_count
+        FROM Products p
+        LEFT JOIN (
+            SELECT product_id, MIN(seller_price) AS min_price, COUNT(*) AS seller_count
+            FROM Inventory
+            WHERE quantity > 0
+            GROUP BY product_id
+        ) inv ON inv.product_id = p.id
+        LEFT JOIN (
+            SELECT product_id, SUM(quantity) AS total_sold
+            FROM OrderItems
+            GROUP BY product_id
+        ) sold ON sold.product_id = p.id
+        LEFT JOIN (
+            SELECT product_id, SUM(rating) AS rating_sum, COUNT(*) AS review_count
+            FROM Reviews
+            GROUP BY product_id
+        ) rev ON rev.product_id = p.id
+    ), fixed AS (
+        INSERT INTO ProductStats AS ps (product_id, min_price, total_sold, rating_sum,
+                                        review_count, seller_count)
+        SELECT * FROM actual
+        ON CONFLICT (product_id) DO UPDATE
+        SET min_price = EXCLUDED.min_price,
+            total_sold = EXCLUDED.total_sold,
+            rating_sum = EXCLUDED.rating_sum,
+            review_count = EXCLUDED.review_count,
+            seller_count = EXCLUDED.seller_count
+        WHERE (ps.min_price, ps.total_sold, ps.rating_sum, ps.review_count, ps.seller_count)
+              IS DISTINCT FROM
+              (EXCLUDED.min_price, EXCLUDED.total_sold, EXCLUDED.rating_sum,
+               EXCLUDED.review_count, EXCLUDED.seller_count)
+        RETURNING 1
+    )
+    SELECT COUNT(*)::int FROM fixed;
+$$ LANGUAGE sql;
@@ -0,0 +1,70 @@
+-- Products.creator_id is nullable, but the SellerStats sync functions in
+-- 006 fed it into SellerStats.seller_id (NOT NULL).  Inserting a product
+-- with no creator, clearing a creator, or reviewing such a product failed
+-- inside the trigger and aborted the user's write.  Products without a
+-- creator belong to no seller, so leave them out of the rollup.
+
+CREATE OR REPLACE FUNCTION seller_stats_products_sync() RETURNS trigger AS $$
+BEGIN
+    IF TG_OP = 'INSERT' THEN
+        INSERT INTO SellerStats AS s (seller_id, product_count)
+        SELECT creator_id, COUNT(*) FROM new_rows
+        WHERE creator_id IS NOT NULL
+        GROUP BY creator_id
+        ON CONFLICT (seller_id) DO UPDATE
+        SET product_count = s.product_count + EXCLUDED.product_count;
+    ELSIF TG_OP = 'UPDATE' THEN
+        INSERT INTO SellerStats AS s (seller_id, product_count)
+        SELECT creator_id, SUM(delta)
+        FROM (
+            SELECT n.creator_id, 1 AS delta
+            FROM new_rows n JOIN old_rows o ON o.id = n.id
+            WHERE n.creator_id IS DISTINCT FROM o.creator_id
+            UNION ALL
+            SELECT o.creator_id, -1
+            FROM new_rows n JOIN old_rows o ON o.id = n.id
+            WHERE n.creator_id IS DISTINCT FROM o.creator_id
+        ) d
+        WHERE creator_id IS NOT NULL
+        GROUP BY creator_id
+        ON CONFLICT (seller_id) DO UPDATE
+        SET product_count = s.product_count + EXCLUDED.product_count;
+    ELSE
+        UPDATE SellerStats s
+        SET product_count = s.product_count - d.product_count
+        FROM (SELECT creator_id, COUNT(*) AS product_count
+              FROM old_rows GROUP BY creator_id) d
+        WHERE s.seller_id = d.creator_id;
+    END IF;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+
+CREATE OR REPLACE FUNCTION seller_stats_reviews_sync() RETURNS trigger AS $$
+BEGIN
+    IF TG_OP IN ('INSERT', 'UPDATE') THEN
+        INSERT INTO SellerStats AS s (seller_id, product_rating_sum, product_review_count)
+        SELECT p.creator_id, SUM(n.rating), COUNT(*)
+        FROM new_rows n
+        JOIN Products p ON p.id = n.product_id
+        WHERE p.creator_id IS NOT NULL
+        GROUP BY p.creator_id
+        ON CONFLICT (seller_id) DO UPDATE
+        SET product_rating_sum = s.product_rating_sum + EXCLUDED.product_rating_sum,
+            product_review_count = s.product_review_count + EXCLUDED.product_review_count;
+    END IF;
+    IF TG_OP IN ('UPDATE', 'DELETE') THEN
+        UPDATE SellerStats s
+        SET product_rating_sum = s.product_rating_sum - d.rating_sum,
+            product_review_count = s.product_review_count - d.review_count
+        FROM (SELECT p.creator_id, SUM(o.rating) AS rating_sum, COUNT(*) AS review_count
+              FROM old_rows o
+              JOIN Products p ON p.id = o.product_id
+              WHERE p.creator_id IS NOT NULL
+              GROUP BY p.creator_id) d
+        WHERE s.seller_id = d.creator_id;
+    END IF;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
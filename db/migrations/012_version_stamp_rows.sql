@@ -0,0 +1,53 @@
+-- Version stamps for whole-table pages: the product listings ('catalog':
+-- Products, ProductStats) and the review summary ('reviews': Reviews,
+-- SellerReviews).  009 aggregated version/updated_at over every row of
+-- those tables on each request, and MAX(updated_at) did not move when a
+-- row was deleted.  Here statement-level triggers bump a stamp row on any
+-- insert, update or delete, and Version reads only the stamp rows.
+--
+-- Each scope has 16 slot rows and a writer bumps the one for its backend.
+-- With a single row, every transaction that touches ProductStats (so
+-- every checkout) would queue on one row lock, and concurrent
+-- SERIALIZABLE writers would fail on it.  The token is SUM(version),
+-- which grows with every committed bump; Last-Modified is the newest
+-- slot's updated_at.
+
+CREATE TABLE VersionStamps (
+    scope VARCHAR(32) NOT NULL,
+    slot INT NOT NULL,
+    version BIGINT NOT NULL DEFAULT 0,
+    updated_at TIMESTAMP WITHOUT TIME ZONE NOT NULL
+        DEFAULT (clock_timestamp() AT TIME ZONE 'UTC'),
+    PRIMARY KEY (scope, slot)
+);
+
+INSERT INTO VersionStamps (scope, slot)
+SELECT scope, slot
+FROM (VALUES ('catalog'), ('reviews')) s (scope)
+CROSS JOIN generate_series(0, 15) slot;
+
+
+-- TG_ARGV[0] is the scope to bump.
+CREATE FUNCTION bump_version_stamp() RETURNS trigger AS $$
+BEGIN
+    UPDATE VersionStamps
+    SET version = version + 1,
+        updated_at = clock_timestamp() AT TIME ZONE 'UTC'
+    WHERE scope = TG_ARGV[0]
+      AND slot = pg_backend_pid() % 16;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE TRIGGER products_version_stamp
+    AFTER INSERT OR UPDATE OR DELETE ON Products
+    FOR EACH STATEMENT EXECUTE FUNCTION bump_version_stamp('catalog');
+CREATE TRIGGER productstats_version_stamp
+    AFTER INSERT OR UPDATE OR DELETE ON ProductStats
+    FOR EACH STATEMENT EXECUTE FUNCTION bump_version_stamp('catalog');
+CREATE TRIGGER reviews_version_stamp
+    AFTER INSERT OR UPDATE OR DELETE ON Reviews
+    FOR EACH STATEMENT EXECUTE FUNCTION bump_version_stamp('reviews');
+CREATE TRIGGER sellerreviews_version_stamp
+    AFTER INSERT OR UPDATE OR DELETE ON SellerReviews
+    FOR EACH STATEMENT EXECUTE FUNCTION bump_version_stamp('reviews');
@@ -0,0 +1,97 @@
+-- SellerStats.order_count from OrderSellerSummary.  006 decided whether
+-- an (order, seller) pair already had a fulfilled line with EXISTS over
+-- OrderItems, which under READ COMMITTED can't see a concurrent
+-- transaction's uncommitted line: two fulfills of the same pair from
+-- different requests both saw "not yet fulfilled" and both added 1.
+--
+-- OrderSellerSummary (008) keeps fulfilled_count per pair with upserts
+-- that serialize on the pair's row, so its old and new versions show
+-- exactly when a pair gains its first fulfilled line or loses its last.
+-- The OrderItems trigger now keeps only the line totals, and a trigger on
+-- OrderSellerSummary moves order_count on those transitions.
+
+CREATE OR REPLACE FUNCTION seller_stats_orderitems_sync() RETURNS trigger AS $$
+BEGIN
+    IF TG_OP = 'INSERT' THEN
+        INSERT INTO SellerStats AS s (seller_id, line_count, fulfilled_line_count, items_sold, revenue)
+        SELECT seller_id,
+               COUNT(*),
+               COUNT(*) FILTER (WHERE fulfillment_status = 'fulfilled'),
+               COALESCE(SUM(quantity) FILTER (WHERE fulfillment_status = 'fulfilled'), 0),
+               COALESCE(SUM(quantity * price) FILTER (WHERE fulfillment_status = 'fulfilled'), 0)
+        FROM new_rows
+        GROUP BY seller_id
+        ON CONFLICT (seller_id) DO UPDATE
+        SET line_count = s.line_count + EXCLUDED.line_count,
+            fulfilled_line_count = s.fulfilled_line_count + EXCLUDED.fulfilled_line_count,
+            items_sold = s.items_sold + EXCLUDED.items_sold,
+            revenue = s.revenue + EXCLUDED.revenue;
+    ELSE
+        INSERT INTO SellerStats AS s (seller_id, line_count, fulfilled_line_count, items_sold, revenue)
+        SELECT seller_id,
+               SUM(sign),
+               COALESCE(SUM(sign) FILTER (WHERE fulfilled), 0),
+               COALESCE(SUM(sign * quantity) FILTER (WHERE fulfilled), 0),
+               COALESCE(SUM(sign * quantity * price) FILTER (WHERE fulfilled), 0)
+        FROM (
+            SELECT 1 AS sign, seller_id, quantity, price,
+                   fulfillment_status = 'fulfilled' AS fulfilled
+            FROM new_rows
+            UNION ALL
+            SELECT -1, seller_id, quantity, price, fulfillment_status = 'fulfilled'
+            FROM old_rows
+        ) d
+        GROUP BY seller_id
+        ON CONFLICT (seller_id) DO UPDATE
+        SET line_count = s.line_count + EXCLUDED.line_count,
+            fulfilled_line_count = s.fulfilled_line_count + EXCLUDED.fulfilled_line_count,
+            items_sold = s.items_sold + EXCLUDED.items_sold,
+            revenue = s.revenue + EXCLUDED.revenue;
+    END IF;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+
+-- A pair counts while fulfilled_count > 0.  Row-level, so each pair's
+-- change is read from the row version its upsert actually wrote.
+CREATE FUNCTION seller_stats_order_count_sync() RETURNS trigger AS $$
+DECLARE
+    seller INT;
+    delta INT := 0;
+BEGIN
+    IF TG_OP IN ('INSERT', 'UPDATE') THEN
+        seller := NEW.seller_id;
+        delta := delta + (NEW.fulfilled_count > 0)::int;
+    END IF;
+    IF TG_OP IN ('UPDATE', 'DELETE') THEN
+        seller := OLD.seller_id;
+        delta := delta - (OLD.fulfilled_count > 0)::int;
+    END IF;
+    IF delta <> 0 THEN
+        INSERT INTO SellerStats AS s (seller_id, order_count)
+        VALUES (seller, delta)
+        ON CONFLICT (seller_id) DO UPDATE
+        SET order_count = s.order_count + EXCLUDED.order_count;
+    END IF;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE TRIGGER seller_stats_order_count
+    AFTER INSERT OR UPDATE OR DELETE ON OrderSellerSummary
+    FOR EACH ROW EXECUTE FUNCTION seller_stats_order_count_sync();
+
+
+-- Correct any count the old trigger let drift.
+UPDATE SellerStats s
+SET order_count = COALESCE(c.order_count, 0)
+FROM SellerStats s2
+LEFT JOIN (
+    SELECT seller_id, COUNT(*) AS order_count
+    FROM OrderSellerSummary
+    WHERE fulfilled_count > 0
+    GROUP BY seller_id
+) c ON c.seller_id = s2.seller_id
+WHERE s.seller_id = s2.seller_id
+  AND s.order_count IS DISTINCT FROM COALESCE(c.order_count, 0);
@@ -21,3 +21,6 @@ psql -c "CREATE DATABASE $dbname"
 psql -af create.sql $dbname
 cd $datadir
 psql -af $mybase/load.sql $dbname
+
+# secondary indexes and later schema changes
+$mybase/migrate.sh $dbname